@@ -155,6 +155,63 @@ def BOSS_sky_validate():
                 bbox_inches='tight') 
     return None
 
+def BOSS_sky_validate_parker(): 
+    ''' validate Parker's sky model against all of the BOSS sky fibers. The
+    model is evaluated for all BOSS observing conditions in a single call of
+    `Sky.Isky_parker_batch`
+    '''
+    boss = boss_sky() # read in BOSS sky data 
+    n_sky = len(boss) 
+    print('%i sky fibers' % n_sky)
+    
+    # mid-exposure time in TAI seconds 
+    tai = np.array(boss['TAI-BEG']) + 0.5 * np.array(boss['EXPTIME'])
+    mjd, month_frac, hour_frac = Sky._parker_time_params(tai) 
+
+    w_parker, Isky_parker = Sky.Isky_parker_batch(
+            np.array(boss['AIRMASS']), np.array(boss['ECL_LAT']), 
+            np.array(boss['GAL_LAT']), np.array(boss['GAL_LON']), 
+            mjd, month_frac, hour_frac, 
+            np.array(boss['SUN_ALT']), np.array(boss['SUN_SEP']), 
+            np.array(boss['MOON_PHASE']), np.array(boss['MOON_ILL']), 
+            np.array(boss['MOON_ALT']), np.array(boss['MOON_SEP']))
+    
+    # --- plot sky at 4100A as a function of varioius parameters---
+    for ww in [4100., 4600]: 
+        parker_wlim = (w_parker > ww-50.) & (w_parker < ww+50.)
+        parker_ww   = np.median(Isky_parker[:,parker_wlim], axis=1)
+
+        boss_ww = np.zeros(n_sky)
+        for i in range(n_sky): 
+            boss_wlim= (boss['WAVE'][i] > ww/10.-5.) & (boss['WAVE'][i] < ww/10.+5.) 
+            boss_ww[i]= np.median(boss['SKY'][i][boss_wlim])/np.pi
+
+        fig = plt.figure(figsize=(10, 25))
+        for i, k in enumerate(['MOON_ILL', 'MOON_ALT', 'MOON_SEP', 'AIRMASS', 'SUN_ALT']): 
+            sub = fig.add_subplot(5,1,i+1)
+            sub.scatter(boss[k], boss_ww/parker_ww, c='C0', s=3, label='Parker')
+            sub.set_xlabel(' '.join(k.split('_')).lower(), fontsize=25)
+            if i == 0:
+                sub.legend(loc='upper right', handletextpad=0, markerscale=10, fontsize=20)
+                sub.set_xlim([0.,1.])
+            elif i == 1:
+                sub.set_xlim([0., 90.])
+            elif i == 2:
+                sub.set_xlim([0., 180.])
+            elif i == 3:
+                sub.set_xlim([1., 2.])
+            elif i == 4:
+                sub.set_xlim([-90., 0.])
+            sub.set_ylim(0, 15) 
+            sub.plot(sub.get_xlim(), [1., 1.], color='k', linestyle='--')
+
+        bkgd = fig.add_subplot(111, frameon=False) # x,y labels
+        bkgd.tick_params(labelcolor='none', top=False, bottom=False, left=False, right=False)
+        bkgd.set_ylabel('(BOSS Sky)/(sky model) at %.fA' % ww, fontsize=25)
+        fig.savefig(os.path.join(UT.code_dir(), 'figs', 'BOSS_sky_validate_parker.sky%.f.png' % ww), 
+                bbox_inches='tight') 
+    return None
+
 #########################################################
 # DECam 
 #########################################################
@@ -692,6 +749,7 @@ def _sky_ESO_altitude():
 if __name__=="__main__": 
     #twilight_coeffs()
     #BOSS_sky_validate()
+    #BOSS_sky_validate_parker()
     #decam_sky(overwrite=True)
     #DECam_sky_validate()
     #_Noll_sky_ESO()
@@ -7,11 +7,44 @@ submodules to handle Catalogs used in the project
 import os 
 import numpy as np
 import h5py
+import weakref
+from collections.abc import Mapping, MutableMapping
 from astropy.io import fits 
 from astropy.table import Table as aTable
-from astropy.cosmology import FlatLambdaCDM
+from multiprocessing import Pool
+from scipy.spatial import cKDTree
 # -- local --
 from . import util as UT
+from . import footprint as FP
+from . import cosmology as CM
+
+
+# units of the catalog columns by column name prefix 
+_COLUMN_UNITS = [
+        ('apflux_ivar_', 'nanomaggies^-2'), 
+        ('flux_ivar_', 'nanomaggies^-2'), 
+        ('apflux_', 'nanomaggies'), 
+        ('flux_', 'nanomaggies'), 
+        ('ra', 'deg'), 
+        ('dec', 'deg'), 
+        ('shapeexp_r', 'arcsec'), 
+        ('shapedev_r', 'arcsec'), 
+        ('gaia_phot_', 'mag'), 
+        ('ebv', 'mag'), 
+        ('_flux', '1e-17 erg/s/cm^2'), 
+        ('_model', 'mag')]
+
+
+def column_attrs(key): 
+    ''' metadata of a catalog column (currently the unit) from its name 
+    '''
+    key = key.lower() 
+    for col, unit in _COLUMN_UNITS: 
+        if col.startswith('_'): match = key.endswith(col) 
+        elif col in ['ra', 'dec', 'ebv']: match = (key == col) 
+        else: match = key.startswith(col) 
+        if match: return {'unit': unit} 
+    return {} 
 
 
 class Catalog(object): 
@@ -21,19 +54,90 @@ class Catalog(object):
     def __init__(self): 
         self.catalog = None 
     
-    def _h5py_create_dataset(self, grp, key, data): 
-        ''' the arrays from the fits files do not play well with the new h5py 
-        and python3
-        '''
-        if isinstance(data, np.chararray) or isinstance(data[0], np.str_): 
-            _chararray = np.array(data, dtype=h5py.special_dtype(vlen=str))
-            grp.create_dataset(key.lower(), data=_chararray) 
-        elif isinstance(data[0], np.bool_): 
-            _bool = np.zeros(len(data)).astype(bool) 
-            _bool[data] = True
-            grp.create_dataset(key.lower(), data=_bool)
-        else: 
-            grp.create_dataset(key.lower(), data=data)
+    def _h5py_create_dataset(self, grp, key, data, compression=None, attrs=None): 
+        ''' write a column to a chunked dataset. The arrays from the fits
+        files do not play well with the new h5py and python3, so string
+        columns (e.g. brick names) are stored as fixed-width byte strings,
+        which are read back as bytes arrays without per-element decoding, and
+        boolean columns are stored as bool. 
+
+        :param compression: 
+            (optional) h5py compression filter, e.g. 'gzip' or 'lzf'. The
+            shuffle filter is used with compression. (default: None) 
+
+        :param attrs: 
+            (optional) column metadata written to the dataset attributes in
+            addition to `column_attrs(key)` 
+        '''
+        data = self._h5py_array(data) 
+        key = key.lower() 
+        kwargs = self._h5py_layout(data, compression) 
+        grp.create_dataset(key, data=data, **kwargs) 
+        self._h5py_attrs(grp[key], key, data, attrs) 
+        return None 
+
+    def _h5py_append_dataset(self, grp, key, data, compression=None, attrs=None): 
+        ''' append data to a resizable dataset along the first axis. The
+        dataset is created on the first call with the same conversions and
+        layout as `_h5py_create_dataset`. Appending an empty array is a no-op. 
+        '''
+        data = self._h5py_array(data) 
+        key = key.lower() 
+        if key not in grp.keys(): 
+            kwargs = self._h5py_layout(data, compression) 
+            kwargs['chunks'] = kwargs.get('chunks', True)
+            grp.create_dataset(key, data=data, maxshape=(None,)+data.shape[1:], **kwargs) 
+            self._h5py_attrs(grp[key], key, data, attrs) 
+        elif data.shape[0] > 0: 
+            ds = grp[key] 
+            if data.dtype.kind == 'S' and data.dtype.itemsize > ds.dtype.itemsize: 
+                raise ValueError('%s strings are wider than the %s dataset' % (key, str(ds.dtype)))
+            n0 = ds.shape[0]
+            ds.resize(n0 + data.shape[0], axis=0) 
+            ds[n0:] = data 
+        return None 
+
+    def _h5py_array(self, data): 
+        ''' convert a column to an array that h5py can write: strings to
+        fixed-width utf-8 byte strings and booleans to bool. The width of the
+        byte strings is set by the dtype of `data` rather than its values, so
+        chunks of the same column (including empty ones) have the same width. 
+        '''
+        data = np.asarray(data) 
+        if data.dtype.kind == 'U': 
+            nchar = max(1, data.dtype.itemsize // 4) 
+            try: # ascii 
+                data = data.astype('S%i' % nchar) 
+            except UnicodeEncodeError: # utf-8 takes up to 4 bytes per character 
+                data = np.char.encode(data, 'utf-8').astype('S%i' % (4 * nchar)) 
+        elif data.dtype.kind == 'O' and data.size > 0: 
+            if isinstance(data.flat[0], str): data = np.char.encode(data.astype(str), 'utf-8') 
+            elif isinstance(data.flat[0], bytes): data = data.astype(bytes) 
+        elif data.dtype.kind == 'b': 
+            data = data.astype(bool) 
+        return data 
+
+    def _h5py_layout(self, data, compression): 
+        ''' chunk and filter keyword arguments of `create_dataset`. Chunks
+        span whole rows and are ~1MB, so reading a full column takes few
+        chunk reads. 
+        '''
+        if data.ndim == 0 or data.size == 0: return {} 
+        rowbytes = data.itemsize * int(np.prod(data.shape[1:]))
+        nrow = int(min(data.shape[0], max(1, 2**20 // rowbytes)))
+        kwargs = {'chunks': (nrow,)+data.shape[1:]}
+        if compression is not None: 
+            kwargs['compression'] = compression 
+            kwargs['shuffle'] = True 
+        return kwargs 
+
+    def _h5py_attrs(self, ds, key, data, attrs): 
+        ''' write column metadata to the dataset attributes 
+        '''
+        _attrs = column_attrs(key) 
+        if data.dtype.kind == 'S': _attrs['encoding'] = 'utf-8' 
+        if attrs is not None: _attrs.update(attrs) 
+        for k in _attrs.keys(): ds.attrs[k] = _attrs[k] 
         return None 
 
     def flux_to_mag(self, flux): 
@@ -54,9 +158,22 @@ class GAMA(Catalog):
     def __init__(self): 
         pass 
 
-    def Read(self, field, data_release=3, silent=True):
+    def Read(self, field, data_release=3, silent=True, columns=None, rows=None, lazy=True):
         ''' Read in spherematched photometric and spectroscopic 
         data from GAMA DR2 (constructed using _Build). 
+
+        :param columns: 
+            (optional) dictionary of the groups and columns to include (see
+            `LazyCatalog`). (default: all) 
+
+        :param rows: 
+            (optional) slice, boolean array, or index array of the rows to
+            read. (default: all) 
+
+        :param lazy: 
+            If True, return a `LazyCatalog` that only reads columns when they
+            are accessed. Otherwise read everything into a dictionary.
+            (default: True) 
         '''
         _file = self._File(field, data_release=data_release)
         if not os.path.isfile(_file): # if file is not constructed
@@ -64,31 +181,27 @@ class GAMA(Catalog):
             if field == 'all': self._Build(data_release=data_release, silent=silent)
             else: self._fieldSplit(data_release=data_release, silent=silent)
     
-        # read in data and compile onto a dictionary
-        f = h5py.File(_file, 'r') 
-        grp_p = f['photo'] # photo data
-        grp_s = f['spec'] # spec data
-        grp_k0 = f['kcorr_z0.0']
-        grp_k1 = f['kcorr_z0.1']
+        if columns is None: 
+            columns = dict([(g, None) for g in ['photo', 'spec', 'kcorr_z0.0', 'kcorr_z0.1']]) 
+        data = LazyCatalog(_file, columns=columns, rows=rows) 
 
         if not silent: 
             print('colums in GAMA photometry') 
-            print(sorted(grp_p.keys()))
+            print(sorted(data._file['photo'].keys()))
             print('========================')
             print('colums in GAMA spectroscopy')
-            print(sorted(grp_s.keys()))
+            print(sorted(data._file['spec'].keys()))
             print('========================')
             print('colums in GAMA kcorrects')
-            print(sorted(grp_k0.keys()))
+            print(sorted(data._file['kcorr_z0.0'].keys()))
             print('========================')
-            print('%i objects' % len(grp_p['ra'][...])) 
+            print('%i objects' % data._file['photo']['ra'].shape[0]) 
             print('========================')
 
-        data = {} 
-        for dkey, grp in zip(['photo', 'spec', 'kcorr_z0.0', 'kcorr_z0.1'], [grp_p, grp_s, grp_k0, grp_k1]): 
-            data[dkey] = {} 
-            for key in grp.keys():
-                data[dkey][key] = grp[key][...]
+        if not lazy: 
+            _data = data.copy() 
+            data.close() 
+            return _data 
         return data 
     
     def _File(self, field, data_release=3): 
@@ -215,25 +328,24 @@ class GAMA(Catalog):
         GAMA regions. Different regions have different r-mag limits and
         etc so treating them separately is the most sensible!
         '''
-        all_gama = self.Read('all', data_release=data_release, silent=True)
-        
         fields = ['g09', 'g12', 'g15']
         ra_min = [129.0, 174.0, 211.5]
         ra_max = [141.0, 186.0, 223.5]
 
-        for i_f, field in enumerate(fields): 
-            in_ra = ((all_gama['photo']['ra'] >= ra_min[i_f]) & (all_gama['photo']['ra'] <= ra_max[i_f]))
-            if not silent: print('%i objects in %s field' % (np.sum(in_ra), field.upper()))
-        
-            # write each field into hdf5 files
-            f = h5py.File(self._File(field, data_release=data_release), 'w') 
+        with self.Read('all', data_release=data_release, silent=True) as all_gama: 
+            for i_f, field in enumerate(fields): 
+                in_ra = ((all_gama['photo']['ra'] >= ra_min[i_f]) & (all_gama['photo']['ra'] <= ra_max[i_f]))
+                if not silent: print('%i objects in %s field' % (np.sum(in_ra), field.upper()))
+            
+                # write each field into hdf5 files
+                f = h5py.File(self._File(field, data_release=data_release), 'w') 
 
-            for k_grp in all_gama.keys(): # photo, spec, kcorr_z0.0, kcorr_z0.1
-                grp = f.create_group(k_grp) 
-                for key in all_gama[k_grp].keys():
-                    grp.create_dataset(key, data=all_gama[k_grp][key][in_ra]) 
+                for k_grp in all_gama.keys(): # photo, spec, kcorr_z0.0, kcorr_z0.1
+                    grp = f.create_group(k_grp) 
+                    for key in all_gama[k_grp].keys():
+                        grp.create_dataset(key, data=all_gama[k_grp][key][in_ra]) 
 
-            f.close() 
+                f.close() 
         return None
 
     def _readKcorrect(self, fitsfile): 
@@ -252,7 +364,16 @@ class GamaLegacy(Catalog):
     def AbsMag(self, data, kcorr=0.1, H0=70, Om0=0.3, galext=False):  
         ''' Calculate absolute magnitude in SDSS u, g, r, i, z bands with kcorrect 
         at z=`kcorr` given the data dictionary from the `GamaLegacy.Read` method. 
-        H0 and Om0 specifies the cosmology for the distance modulus. 
+        H0 and Om0 specifies the cosmology for the distance modulus, which is
+        interpolated from a table (see `cosmology.distmod`). 
+
+        For `LazyCatalog` and `CatalogView` catalogs (e.g. from `Read`), the
+        absolute magnitudes are memoized on the catalog for each k-correction
+        redshift and cosmology, so calling `AbsMag` again on the same catalog
+        (e.g. in `forwardmodel.BGStree._GamaLegacy`) returns the cached
+        read-only array. The cache is only used if the catalog's magnitude,
+        redshift, and k-correction columns are the same arrays and have not
+        been modified in place (see `_columns_checksum`). 
         '''
         # check data's structure 
         for k in ['gama-photo', 'gama-spec','gama-kcorr-z0.0', 'gama-kcorr-z0.1']: 
@@ -264,182 +385,181 @@ class GamaLegacy(Catalog):
         bands_sdss = ['u','g','r','i','z']
         # apparent magnitude from GAMA photometry
         if not galext: 
-            mag_ugriz = np.array([data['gama-photo'][b+'_model'] for b in bands_sdss]) 
+            mag_cols = [data['gama-photo'][b+'_model'] for b in bands_sdss]
         else: 
-            mag_ugriz =np.array([data['gama-kcorr-z0.1'][b+'_model'] for b in bands_sdss]) 
-
+            mag_cols = [data['gama-kcorr-z0.1'][b+'_model'] for b in bands_sdss]
         redshift = data['gama-spec']['z']  # redshift
+        kcorr_cols = [data['gama-kcorr-z%.1f' % kcorr]['kcorr_'+b] for b in bands_sdss]
+
+        cols = [redshift] + mag_cols + kcorr_cols 
+        cache = getattr(data, '_absmag', None) 
+        key = (kcorr, float(H0), float(Om0), bool(galext))
+        if cache is not None: 
+            checksum = _columns_checksum(cols) 
+            if key in cache: 
+                _cols, _checksum, absmag_ugriz = cache[key] 
+                if (all([c is _c() for c, _c in zip(cols, _cols)]) and 
+                        np.array_equal(checksum, _checksum, equal_nan=True)): 
+                    return absmag_ugriz
+
         # distance modulus 
-        cosmo = FlatLambdaCDM(H0=H0, Om0=Om0)
-        D_L = cosmo.luminosity_distance(redshift).value # Mpc 
-        DM = 5. * np.log10(1e5*D_L)
+        DM = CM.distmod(redshift, H0=H0, Om0=Om0) 
         # k-correct 
-        if kcorr == 0.0: 
-            kcorr = np.array([data['gama-kcorr-z0.0']['kcorr_'+b] for b in bands_sdss]) 
-        elif kcorr == 0.1: 
-            kcorr = np.array([data['gama-kcorr-z0.1']['kcorr_'+b] for b in bands_sdss])
-        
-        absmag_ugriz = mag_ugriz - DM - kcorr
+        absmag_ugriz = np.array(mag_cols) - DM - np.array(kcorr_cols)
+        absmag_ugriz.flags.writeable = False 
+
+        if cache is not None: 
+            cache[key] = ([weakref.ref(c) for c in cols], checksum, absmag_ugriz) 
         return absmag_ugriz
     
-    def Read(self, field, dr_gama=3, dr_legacy=7, silent=True):
+    def Read(self, field, dr_gama=3, dr_legacy=7, silent=True, columns=None, rows=None, lazy=True):
         ''' Read in objects from legacy survey DR 5 that overlap with the 
         GAMA photo+spectra objects
+
+        :param columns: 
+            (optional) dictionary of the groups and columns to include, e.g.
+            {'gama-spec': ['z'], 'legacy-photo': ['apflux_r']} (see
+            `LazyCatalog`). (default: all) 
+
+        :param rows: 
+            (optional) slice, boolean array, or index array of the rows to
+            read. (default: all) 
+
+        :param lazy: 
+            If True, return a `LazyCatalog` that only reads columns when they
+            are accessed. Otherwise read everything into a dictionary.
+            (default: True) 
         '''
         fgleg = self._File(field, dr_gama=dr_gama, dr_legacy=dr_legacy)
         if not os.path.isfile(fgleg): # if file is not constructed
             if not silent: print('Building %s' % fgleg)
             self._Build(field, dr_gama=dr_gama, dr_legacy=dr_legacy, silent=silent)
     
-        # read in data and compile onto a dictionary
-        f = h5py.File(fgleg, 'r') 
-        grp_gp = f['gama-photo'] 
-        grp_gs = f['gama-spec']
-        grp_k0 = f['gama-kcorr-z0.0']
-        grp_k1 = f['gama-kcorr-z0.1']
-        grp_lp = f['legacy-photo'] 
+        if columns is None: 
+            columns = dict([(g, None) for g in ['gama-photo', 'gama-spec', 'gama-kcorr-z0.0', 
+                'gama-kcorr-z0.1', 'legacy-photo']])
+        data = LazyCatalog(fgleg, columns=columns, rows=rows) 
 
         if not silent: 
             print('colums in GAMA Photo Data:') 
-            print(sorted(grp_gp.keys()))
+            print(sorted(data._file['gama-photo'].keys()))
             print('colums in GAMA Spec Data:') 
-            print(sorted(grp_gs.keys()))
+            print(sorted(data._file['gama-spec'].keys()))
             print('colums in Legacy Data:') 
-            print(sorted(grp_lp.keys()))
+            print(sorted(data._file['legacy-photo'].keys()))
             print('========================')
-            print('%i objects' % len(grp_gp['ra'][...])) 
-
-        data = {} 
-        for dk, grp in zip(['gama-photo', 'gama-spec', 'gama-kcorr-z0.0', 'gama-kcorr-z0.1', 'legacy-photo'], 
-                [grp_gp, grp_gs, grp_k0, grp_k1, grp_lp]):
-            data[dk] = {} 
-            for key in grp.keys():
-                data[dk][key] = grp[key][...]
-        self.catalog = data.copy() 
+            print('%i objects' % data._file['gama-photo']['ra'].shape[0]) 
+
+        if not lazy: 
+            _data = data.copy() 
+            data.close() 
+            data = _data 
+        self.catalog = data
         return data 
 
     def select(self, index=None): 
-        ''' select objects in the catalog by their index
+        ''' select objects in the catalog by their index or a boolean mask.
+        Returns a `CatalogView` that holds the index and only gathers the
+        columns that are accessed, so subsamples do not copy the catalog. 
         '''
-        if index is not None: 
-            if isinstance(index, list): 
-                index = np.array(index)
-            elif isinstance(index, np.ndarray): 
-                pass
-            else: 
-                raise ValueError("index can only be a list of array") 
-            
-            select_data = {} 
-            for grp in self.catalog.keys(): 
-                select_data[grp] = {} 
-                for key in self.catalog[grp].keys(): 
-                    select_data[grp][key] = self.catalog[grp][key][index]
-        return select_data 
-
-    def write(self, catalog, fname):  
+        if index is None: return self.catalog 
+        if isinstance(index, list): 
+            index = np.array(index)
+        elif not isinstance(index, np.ndarray): 
+            raise ValueError("index can only be a list of array") 
+        return CatalogView(self.catalog, index) 
+
+    def write(self, catalog, fname, compression=None):  
         ''' Given dictionary with same structure as self.catalog 
-        write to hdf5 file 
+        write to hdf5 file with chunked (and optionally compressed) datasets 
         '''
         f = h5py.File(fname, 'w') 
         for g in catalog.keys(): 
             grp = f.create_group(g) 
             for k in catalog[g].keys(): 
-                grp.create_dataset(k, data=catalog[g][k]) 
+                self._h5py_create_dataset(grp, k, catalog[g][k], compression=compression) 
         f.close() 
         return None 
 
     def _File(self, field, dr_gama=3, dr_legacy=7): 
         return ''.join([UT.dat_dir(), 'GAMAdr', str(dr_gama), '.', field, '.LEGACYdr', str(dr_legacy), '.v2.hdf5'])
 
-    def _Build(self, field, dr_gama=3, dr_legacy=7, silent=True): 
+    def _Build(self, field, dr_gama=3, dr_legacy=7, silent=True, n_proc=1, sweep_columns=None): 
         ''' Get Legacy Survey photometry for objects in the GAMA DR`dr_gama`
         photo+spec objects from the sweep files. This is meant to run on nersc
         but you can also manually download the sweep files and specify the dir
         where the sweep files are located in. 
+
+        :param n_proc: 
+            number of processes used to cross-match the sweep files (default: 1) 
+
+        :param sweep_columns: 
+            (optional) sweep columns to include. RA, Dec, brickname, and objid
+            are always included. (default: all columns) 
         '''
-        from pydl.pydlutils.spheregroup import spherematch
-        if dr_legacy == 5: 
-            sweep_n_dir = '/global/project/projectdirs/cosmo/data/legacysurvey/dr5/sweep/5.0/'
-            sweep_s_dir = '/global/project/projectdirs/cosmo/data/legacysurvey/dr5/sweep/5.0/'
-            tractor_n_dir='/global/project/projectdirs/cosmo/data/legacysurvey/dr5/tractor/'
-        elif dr_legacy == 7: 
-            sweep_n_dir = '/global/project/projectdirs/cosmo/data/legacysurvey/dr7/sweep/7.1/'
-            sweep_s_dir = '/global/project/projectdirs/cosmo/data/legacysurvey/dr7/sweep/7.1/'
-            tractor_n_dir='/global/project/projectdirs/cosmo/data/legacysurvey/dr7/tractor/'
-            tractor_s_dir='/global/project/projectdirs/cosmo/data/legacysurvey/dr7/tractor/'
-        elif dr_legacy == 8: 
-            sweep_n_dir = \
-                    '/global/project/projectdirs/cosmo/data/legacysurvey/dr8/north/sweep/8.0/'
-            sweep_s_dir = \
-                    '/global/project/projectdirs/cosmo/data/legacysurvey/dr8/south/sweep/8.0/'
-            tractor_n_dir = \
-                    '/global/project/projectdirs/cosmo/data/legacysurvey/dr8/north/tractor/'
-            tractor_s_dir = \
-                    '/global/project/projectdirs/cosmo/data/legacysurvey/dr7/south/tractor/'
-
-        # read in the names of the sweep files 
-        fsweep = ''.join([UT.dat_dir(), 'legacy/', field, '.sweep_list.dat'])
-        if not os.path.isfile(fsweep): _ = self._getSweeps(field, silent=silent)
-        sweep_files = np.loadtxt(fsweep, unpack=True, usecols=[0], dtype='S') 
-        if not silent: print("there are %i sweep files in the %s GAMA region" % (len(sweep_files), field)) 
-
-        # read in GAMA objects
+        # footprint of the sweep files and bricks 
+        fp = FP.footprint(dr_legacy, silent=silent) 
+
+        # read in GAMA objects (all the columns are written out, so they are
+        # read into memory and the file is closed) 
         gama = GAMA() 
-        gama_data = gama.Read(field, data_release=dr_gama, silent=silent)
+        gama_data = gama.Read(field, data_release=dr_gama, silent=silent, lazy=False)
     
-        sweep_dict = {} 
-        gama_photo_dict, gama_spec_dict, gama_kcorr0_dict, gama_kcorr1_dict = {}, {}, {}, {} 
-        # loop through the files and only keep ones that spherematch with GAMA objects
-        for i_f, f in enumerate(sweep_files): 
-            # read in sweep object 
-            for sweep_dir in [sweep_n_dir, sweep_s_dir]: 
-                fsweep = os.path.join(sweep_dir, f.decode('unicode_escape'))
-                if os.path.isfile(fsweep): break  
-            sweep = fits.open(fsweep)[1].data
-            if not silent: print('matching %s' % fsweep)
-        
-            # spherematch the sweep objects with GAMA objects 
-            if len(sweep['ra']) > len(gama_data['photo']['ra']):
-                match = spherematch(sweep['ra'], sweep['dec'], 
-                        gama_data['photo']['ra'], gama_data['photo']['dec'], 0.000277778)
-            else: 
-                match_inv = spherematch(gama_data['photo']['ra'], gama_data['photo']['dec'], 
-                        sweep['ra'], sweep['dec'], 0.000277778)
-                match = [match_inv[1], match_inv[0], match_inv[2]] 
-
-            if not silent: 
-                print('%i matches from the %s sweep file' % (len(match[0]), f))
-            
-            # save sweep photometry to `sweep_dict`
-            for key in sweep.names: 
-                if i_f == 0: 
-                    sweep_dict[key.lower()] = sweep[key][match[0]] 
-                else: 
-                    sweep_dict[key.lower()] = np.concatenate([sweep_dict[key.lower()], sweep[key][match[0]]]) 
-
-            # save matching GAMA data ('photo', 'spec', and kcorrects) 
-            for gkey, gdict in zip(['photo', 'spec', 'kcorr_z0.0', 'kcorr_z0.1'],
-                    [gama_photo_dict, gama_spec_dict, gama_kcorr0_dict, gama_kcorr1_dict]): 
-                for key in gama_data[gkey].keys(): 
-                    if i_f == 0: 
-                        gdict[key] = gama_data[gkey][key][match[1]]
-                    else: 
-                        gdict[key] = np.concatenate([gdict[key], gama_data[gkey][key][match[1]]])
-
-            del sweep  # free memory? (apparently not really) 
+        # matched sweep photometry is streamed into resizable datasets of the
+        # output file one sweep file at a time, so memory is bounded by the
+        # size of a single sweep file. Only the indices of the matched GAMA
+        # objects are accumulated. The file is written to a temporary name
+        # and only renamed once it is complete. 
+        fgleg = self._File(field, dr_gama=dr_gama, dr_legacy=dr_legacy)
+        fgleg_tmp = fgleg + '.tmp' 
+        fout = h5py.File(fgleg_tmp, 'w') 
+        grp_lp = fout.create_group('legacy-photo') 
+
+        # sweep files that overlap with the GAMA field 
+        gama_ra, gama_dec = gama_data['photo']['ra'], gama_data['photo']['dec']
+        fsweeps = fp.paths(fp.rectangle([gama_ra.min(), gama_ra.max()], 
+            [gama_dec.min(), gama_dec.max()], kind='sweep'))
+        if not silent: print("there are %i sweep files in the %s GAMA region" % (len(fsweeps), field)) 
+
+        # cross-match the sweep files with the GAMA objects in a process pool.
+        # The results come back in the order of the sweep files. 
+        args = [(fsweep, sweep_columns, 1./3600.) for fsweep in fsweeps]
+        gama_radec = (gama_data['photo']['ra'], gama_data['photo']['dec'])
+        if n_proc > 1: 
+            pool = Pool(processes=n_proc, initializer=_init_match_tree, initargs=gama_radec) 
+            matches = pool.imap(_match_sweep, args) 
+        else: 
+            _init_match_tree(*gama_radec) 
+            matches = map(_match_sweep, args) 
+
+        i_gama, brickname, objid = [], [], []
+        for fsweep, (_i_gama, _sweep) in zip(fsweeps, matches): 
+            if not silent: print('%i matches from %s' % (len(_i_gama), fsweep))
+            # append sweep photometry of the matches 
+            for key in _sweep.keys(): 
+                self._h5py_append_dataset(grp_lp, key, _sweep[key]) 
+            # indices of the matching GAMA objects and the sweep columns
+            # needed to read the tractor apfluxes 
+            i_gama.append(_i_gama) 
+            brickname.append(_sweep['brickname'])
+            objid.append(_sweep['objid'])
+        if n_proc > 1: 
+            pool.close() 
+            pool.join() 
+        i_gama = np.concatenate(i_gama) 
+        brickname = np.concatenate(brickname) 
+        objid = np.concatenate(objid) 
+        n_match = grp_lp['ra'].shape[0] 
 
         if not silent: 
             print('========================')
-            print('%i objects out of %i GAMA objects mached' % (len(sweep_dict['ra']), len(gama_data['photo']['dec'])) )
-
-        assert len(sweep_dict['ra']) == len(gama_photo_dict['ra']) 
-        assert len(sweep_dict['ra']) == len(gama_spec_dict['ra']) 
-        assert len(sweep_dict['ra']) == len(gama_kcorr0_dict['mass']) 
-        assert len(sweep_dict['ra']) == len(gama_kcorr1_dict['mass']) 
+            print('%i objects out of %i GAMA objects mached' % (n_match, len(gama_data['photo']['dec'])) )
+        assert n_match == len(i_gama) 
 
         # writeout all the GAMA objects without sweep objects
         if not silent: 
-            nosweep = ~np.in1d(gama_data['photo']['objid'], gama_photo_dict['objid']) 
+            nosweep = np.ones(len(gama_data['photo']['ra'])).astype(bool) 
+            nosweep[i_gama] = False 
             f_nosweep = ''.join([UT.dat_dir(), 
                 'GAMAdr', str(dr_gama), '.', field, '.LEGACYdr', str(dr_legacy), '.nosweep_match.fits'])
             print('========================')
@@ -449,119 +569,435 @@ class GamaLegacy(Catalog):
                     names=('ra', 'dec'))
             tb.meta['COMMENTS'] = 'RA, Dec of GAMA objects without matches in Legacy DR5 sweep' 
             tb.write(f_nosweep, format='fits', overwrite=True) 
-            #np.savetxt(f_nosweep, np.array([gama_data['photo']['ra'], gama_data['photo']['dec']]).T, header='RA, Dec')
 
         # read apfluxes from tractor catalogs 
-        try: 
-            apflux_dict = self._getTractorApflux(sweep_dict['brickname'], 
-                    sweep_dict['objid'], tractor_dir=tractor_n_dir) 
-        except ValueError: 
-            apflux_dict = self._getTractorApflux(sweep_dict['brickname'],
-                    sweep_dict['objid'], tractor_dir=tractor_s_dir) 
-        assert apflux_dict['apflux_g'].shape[0] == len(sweep_dict['brickname']) 
+        apflux_dict = self._getTractorApflux(brickname, objid, footprint=fp) 
+        assert apflux_dict['apflux_g'].shape[0] == n_match 
 
         # save data to hdf5 file
-        if not silent: print('writing to %s' % self._File(field, dr_gama=dr_gama, dr_legacy=dr_legacy))
-        f = h5py.File(self._File(field, dr_gama=dr_gama, dr_legacy=dr_legacy), 'w') 
-        grp_gp = f.create_group('gama-photo') 
-        grp_gs = f.create_group('gama-spec') 
-        grp_k0 = f.create_group('gama-kcorr-z0.0') 
-        grp_k1 = f.create_group('gama-kcorr-z0.1') 
-        grp_lp = f.create_group('legacy-photo') 
-    
-        for key in sweep_dict.keys():
-            self._h5py_create_dataset(grp_lp, key, sweep_dict[key]) 
+        if not silent: print('writing to %s' % fgleg)
         for key in apflux_dict.keys(): # additional apflux data. 
             self._h5py_create_dataset(grp_lp, key, apflux_dict[key]) 
-        for key in gama_photo_dict.keys(): 
-            grp_gp.create_dataset(key, data=gama_photo_dict[key]) 
-        for key in gama_spec_dict.keys(): 
-            grp_gs.create_dataset(key, data=gama_spec_dict[key]) 
-        for key in gama_kcorr0_dict.keys(): 
-            grp_k0.create_dataset(key, data=gama_kcorr0_dict[key]) 
-        for key in gama_kcorr1_dict.keys(): 
-            grp_k1.create_dataset(key, data=gama_kcorr1_dict[key]) 
-        f.close() 
+        # matching GAMA data ('photo', 'spec', and kcorrects) 
+        for gkey, gkey_out in zip(['photo', 'spec', 'kcorr_z0.0', 'kcorr_z0.1'],
+                ['gama-photo', 'gama-spec', 'gama-kcorr-z0.0', 'gama-kcorr-z0.1']): 
+            grp = fout.create_group(gkey_out) 
+            for key in gama_data[gkey].keys(): 
+                grp.create_dataset(key, data=gama_data[gkey][key][i_gama]) 
+        fout.close() 
+        os.rename(fgleg_tmp, fgleg) 
         return None 
 
-    def _getSweeps(self, field, silent=True): 
-        ''' Construct list of sweep files given GAMA object.
-        '''
-        # read in GAMA objects in field 
-        gama = GAMA() 
-        if field == 'all': raise ValueError("only select specific GAMA fields; not the entire data release") 
-        gama_data = gama.Read(field, silent=silent)
-    
-        # get brickmin and brickmax of sweep files 
-        ra_mins = 10.*np.arange(gama_data['photo']['ra'].min() // 10., (gama_data['photo']['ra'].max() // 10.) + 1) 
-        ra_maxs = ra_mins + 10.
-        dec_mins = 5.*np.arange(gama_data['photo']['dec'].min() // 5., (gama_data['photo']['dec'].max() // 5.) + 1)
-        dec_maxs = dec_mins + 5. 
-        
-        legacy_gama_sweep = []
-        for i in range(len(ra_mins)): 
-            for j in range(len(dec_mins)): 
-                if dec_mins[j] < 0: pm_sign = 'm'
-                else: pm_sign = 'p'
-                brickmin = ''.join([str(int(ra_mins[i])).zfill(3), pm_sign, 
-                    str(int(np.abs(dec_mins[j]))).zfill(3)])
-
-                if dec_maxs[j] < 0: pm_sign = 'm'
-                else: pm_sign = 'p'
-                brickmax = ''.join([str(int(ra_maxs[i])).zfill(3), pm_sign, 
-                    str(int(np.abs(dec_maxs[j]))).zfill(3)])
-                
-                f_sweep = ''.join(['sweep-', brickmin, '-', brickmax, '.fits'])
-                legacy_gama_sweep.append(f_sweep)
-                if not silent: print('... %s' % f_sweep)
-        np.savetxt(''.join([UT.dat_dir(), 'legacy/', field, '.sweep_list.dat']), 
-                legacy_gama_sweep, fmt='%s')
-        return ra_mins, dec_mins 
-    
     def _getTractorApflux(self, brickname, objids, 
-            tractor_dir='/global/project/projectdirs/cosmo/data/legacysurvey/dr7/tractor/', silent=True): 
+            tractor_dir='/global/project/projectdirs/cosmo/data/legacysurvey/dr7/tractor/', 
+            footprint=None, n_thread=1, silent=True): 
         ''' The catalog is constructed from the sweep catalog and the 
         GAMA DR3 photo+spec data. The sweep catalog does not include 
         all the photometric data from the legacy survey. This methods 
         appends 'apflux_g', 'apflux_r', 'apflux_z' and relevant columsn 
-        from the tractor files. 
-        
-        This can (and probably should) be extended to other columns 
+        from the tractor files (see `_getTractorColumns` for other columns). 
         '''
-        bricks_uniq = np.unique(brickname)  # unique bricks
-        AAAs = np.array([brick[:3] for brick in bricks_uniq]) 
-        
-        # apfluxes in 'g', 'r', and 'z' bands 
-        bands = ['g', 'r', 'z']
-        apfluxes = np.zeros((3, len(brickname), 8)) 
-        apflux_ivars = np.zeros((3, len(brickname), 8)) 
-        apflux_resids = np.zeros((3, len(brickname), 8)) 
-
-        n_brick = 0 
-        for ii, AAA, brick in zip(range(len(AAAs)), AAAs, bricks_uniq): 
-            name = ''.join([tractor_dir, AAA, '/tractor-', brick, '.fits'])
-            if not silent: print('%i of %i unique bricks -- %s' % (ii, len(AAAs), brick)) 
-            if not os.path.isfile(name): raise ValueError('%s tractor file not available' % name)
-            f_tractor = fits.open(name) 
-            tractor = f_tractor[1].data
-
-            inbrick = (brickname == brick) 
-            for i_k, key in enumerate(bands):
-                apfluxes[i_k, inbrick, :] = tractor.field('apflux_'+key)[objids[inbrick]]
-                apflux_ivars[i_k, inbrick, :] = tractor.field('apflux_ivar_'+key)[objids[inbrick]]
-                apflux_resids[i_k, inbrick, :] = tractor.field('apflux_resid_'+key)[objids[inbrick]]
-            n_brick += np.sum(inbrick)
-
-        assert n_brick == len(brickname) 
-
-        # return dictionary with appropriate keys 
-        apflux_dict = {} 
-        for i_k, key in enumerate(bands):
-            apflux_dict['apflux_'+key] = apfluxes[i_k,:,:]
-            apflux_dict['apflux_ivar_'+key] = apflux_ivars[i_k,:,:]
-            apflux_dict['apflux_resid_'+key] = apflux_resids[i_k,:,:]
-
-        return apflux_dict
+        columns = [] 
+        for key in ['g', 'r', 'z']: 
+            columns += ['apflux_'+key, 'apflux_ivar_'+key, 'apflux_resid_'+key]
+        return self._getTractorColumns(brickname, objids, columns, tractor_dir=tractor_dir, 
+                footprint=footprint, n_thread=n_thread, silent=silent) 
+
+    def _getTractorColumns(self, brickname, objids, columns, 
+            tractor_dir='/global/project/projectdirs/cosmo/data/legacysurvey/dr7/tractor/', 
+            footprint=None, n_thread=1, silent=True): 
+        ''' read columns of the tractor catalogs for objects specified by
+        their brick names and object IDs. The objects are sorted by brick
+        once, so each brick is a contiguous slice, and each tractor file is
+        memory-mapped and only the requested columns of the objects in the
+        brick are read. Bricks are read in a thread pool of `n_thread`
+        threads. 
+
+        :param columns: 
+            list of tractor column names 
+
+        :param footprint: 
+            (optional) `footprint.Footprint` used to look up the tractor
+            files. (default: files in `tractor_dir`) 
+
+        :return tractor_dict: 
+            dictionary of the columns in the same order as `brickname`
+        '''
+        brickname = np.asarray(brickname) 
+        objids = np.asarray(objids) 
+        # contiguous slices of each brick 
+        isort = np.argsort(brickname, kind='mergesort') 
+        bricks_uniq, i0s, counts = np.unique(brickname[isort], return_index=True, return_counts=True)
+
+        if footprint is not None: 
+            names = footprint.brick_files(bricks_uniq) 
+        else: 
+            names = [] 
+            for brick in bricks_uniq: 
+                if isinstance(brick, bytes): brick = brick.decode() 
+                name = ''.join([tractor_dir, brick[:3], '/tractor-', brick, '.fits'])
+                if not os.path.isfile(name): raise ValueError('%s tractor file not available' % name)
+                names.append(name) 
+
+        args = [(name, objids[isort[i0:i0+n]], columns) for name, i0, n in zip(names, i0s, counts)]
+        if n_thread > 1: 
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(processes=n_thread) 
+            brick_cols = pool.imap(_read_tractor_rows, args) 
+        else: 
+            brick_cols = map(_read_tractor_rows, args) 
+
+        tractor_dict = {} 
+        for ii, i0, n, cols in zip(range(len(names)), i0s, counts, brick_cols): 
+            if not silent: print('%i of %i unique bricks -- %s' % (ii, len(names), names[ii])) 
+            for key in columns: 
+                if key not in tractor_dict.keys(): 
+                    # numerical columns are returned as float64 as before 
+                    dtype = cols[key].dtype
+                    if np.issubdtype(dtype, np.number) or dtype == bool: dtype = float
+                    tractor_dict[key] = np.zeros((len(brickname),) + cols[key].shape[1:], 
+                            dtype=dtype)
+                tractor_dict[key][isort[i0:i0+n]] = cols[key]
+        if n_thread > 1: 
+            pool.close() 
+            pool.join() 
+        assert np.sum(counts) == len(brickname) 
+        return tractor_dict
+
+
+def _columns_checksum(cols): 
+    ''' cheap checksum of equal length columns (a weighted sum of each column)
+    used to detect in-place changes 
+    '''
+    w = np.linspace(1., 2., len(cols[0])) 
+    return np.array([np.dot(np.asarray(c, dtype=float), w) for c in cols])
+
+
+class LazyCatalog(Mapping): 
+    ''' read-on-access view of an hdf5 catalog with the same nested
+    dictionary interface as the dictionaries returned by `Read`, i.e.
+    catalog[group][column]. The file is opened once and each column is only
+    read (and then cached) the first time it is accessed. The file stays open
+    until `close` is called; it can also be used as a context manager. 
+
+    :param fname: 
+        hdf5 file name 
+
+    :param columns: 
+        (optional) dictionary of the groups and the columns within each group
+        to include, e.g. {'gama-spec': ['z'], 'legacy-photo': ['flux_r']}. 
+        `None` for a group includes all of its columns. Groups that are not
+        in the dictionary are excluded. (default: all groups and columns) 
+
+    :param rows: 
+        (optional) slice, boolean array, or index array of the rows to read.
+        (default: all rows) 
+    '''
+    def __init__(self, fname, columns=None, rows=None): 
+        self.fname = fname 
+        self.rows = rows 
+        self._absmag = {} # memoized `GamaLegacy.AbsMag` 
+        self._file = h5py.File(fname, 'r') 
+        if columns is None: columns = dict([(g, None) for g in self._file.keys()])
+        self._groups = {} 
+        for g in columns.keys(): 
+            if g not in self._file.keys(): 
+                raise KeyError('%s does not have group %s' % (fname, g))
+            self._groups[g] = _LazyGroup(self._file[g], columns[g], rows)
+
+    def __getitem__(self, g): 
+        return self._groups[g]
+
+    def __iter__(self): 
+        return iter(self._groups)
+
+    def __len__(self): 
+        return len(self._groups) 
+
+    def copy(self): 
+        ''' read all the included columns into a nested dictionary 
+        '''
+        return dict([(g, self._groups[g].copy()) for g in self._groups.keys()])
+
+    def close(self): 
+        self._file.close() 
+        return None 
+
+    def __enter__(self): 
+        return self 
+
+    def __exit__(self, *exc): 
+        self.close() 
+        return False 
+
+
+class _LazyGroup(MutableMapping): 
+    ''' columns of an hdf5 group that are read on first access. Columns can
+    be assigned and deleted like a dictionary without modifying the file. 
+    '''
+    def __init__(self, grp, columns=None, rows=None): 
+        self._grp = grp 
+        self._rows = rows 
+        if columns is None: columns = list(grp.keys()) 
+        for key in columns: 
+            if key not in grp.keys(): 
+                raise KeyError('group %s does not have column %s' % (grp.name, key))
+        self._columns = list(columns) 
+        self._data = {} 
+
+    def __getitem__(self, key): 
+        if key not in self._data: 
+            if key not in self._columns: raise KeyError(key) 
+            self._data[key] = _read_rows(self._grp[key], self._rows)
+        return self._data[key]
+
+    def __setitem__(self, key, value): 
+        if key not in self._columns: self._columns.append(key)
+        self._data[key] = value 
+
+    def __delitem__(self, key): 
+        self._columns.remove(key) 
+        self._data.pop(key, None) 
+
+    def __iter__(self): 
+        return iter(self._columns) 
+
+    def __len__(self): 
+        return len(self._columns) 
+
+    def copy(self): 
+        return dict([(key, self[key]) for key in self._columns])
+
+
+def _read_rows(ds, rows): 
+    ''' read rows of an hdf5 dataset. Index arrays are read as the contiguous
+    block spanning them, which is much faster than h5py fancy indexing, and
+    then indexed in memory.
+    '''
+    if rows is None: return ds[...]
+    if isinstance(rows, slice): return ds[rows]
+    rows = np.asarray(rows) 
+    if rows.dtype == bool: 
+        if len(rows) != ds.shape[0]: 
+            raise IndexError('boolean rows of length %i for %s with %i rows' % (len(rows), ds.name, ds.shape[0]))
+        rows = np.arange(len(rows))[rows] 
+    if len(rows) == 0: return ds[0:0]
+    rows = np.where(rows < 0, rows + ds.shape[0], rows) # negative indices 
+    i0, i1 = rows.min(), rows.max() + 1
+    return ds[i0:i1][rows - i0]
+
+
+class CatalogView(MutableMapping): 
+    ''' index view of a catalog with the catalog[group][column] interface.
+    The view only holds the row index; columns are gathered from the parent
+    catalog (dictionary, `LazyCatalog`, or `CatalogView`) on first access
+    and then cached. Views of views compose their indices, so chained
+    selections do not make intermediate copies, and contiguous row ranges
+    are returned as numpy views rather than copies. These views are
+    read-only, so that editing a subsample does not write through to the
+    parent catalog; assign a modified copy instead, e.g. 
+    view['gama-spec']['z'] = view['gama-spec']['z'] + dz. Groups assigned to
+    the view (e.g. view['forwardmodel'] = {...}) are stored as they are. 
+
+    :param catalog: 
+        parent catalog 
+
+    :param index: 
+        boolean mask or integer index array of the rows of `catalog` 
+    '''
+    def __init__(self, catalog, index): 
+        index = np.asarray(index) 
+        if index.dtype == bool: 
+            index = np.flatnonzero(index) 
+        elif index.size == 0: 
+            index = index.astype(np.intp) 
+        elif index.dtype.kind not in 'iu': 
+            raise ValueError('index has to be a boolean mask or an integer array') 
+
+        self._groups = {} 
+        self._absmag = {} # memoized `GamaLegacy.AbsMag` 
+        if isinstance(catalog, CatalogView): 
+            # compose with the parent index instead of gathering its columns.
+            # Columns and groups assigned to the parent are indexed directly. 
+            parent, catalog = catalog, catalog._catalog 
+            self.index = parent.index[index] 
+            for g in parent._groups.keys(): 
+                pgrp = parent._groups[g] 
+                if not isinstance(pgrp, _ViewGroup) or g not in catalog.keys(): 
+                    self._groups[g] = _ViewGroup(pgrp, _contiguous(index))
+                    continue 
+                grp = _ViewGroup(catalog[g], _contiguous(self.index))
+                grp._columns = [key for key in grp._columns if key in pgrp._columns]
+                for key in pgrp._assigned: 
+                    grp[key] = pgrp[key][index] 
+                self._groups[g] = grp 
+        else: 
+            self.index = index 
+            for g in catalog.keys(): 
+                self._groups[g] = _ViewGroup(catalog[g], _contiguous(index))
+        self._catalog = catalog 
+
+    def select(self, index): 
+        ''' view of a subset of the rows of this view 
+        '''
+        return CatalogView(self, index) 
+
+    def __getitem__(self, g): 
+        return self._groups[g] 
+
+    def __setitem__(self, g, value): 
+        self._groups[g] = value 
+
+    def __delitem__(self, g): 
+        del self._groups[g] 
+
+    def __iter__(self): 
+        return iter(self._groups) 
+
+    def __len__(self): 
+        return len(self._groups) 
+
+    def copy(self): 
+        ''' gather all the columns into a nested dictionary 
+        '''
+        return dict([(g, dict([(k, self._groups[g][k]) for k in self._groups[g].keys()])) 
+            for g in self._groups.keys()])
+
+
+class _ViewGroup(MutableMapping): 
+    ''' columns of a catalog group gathered on first access 
+    '''
+    def __init__(self, grp, index): 
+        self._grp = grp 
+        self._index = index 
+        self._columns = list(grp.keys()) 
+        self._assigned = [] 
+        self._data = {} 
+
+    def __getitem__(self, key): 
+        if key not in self._data: 
+            if key not in self._columns: raise KeyError(key) 
+            col = self._grp[key][self._index]
+            # views of the parent column are read-only 
+            if isinstance(self._index, slice) and isinstance(col, np.ndarray): 
+                col.flags.writeable = False 
+            self._data[key] = col 
+        return self._data[key]
+
+    def __setitem__(self, key, value): 
+        if key not in self._columns: self._columns.append(key)
+        if key not in self._assigned: self._assigned.append(key) 
+        self._data[key] = value 
+
+    def __delitem__(self, key): 
+        self._columns.remove(key) 
+        if key in self._assigned: self._assigned.remove(key) 
+        self._data.pop(key, None) 
+
+    def __iter__(self): 
+        return iter(self._columns) 
+
+    def __len__(self): 
+        return len(self._columns) 
+
+
+def _contiguous(index): 
+    ''' a slice if the index array is a contiguous increasing range of
+    non-negative rows, so that indexing returns a view instead of a copy.
+    Otherwise the index. 
+    '''
+    if len(index) == 0 or index[0] < 0: return index 
+    i0, i1 = index[0], index[-1] + 1 
+    if i1 - i0 == len(index) and np.all(np.diff(index) == 1): return slice(i0, i1) 
+    return index 
+
+
+def _read_tractor_rows(args): 
+    ''' read columns of the objects with the given object IDs from a
+    memory-mapped tractor file. The object IDs are used as row indices when
+    they match the objid column; otherwise rows are looked up by objid.
+    '''
+    name, objids, columns = args 
+    with fits.open(name, memmap=True) as hdul: 
+        tractor = hdul[1].data 
+        tr_objid = tractor['objid'] 
+        rows = np.clip(objids, 0, len(tr_objid)-1) 
+        if not np.array_equal(tr_objid[rows], objids): 
+            isort = np.argsort(tr_objid) 
+            rows = isort[np.clip(np.searchsorted(tr_objid, objids, sorter=isort), 0, len(tr_objid)-1)]
+            if not np.array_equal(tr_objid[rows], objids): 
+                raise ValueError('objects are missing from %s' % name) 
+        cols = {} 
+        for key in columns: 
+            cols[key] = np.array(tractor[key][rows]) 
+    return cols 
+
+
+def _evaluate_cuts(args): 
+    ''' evaluate a list of (name, columns, cut) on a dictionary of columns 
+
+    :return passes: 
+        (number of cuts, number of rows) boolean array 
+    '''
+    cuts, col = args 
+    return np.array([cut(col) for _, _, cut in cuts]).reshape(len(cuts), -1)
+
+
+def radec_tree(ra, dec): 
+    ''' KDTree of the 3-D unit vectors of (ra, dec) positions in degrees 
+    '''
+    return cKDTree(_unit_vectors(ra, dec))
+
+
+def radec_match(tree, ra, dec, radius): 
+    ''' match (ra, dec) positions to their nearest neighbor in `radec_tree`
+    within `radius` degrees. 
+
+    :return i, i_tree, sep: 
+        indices of the matched positions, indices of their matches in the
+        tree, and the separations [deg] 
+    '''
+    # chord length corresponding to the angular radius 
+    chord = 2. * np.sin(0.5 * np.radians(radius))
+    dist, i_tree = tree.query(_unit_vectors(ra, dec), distance_upper_bound=chord)
+    i = np.arange(len(dist))[np.isfinite(dist)]
+    return i, i_tree[i], np.degrees(2. * np.arcsin(0.5 * dist[i]))
+
+
+def _unit_vectors(ra, dec): 
+    ra, dec = np.radians(np.asarray(ra, dtype=float)), np.radians(np.asarray(dec, dtype=float))
+    return np.array([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)]).T
+
+
+_MATCH_TREE = None 
+
+
+def _init_match_tree(ra, dec): 
+    ''' build the KDTree that sweep files are matched against (once per process) 
+    '''
+    global _MATCH_TREE
+    _MATCH_TREE = radec_tree(ra, dec) 
+    return None 
+
+
+def _match_sweep(args): 
+    ''' match the objects of a sweep file to `_MATCH_TREE` and read the
+    columns of the matched objects. The sweep file is memory-mapped so only
+    RA, Dec and the requested columns of the matched rows are read.
+    '''
+    fsweep, columns, radius = args
+    with fits.open(fsweep, memmap=True) as hdul: 
+        sweep = hdul[1].data 
+        i_sweep, i_tree, _ = radec_match(_MATCH_TREE, sweep['ra'], sweep['dec'], radius) 
+        if columns is None: 
+            columns = sweep.names 
+        else: 
+            columns = list(columns) + [k for k in ['ra', 'dec', 'brickname', 'objid'] 
+                    if k not in [c.lower() for c in columns]]
+        cols = {} 
+        for key in columns: 
+            cols[key.lower()] = np.array(sweep[key][i_sweep]) 
+    return i_tree, cols
 
 
 class Legacy(Catalog): 
@@ -581,41 +1017,127 @@ class Legacy(Catalog):
             _fsweep = os.path.join(UT.dat_dir(), 'survey_validation', 'legacy_sweeps.1400deg2.hdf5')
         else: 
             _fsweep = os.path.join(UT.dat_dir(), 'survey_validation', 'legacy_sweeps.1400deg2.rlim%.1f.hdf5' % rlimit)
-        fsweep = h5py.File(_fsweep, 'r') 
-        sweep = {} 
-        for k in fsweep.keys(): sweep[k] = fsweep[k][...]
-        print('%i sweep objects' % len(sweep['flux_r']))
-
-        # spatial masking 
-        _spatial_mask = self.spatial_mask(sweep['maskbits'], [sweep['nobs_g'], sweep['nobs_r'], sweep['nobs_z']])
-        print('%i spatial mask' % np.sum(_spatial_mask))
-        
-        # star-galaxy separation 
-        _star_galaxy = self.star_galaxy(sweep['gaia_phot_g_mean_mag'], sweep['flux_r'])
-        print('%i star-galaxy separation' % np.sum(_star_galaxy))
-
-        # quality cut 
-        gmag = self.flux_to_mag(sweep['flux_g']/sweep['mw_transmission_g']) 
-        rmag = self.flux_to_mag(sweep['flux_r']/sweep['mw_transmission_r'])
-        zmag = self.flux_to_mag(sweep['flux_z']/sweep['mw_transmission_z'])
-        _quality_cut = self.quality_cut(
-                np.array([sweep['fracflux_g'], sweep['fracflux_r'], sweep['fracflux_z']]), 
-                np.array([sweep['fracmasked_g'], sweep['fracmasked_r'], sweep['fracmasked_z']]),
-                np.array([sweep['fracin_g'], sweep['fracin_r'], sweep['fracin_z']]), 
-                gmag - rmag, 
-                rmag - zmag) 
-        print('%i quality cut' % np.sum(_quality_cut))
-
-        sample_select = (_spatial_mask & _star_galaxy & _quality_cut) 
-
-        print('%i (spatial mask) & (star-galaxy sep.) & (quality cut)' % (np.sum(sample_select)))
-        fout = os.path.join(UT.dat_dir(), 'survey_validation', 'bgs.1400deg2.rlim%.1f.hdf5' % rlimit)
+        if rlimit is None: 
+            fout = os.path.join(UT.dat_dir(), 'survey_validation', 'bgs.1400deg2.hdf5')
+        else: 
+            fout = os.path.join(UT.dat_dir(), 'survey_validation', 'bgs.1400deg2.rlim%.1f.hdf5' % rlimit)
+
+        counts = self.select_chunked(_fsweep, fout, silent=False) 
+        print('%i (spatial mask) & (star-galaxy sep.) & (quality cut)' % counts['all'])
+        return None 
+
+    def bgs_cuts(self): 
+        ''' BGS target selection cuts as a list of (name, columns, cut) where
+        `columns` are the sweep columns the cut needs and `cut` is a function
+        of a dictionary of those columns that returns a boolean array.
+        '''
+        def _spatial_mask(col): 
+            return self.spatial_mask(col['maskbits'], [col['nobs_g'], col['nobs_r'], col['nobs_z']])
+
+        def _star_galaxy(col): 
+            return self.star_galaxy(col['gaia_phot_g_mean_mag'], col['flux_r'])
+
+        def _quality_cut(col): 
+            gmag = self.flux_to_mag(col['flux_g']/col['mw_transmission_g']) 
+            rmag = self.flux_to_mag(col['flux_r']/col['mw_transmission_r'])
+            zmag = self.flux_to_mag(col['flux_z']/col['mw_transmission_z'])
+            return self.quality_cut(
+                    np.array([col['fracflux_g'], col['fracflux_r'], col['fracflux_z']]), 
+                    np.array([col['fracmasked_g'], col['fracmasked_r'], col['fracmasked_z']]),
+                    np.array([col['fracin_g'], col['fracin_r'], col['fracin_z']]), 
+                    gmag - rmag, 
+                    rmag - zmag) 
+
+        cols_quality = []
+        for k in ['fracflux_', 'fracmasked_', 'fracin_', 'flux_', 'mw_transmission_']: 
+            cols_quality += [k+b for b in 'grz']
+        return [
+                ('spatial mask', ['maskbits', 'nobs_g', 'nobs_r', 'nobs_z'], _spatial_mask), 
+                ('star-galaxy sep.', ['gaia_phot_g_mean_mag', 'flux_r'], _star_galaxy), 
+                ('quality cut', cols_quality, _quality_cut)]
+
+    def select_chunked(self, fsweep, fout, cuts=None, columns=None, chunk=1000000, 
+            n_thread=1, silent=True): 
+        ''' out-of-core target selection on a sweep hdf5 file. The file is
+        read `chunk` rows at a time and only the columns that the cuts need are
+        read for every row. The rows that pass all the cuts are then read for
+        the output `columns` and appended to `fout`, so memory scales with
+        `chunk` rather than the size of the file. 
+
+        :param fsweep: 
+            sweep hdf5 file with one dataset per column 
+
+        :param fout: 
+            output hdf5 file of the selected rows 
+
+        :param cuts: 
+            (optional) list of (name, columns, cut). (default: `bgs_cuts()`) 
+
+        :param columns: 
+            (optional) columns to write out. (default: all columns) 
+
+        :param chunk: 
+            number of rows per chunk (default: 1000000) 
+
+        :param n_thread: 
+            If > 1, the cuts of each chunk are evaluated on `n_thread` slices
+            of the chunk in a thread pool. numpy releases the GIL in the
+            element-wise operations, so the slices run concurrently. 
+
+        :return counts: 
+            dictionary with the number of rows that pass each cut, all the
+            cuts ('all'), and the total number of rows ('total') 
+        '''
+        if cuts is None: cuts = self.bgs_cuts() 
+        if n_thread > 1: 
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(processes=n_thread) 
+
+        counts = dict([(name, 0) for name, _, _ in cuts])
+        counts['all'] = 0 
+
+        fin = h5py.File(fsweep, 'r') 
+        if columns is None: columns = list(fin.keys()) 
+        cut_cols = [] 
+        for _, cols, _ in cuts: cut_cols += [c for c in cols if c not in cut_cols]
+        nrow = fin[cut_cols[0]].shape[0] 
+        counts['total'] = nrow 
+
         f = h5py.File(fout, 'w') 
-        for k in sweep.keys(): 
-            self._h5py_create_dataset(f, k, sweep[k][sample_select])
+        for i0 in range(0, nrow, chunk): 
+            i1 = min(i0 + chunk, nrow) 
+            # contiguous reads of only the columns used in the cuts 
+            col = dict([(c, fin[c][i0:i1]) for c in cut_cols])
+
+            if n_thread > 1: 
+                edges = np.linspace(0, i1 - i0, n_thread + 1).astype(int) 
+                args = [(cuts, dict([(c, col[c][e0:e1]) for c in cut_cols])) 
+                        for e0, e1 in zip(edges[:-1], edges[1:])]
+                passes = np.concatenate(pool.map(_evaluate_cuts, args), axis=1) 
+            else: 
+                passes = _evaluate_cuts((cuts, col)) 
+            del col 
+
+            for (name, _, _), _pass in zip(cuts, passes): 
+                counts[name] += np.sum(_pass) 
+            select = np.all(passes, axis=0) 
+            counts['all'] += np.sum(select) 
+
+            # write the selected rows 
+            if np.sum(select) > 0: 
+                for k in columns: 
+                    self._h5py_append_dataset(f, k, fin[k][i0:i1][select])
+            if not silent: 
+                print('%i of %i rows, %i selected' % (i1, nrow, counts['all']))
         f.close() 
-        return None 
-        return None 
+        fin.close() 
+        if n_thread > 1: 
+            pool.close() 
+            pool.join() 
+
+        if not silent: 
+            for name, _, _ in cuts: print('%i %s' % (counts[name], name))
+        return counts 
 
     def _1400deg2_area(self): 
         ''' area of 1400 deg^2 test region  
@@ -671,51 +1193,47 @@ class Legacy(Catalog):
         * large galaxies 
         '''
         nobs_g, nobs_r, nobs_z = nobs 
-        BS = (np.uint64(maskbits) & np.uint64(2**1))!=0    # bright stars
-        MS = (np.uint64(maskbits) & np.uint64(2**11))!=0   # medium bright stars 
-        GC = (np.uint64(maskbits) & np.uint64(2**13))!=0   # clusters 
-        LG = (np.uint64(maskbits) & np.uint64(2**12))!=0   # large galaxies 
-        allmask = ((maskbits & 2**6) != 0) | ((maskbits & 2**5) != 0) | ((maskbits & 2**7) != 0)
-        nobs = ((nobs_g < 1) | (nobs_r < 1) | (nobs_z < 1)) 
-        mask = ~(BS | MS | GC | LG | allmask | nobs) 
+        # bright stars (1), medium bright stars (11), clusters (13), 
+        # large galaxies (12), and ALLMASK (5, 6, 7) in a single bitmask 
+        bits = (2**1 | 2**11 | 2**13 | 2**12 | 2**5 | 2**6 | 2**7)
+        mask = ((np.asarray(maskbits) & bits) == 0) 
+        mask &= (nobs_g >= 1) & (nobs_r >= 1) & (nobs_z >= 1) 
         return mask
 
-    def _collect_1400deg2_test(self, dr=8, rlimit=None): 
+    def _collect_1400deg2_test(self, dr=8, rlimit=None, dir_store=None): 
         ''' collect sweeps data within the same 1400 deg2 test region that Omar used for dr7 
         and save to file. 
+
+        :param dir_store: 
+            (optional) directory of a `sweepstore.SweepStore` of the sweeps.
+            If specified, only the HEALPix pixels of the store that overlap
+            with the region are read instead of scanning the sweep files. 
         '''
-        import glob 
         if dr != 8: raise NotImplementedError
-        if os.environ['NERSC_HOST'] != 'cori': raise ValueError('this script is meant to run on cori only') 
     
         # hardcoded patch of sky 
         ra_min, ra_max      = 160., 230.
         dec_min, dec_max    = -2., 18.
 
-        dir_legacy = '/project/projectdirs/cosmo/data/legacysurvey/'
-        dir_north = os.path.join(dir_legacy, 'dr8/north/sweep/8.0')
-        dir_south = os.path.join(dir_legacy, 'dr8/south/sweep/8.0')
-        
-        fsweeps_N = glob.glob('%s/*.fits' % dir_north) 
-        print('%i North sweep files' % len(fsweeps_N))
-        fsweeps_S = glob.glob('%s/*.fits' % dir_south) 
-        print('%i South sweep files' % len(fsweeps_S))
-        fsweeps = sorted([os.path.join(dir_north, _fs) for _fs in fsweeps_N] + [os.path.join(dir_south, _fs) for _fs in fsweeps_S])
+        if dir_store is not None: 
+            from .sweepstore import SweepStore
+            sweeps = SweepStore(dir_store).box([ra_min, ra_max], [dec_min, dec_max]) 
+            if rlimit is not None: 
+                rflux = sweeps['flux_r'] / sweeps['mw_transmission_r'] 
+                rcut = (rflux > 10**((22.5-rlimit)/2.5)) 
+                for k in sweeps.keys(): sweeps[k] = sweeps[k][rcut] 
+            print('%i obj in region' % len(sweeps['ra']))
+            return self._write_1400deg2_test(sweeps, rlimit=rlimit)
+
+        if os.environ['NERSC_HOST'] != 'cori': raise ValueError('this script is meant to run on cori only') 
+
+        # north and south sweep files that overlap with the region 
+        fp = FP.footprint(dr) 
+        fsweeps = sorted(fp.rectangle([ra_min, ra_max], [dec_min, dec_max], kind='sweep')['path'])
+        print('%i sweep files overlap with the region' % len(fsweeps))
     
         sweeps = {} 
         for _fsweep in fsweeps: 
-            # get sweep RA and Dec range 
-            sweep_ra_min, sweep_ra_max, sweep_dec_min, sweep_dec_max = self._parse_brickname(_fsweep) 
-    
-            # check whether it's in the region or not 
-            not_in_region = (
-                    (sweep_ra_max < ra_min) | 
-                    (sweep_ra_min > ra_max) | 
-                    (sweep_dec_max < dec_min) | 
-                    (sweep_dec_min > dec_max)
-                    ) 
-            if not_in_region: continue 
-    
             # read sweep file 
             sweep = fits.open(_fsweep)[1].data
             
@@ -742,6 +1260,11 @@ class Legacy(Catalog):
                 for k in sweep.names: 
                     sweeps[k] = np.concatenate([sweeps[k], sweep[k][mask_region & rcut]], axis=0) 
 
+        return self._write_1400deg2_test(sweeps, rlimit=rlimit)
+
+    def _write_1400deg2_test(self, sweeps, rlimit=None): 
+        ''' write sweeps data in the 1400 deg2 test region to file 
+        '''
         if rlimit is None:  
             fout = os.path.join(UT.dat_dir(), 'survey_validation', 'legacy_sweeps.1400deg2.hdf5')
         else: 
@@ -753,23 +1276,9 @@ class Legacy(Catalog):
         return None 
        
     def _parse_brickname(self, brickname): 
-        ''' parse ra and dec range from brick name 
+        ''' parse ra and dec range from sweep file name (see `footprint.sweep_bounds`) 
         '''
-        name = os.path.basename(brickname).replace('.fits', '') # get rid of directory and ext 
-        radec1 = name.split('-')[1]
-        radec2 = name.split('-')[2] 
-        
-        if 'p' in radec1: _c = 'p'
-        elif 'm' in radec1: _c = 'm' 
-        ra_min = float(radec1.split(_c)[0]) 
-        dec_min = float(radec1.split(_c)[1]) 
-
-        if 'p' in radec2: _c = 'p'
-        elif 'm' in radec2: _c = 'm' 
-        ra_max = float(radec2.split(_c)[0]) 
-        dec_max = float(radec2.split(_c)[1]) 
-
-        return ra_min, ra_max, dec_min, dec_max
+        return FP.sweep_bounds(brickname) 
     
     def _Tycho(self, ra_lim=None, dec_lim=None): 
         ''' read in tycho2 catalog within RA and Dec range 
@@ -225,35 +225,12 @@ def _convert_sky_rate(inc, good_sky, _exptime, band):
 def _get_obs_param(ra, dec, mjd):
     ''' get observing condition given tileid and time of observation 
     '''
-    from astropy.time import Time
-    from astropy.coordinates import EarthLocation, SkyCoord, AltAz, get_sun, get_moon
-    kpno = EarthLocation.of_site('kitt peak')
-
-    # get observing conditions
-    coord = SkyCoord(ra=ra * u.deg, dec=dec * u.deg) 
-    utc_time = Time(mjd, format='mjd') # observed time (UTC)          
-
-    kpno_altaz = AltAz(obstime=utc_time, location=kpno) 
-    coord_altaz = coord.transform_to(kpno_altaz)
-
-    airmass = coord_altaz.secz
-
-    # sun
-    sun         = get_sun(utc_time) 
-    sun_altaz   = sun.transform_to(kpno_altaz) 
-    sun_alt     = sun_altaz.alt.deg
-    sun_sep     = sun.separation(coord).deg # sun separation
-    # moon
-    moon        = get_moon(utc_time)
-    moon_altaz  = moon.transform_to(kpno_altaz) 
-    moon_alt    = moon_altaz.alt.deg 
-    moon_sep    = moon.separation(coord).deg #coord.separation(self.moon).deg
-            
-    elongation  = sun.separation(moon)
-    phase       = np.arctan2(sun.distance * np.sin(elongation), moon.distance - sun.distance*np.cos(elongation))
-    moon_phase  = phase.value
-    moon_ill    = (1. + np.cos(phase))/2.
-    return airmass, moon_ill.value, moon_alt, moon_sep, sun_alt, sun_sep
+    from . import ephemeris as Ephem
+    # mjd is a single time so the moon and sun parameters are the same for all
+    # the fibers
+    geo = Ephem.sky_geometry(ra, dec, mjd)
+    return (geo['airmass'], geo['moon_ill'][0], geo['moon_alt'][0], geo['moon_sep'], 
+            geo['sun_alt'][0], geo['sun_sep'])
 
 
 def _get_dates(tileid): 
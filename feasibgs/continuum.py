@@ -0,0 +1,272 @@
+'''
+
+continuum extraction for stacks of sky spectra. The spectra are passed as
+(nsky, nwave) arrays and filtered along the wavelength axis all at once
+rather than one sky at a time. Also includes the airglow and lamp emission
+line masks used to select continuum pixels.
+
+'''
+import os
+import h5py
+import hashlib
+import numpy as np
+from multiprocessing import Pool
+from scipy.signal import medfilt
+from scipy.ndimage import gaussian_filter1d
+# -- feasibgs --
+from . import util as UT
+
+
+# mercury and sodium lamp lines [A]
+lamp_lines = np.array([4047, 4048, 4165, 4168, 4358, 4420, 4423, 4665, 4669, 4827,
+    4832, 4983, 5461, 5683, 5688, 5770, 5791, 5893, 6154, 6161])
+
+_UVES_LINES = None
+_EMLINE_MASKS = {}
+
+
+def binned_continuum(wave, sb, wavebin=None):
+    ''' median surface brightness within wavelength bins ignoring non-finite
+    pixels. Bins without any finite pixels are set to 0.
+
+    :param wave:
+        (nwave,) wavelength array
+
+    :param sb:
+        (nwave,) or (nsky, nwave) surface brightnesses
+
+    :param wavebin:
+        (optional) wavelength bin edges. (default: 9 bins between 3600 and
+        10000 A)
+
+    :return wmid, sb_med:
+        bin centers and (nbin,) or (nsky, nbin) median surface brightnesses
+    '''
+    if wavebin is None: wavebin = np.linspace(3.6e3, 1e4, 10)
+    sb2d = np.atleast_2d(np.array(sb, dtype=float))
+    sb2d[~np.isfinite(sb2d)] = np.nan
+
+    sb_med = np.zeros((sb2d.shape[0], len(wavebin)-1))
+    for i in range(len(wavebin)-1):
+        inwbin = (wavebin[i] < wave) & (wave < wavebin[i+1])
+        if np.sum(inwbin) == 0: continue
+        _sb = sb2d[:,inwbin]
+        hasfinite = np.any(np.isfinite(_sb), axis=1)
+        sb_med[hasfinite,i] = np.nanmedian(_sb[hasfinite], axis=1)
+
+    wmid = 0.5*(wavebin[1:]+wavebin[:-1])
+    if np.ndim(sb) == 1: return wmid, sb_med[0]
+    return wmid, sb_med
+
+
+def smooth_continuum(sb, medfilt_size=51, sigma=100., n_proc=1):
+    ''' smooth continuum of (nsky, nwave) surface brightnesses: median filter
+    followed by a gaussian filter along the wavelength axis.
+
+    :param medfilt_size:
+        size of the median filter in pixels (default: 51)
+
+    :param sigma:
+        standard deviation of the gaussian filter in pixels (default: 100)
+
+    :param n_proc:
+        number of processes used for the median filter, which dominates the
+        run time. (default: 1)
+    '''
+    sb2d = np.atleast_2d(sb)
+    if n_proc > 1 and sb2d.shape[0] > 1:
+        chunks = np.array_split(sb2d, min(n_proc, sb2d.shape[0]), axis=0)
+        pool = Pool(processes=n_proc)
+        try:
+            sb_med = np.concatenate(pool.map(_medfilt_rows,
+                [(chunk, medfilt_size) for chunk in chunks]), axis=0)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        sb_med = _medfilt_rows((sb2d, medfilt_size))
+    cont = gaussian_filter1d(sb_med, sigma, axis=1)
+    if np.ndim(sb) == 1: return cont[0]
+    return cont
+
+
+def _medfilt_rows(args):
+    sb, size = args
+    return medfilt(np.asarray(sb, dtype=float), [1, size])
+
+
+def continuum_at(wave, sb, wrefs, mask=None, dw=5., **kwargs):
+    ''' continuum surface brightness of (nsky, nwave) spectra at reference
+    wavelengths. The smooth continuum is calculated once and the median
+    within `dw` of each reference wavelength is returned.
+
+    :param wrefs:
+        reference wavelengths (same units as `wave`)
+
+    :param mask:
+        (optional) boolean array of wavelength pixels to include (e.g.
+        excluding emission lines)
+
+    :param dw:
+        half width of the window around each reference wavelength
+
+    :param kwargs:
+        passed to `smooth_continuum`
+
+    :return cont:
+        (nsky, nref) continuum surface brightnesses
+    '''
+    cont = np.atleast_2d(smooth_continuum(sb, **kwargs))
+    if mask is None: mask = np.ones(len(wave)).astype(bool)
+
+    wrefs = np.atleast_1d(wrefs)
+    cont_ref = np.zeros((cont.shape[0], len(wrefs)))
+    for i, w in enumerate(wrefs):
+        wlim = (wave > w - dw) & (wave < w + dw) & mask
+        cont_ref[:,i] = np.median(cont[:,wlim], axis=1)
+    return cont_ref
+
+
+def cached_continuum_at(fcache, wrefs, get_spectra, mask=None, dw=5., medfilt_size=51,
+        sigma=100., n_proc=1):
+    ''' `continuum_at` with the results cached in a single HDF5 file. Each
+    continuum is stored as a dataset named by its reference wavelength in a
+    group named by the filter settings and a hash of the spectra and mask, so
+    changing any of them does not return stale continua. The spectra are only
+    filtered if one of the reference wavelengths is not in the cache, in which
+    case all missing wavelengths are calculated in one pass.
+
+    :param fcache:
+        HDF5 cache file name
+
+    :param get_spectra:
+        function that returns (wave, sb)
+
+    :param mask:
+        (optional) function of wave that returns the boolean array of pixels
+        to include
+
+    :return cont:
+        (nsky, nref) continuum surface brightnesses
+    '''
+    wrefs = np.atleast_1d(wrefs)
+    wave, sb = get_spectra()
+    _mask = None if mask is None else mask(wave)
+    grp_name = 'medfilt%i_sigma%.1f_dw%.1f_%s' % (medfilt_size, sigma, dw,
+            _hash_arrays(wave, sb, _mask))
+    keys = ['%.2f' % w for w in wrefs]
+
+    missing = list(range(len(wrefs)))
+    if os.path.isfile(fcache):
+        with h5py.File(fcache, 'r') as f:
+            if grp_name in f.keys():
+                missing = [i for i, k in enumerate(keys) if k not in f[grp_name].keys()]
+
+    if len(missing) > 0:
+        cont = continuum_at(wave, sb, wrefs[missing], mask=_mask, dw=dw,
+                medfilt_size=medfilt_size, sigma=sigma, n_proc=n_proc)
+        with h5py.File(fcache, 'a') as f:
+            grp = f.require_group(grp_name)
+            for ii, i in enumerate(missing):
+                grp.create_dataset(keys[i], data=cont[:,ii])
+
+    with h5py.File(fcache, 'r') as f:
+        return np.array([f[grp_name][k][...] for k in keys]).T
+
+
+def _hash_arrays(*arrs):
+    ''' short hash of the shapes, dtypes, and contents of arrays (None is
+    hashed as a placeholder)
+    '''
+    h = hashlib.sha1()
+    for arr in arrs:
+        if arr is None:
+            h.update(b'None')
+            continue
+        arr = np.ascontiguousarray(arr)
+        h.update(('%s%s' % (arr.dtype.str, arr.shape)).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()[:16]
+
+
+def emline_mask(wave, dwave=5., flux_min=0.5):
+    ''' airglow (UVES) and lamp emission line mask. Pixels within `dwave` of
+    an emission line are False. The masks are cached for each (wavelength
+    grid, dwave, flux_min) so they are only built once for each grid. The
+    returned mask is read-only.
+
+    :param wave:
+        wavelength [A]
+
+    :param dwave:
+        half width of the window around each line [A] (default: 5)
+
+    :param flux_min:
+        only UVES lines brighter than `flux_min` are masked (default: 0.5)
+    '''
+    wave = np.asarray(wave, dtype=float)
+    key = (wave.shape, hash(wave.tobytes()), float(dwave), float(flux_min))
+    if key not in _EMLINE_MASKS:
+        lo, hi = emline_intervals(dwave=dwave, flux_min=flux_min)
+        mask = ~_in_intervals(wave, lo, hi)
+        mask.flags.writeable = False
+        _EMLINE_MASKS[key] = mask
+    return _EMLINE_MASKS[key]
+
+
+def emline_intervals(dwave=5., flux_min=0.5):
+    ''' sorted, non-overlapping (lo, hi) wavelength intervals around the
+    airglow and lamp emission lines. Intervals are open, i.e. lo < w < hi is
+    masked.
+    '''
+    uves_ws, uves_emfluxes = UVES_lines()
+    keep = (uves_emfluxes > flux_min) & (uves_ws >= 3600.) & (uves_ws <= 10400.)
+    lines = np.concatenate([uves_ws[keep] * n_edlen(uves_ws[keep]), lamp_lines])
+    return _merge_intervals(lines - dwave, lines + dwave)
+
+
+def _merge_intervals(lo, hi):
+    ''' merge overlapping open intervals (lo, hi). Intervals that only touch
+    at an end point are not merged since the end point is not masked.
+    '''
+    isort = np.argsort(lo)
+    lo, hi = lo[isort], hi[isort]
+    merged_lo, merged_hi = [lo[0]], [hi[0]]
+    for l, h in zip(lo[1:], hi[1:]):
+        if l < merged_hi[-1]:
+            merged_hi[-1] = max(merged_hi[-1], h)
+        else:
+            merged_lo.append(l)
+            merged_hi.append(h)
+    return np.array(merged_lo), np.array(merged_hi)
+
+
+def _in_intervals(wave, lo, hi):
+    ''' whether each wavelength falls in one of the sorted non-overlapping
+    open intervals (lo, hi)
+    '''
+    i = np.searchsorted(lo, wave, side='left') - 1
+    inside = np.zeros(len(wave)).astype(bool)
+    has = (i >= 0)
+    inside[has] = wave[has] < hi[i[has]]
+    return inside
+
+
+def n_edlen(ll):
+    return 1. + 10**-8 * (8432.13 + 2406030./(130.-(1/ll)**2) + 15977/(38.9 - (1/ll)**2))
+
+
+def UVES_lines():
+    ''' Read airglow emission lines in UVES. The lines are read once and
+    cached.
+    '''
+    global _UVES_LINES
+    if _UVES_LINES is None:
+        wls, emfluxes = [], []
+        for n in ['346', '437', '580L', '580U', '800U', '860L', '860U']:
+            f = os.path.join(UT.code_dir(), 'dat', 'sky', 'UVES_ident', 'gident_%s.dat' % n)
+            wl, emfwhm, emflux = np.loadtxt(open(f, 'rt').readlines()[:-1], skiprows=3, unpack=True, usecols=[1, 3, 4])
+            wls.append(wl)
+            emfluxes.append(emflux)
+        _UVES_LINES = (np.concatenate(wls), np.concatenate(emfluxes))
+    return _UVES_LINES
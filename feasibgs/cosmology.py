@@ -0,0 +1,77 @@
+'''
+
+tabulated distance modulus for flat LCDM cosmologies. Evaluating
+`FlatLambdaCDM.luminosity_distance` integrates the comoving distance for every
+redshift, so the distance modulus is instead tabulated once per (H0, Om0) on
+a dense grid and interpolated.
+
+    dm = distmod(redshift, H0=70, Om0=0.3)
+
+'''
+import numpy as np
+from astropy.cosmology import FlatLambdaCDM
+
+
+_DISTMODS = {}
+
+
+class DistanceModulus(object):
+    ''' distance modulus DM(z) = 5 log10(D_L / 10pc) of a flat LCDM cosmology
+    interpolated from a table. At low redshift D_L ~ cz/H0, so the smooth
+    function DM(z) - 5 log10(z) is tabulated on a grid uniform in ln(z) and
+    linearly interpolated. With the default grid the interpolation error is
+    < 1e-5 mag over the whole table (measured at the grid midpoints and
+    stored in `interp_error`). Redshifts outside (zmin, zmax) are calculated
+    exactly with astropy.
+
+    :param H0:
+        Hubble constant in km/s/Mpc (default: 70)
+
+    :param Om0:
+        matter density (default: 0.3)
+
+    :param zmin, zmax:
+        redshift range of the table (default: 1e-5, 5)
+
+    :param nz:
+        number of grid points (default: 4001)
+    '''
+    def __init__(self, H0=70, Om0=0.3, zmin=1e-5, zmax=5., nz=4001):
+        self.H0 = H0
+        self.Om0 = Om0
+        self.zmin = zmin
+        self.zmax = zmax
+        self.cosmo = FlatLambdaCDM(H0=H0, Om0=Om0)
+
+        self._lnz = np.linspace(np.log(zmin), np.log(zmax), nz)
+        self._dm = self._exact(np.exp(self._lnz)) - 5. * self._lnz / np.log(10.)
+
+        # interpolation error at the midpoints of the grid
+        lnz_mid = 0.5 * (self._lnz[1:] + self._lnz[:-1])
+        self.interp_error = np.max(np.abs(self(np.exp(lnz_mid)) - self._exact(np.exp(lnz_mid))))
+
+    def __call__(self, z):
+        ''' distance modulus of redshifts `z`
+        '''
+        z = np.asarray(z, dtype=float)
+        dm = np.empty(z.shape)
+        intable = (z >= self.zmin) & (z <= self.zmax)
+        lnz = np.log(z[intable])
+        dm[intable] = np.interp(lnz, self._lnz, self._dm) + 5. * lnz / np.log(10.)
+        if not np.all(intable):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dm[~intable] = self._exact(z[~intable])
+        return dm
+
+    def _exact(self, z):
+        return 5. * np.log10(1e5 * self.cosmo.luminosity_distance(z).value)
+
+
+def distmod(z, H0=70, Om0=0.3):
+    ''' distance modulus of redshifts `z` from a table that is built once per
+    (H0, Om0) and cached for the rest of the process (see `DistanceModulus`)
+    '''
+    key = (float(H0), float(Om0))
+    if key not in _DISTMODS:
+        _DISTMODS[key] = DistanceModulus(H0=H0, Om0=Om0)
+    return _DISTMODS[key](z)
@@ -0,0 +1,147 @@
+'''
+
+index of the domain of observing conditions covered by a set of training or
+calibration points (e.g. the GP training set or the BOSS skies). Emulators
+and sky models use it to flag extrapolation: conditions are inside the
+domain if they fall within the bounding box of the training points and
+within `radius` of their nearest training point. The nearest neighbor
+queries use a KDTree so batches of conditions are checked at negligible
+cost compared to a high dimensional Delaunay triangulation.
+
+'''
+import os
+import hashlib
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class ConditionDomain(object):
+    ''' KDTree index of the observing conditions covered by training points.
+    Each dimension is divided by `scale` (default: the range of the training
+    points) so distances are dimensionless.
+
+    :param theta:
+        (N, ndim) training conditions
+
+    :param scale:
+        (optional) (ndim,) scale of each dimension. (default: range of the
+        training points in each dimension)
+
+    :param radius:
+        (optional) maximum distance (in scaled units) to the nearest training
+        point for a condition to be inside the domain. (default: largest
+        distance between a training point and its nearest neighbor, i.e. the
+        coarsest sampling of the training set)
+
+    :param names:
+        (optional) names of the dimensions
+    '''
+    def __init__(self, theta, scale=None, radius=None, names=None):
+        self.theta = np.atleast_2d(np.asarray(theta, dtype=float))
+        if scale is None:
+            scale = self.theta.max(axis=0) - self.theta.min(axis=0)
+            scale[scale == 0.] = 1.
+        self.scale = np.asarray(scale, dtype=float)
+        self.names = names
+        self.key = None # set by `cached_domain`
+        self.lo = self.theta.min(axis=0)
+        self.hi = self.theta.max(axis=0)
+        self.tree = cKDTree(self.theta / self.scale)
+
+        if radius is None:
+            # nearest neighbor of each training point other than itself
+            d_nn, _ = self.tree.query(self.tree.data, k=2)
+            radius = d_nn[:,1].max()
+        self.radius = float(radius)
+
+    def query(self, theta):
+        ''' check whether conditions are inside the domain
+
+        :param theta:
+            (M, ndim) or (ndim,) conditions
+
+        :return inside, dist, index:
+            (M,) whether each condition is inside the domain, the distance
+            (in scaled units) to the nearest training point, and the index of
+            the nearest training point
+        '''
+        theta = np.atleast_2d(np.asarray(theta, dtype=float))
+        if theta.shape[1] != self.theta.shape[1]:
+            raise ValueError('conditions have %i dimensions; the domain has %i' %
+                    (theta.shape[1], self.theta.shape[1]))
+        dist, index = self.tree.query(theta / self.scale)
+        inbox = np.all((theta >= self.lo) & (theta <= self.hi), axis=1)
+        return inbox & (dist <= self.radius), dist, index
+
+    def inside(self, theta):
+        ''' whether conditions are inside the domain (see `query`)
+        '''
+        return self.query(theta)[0]
+
+    def distance(self, theta):
+        ''' distance (in scaled units) to the nearest training point
+        '''
+        return self.query(theta)[1]
+
+    def write(self, fname):
+        ''' write the state of the domain to a .npz file. The KDTree is rebuilt
+        when the file is read, which is fast compared to building it from the
+        original training data files.
+        '''
+        state = {'theta': self.theta, 'scale': self.scale, 'radius': self.radius}
+        if self.names is not None: state['names'] = np.array(self.names)
+        if self.key is not None: state['key'] = self.key
+        np.savez(fname, **state)
+        return None
+
+    @classmethod
+    def read(cls, fname):
+        ''' read domain written by `write`
+        '''
+        state = np.load(fname)
+        names = list(state['names']) if 'names' in state.files else None
+        domain = cls(state['theta'], scale=state['scale'], radius=float(state['radius']),
+                names=names)
+        if 'key' in state.files: domain.key = str(state['key'])
+        return domain
+
+
+def cached_domain(fdomain, get_theta, inputs=None, **kwargs):
+    ''' read the domain from `fdomain` if it exists and was built with the
+    same arguments. Otherwise, build it from the training conditions returned
+    by `get_theta()` and write it to `fdomain`. The cached domain is keyed on
+    `get_theta` (by name), `kwargs`, and the size and modification time of
+    the `inputs` files.
+
+    :param inputs:
+        (optional) files that `get_theta` reads the training conditions from
+
+    :param kwargs:
+        passed to `ConditionDomain`
+    '''
+    key = _domain_key(get_theta, inputs, kwargs)
+    if os.path.isfile(fdomain):
+        domain = ConditionDomain.read(fdomain)
+        if domain.key == key: return domain
+    domain = ConditionDomain(get_theta(), **kwargs)
+    domain.key = key
+    if os.path.dirname(fdomain) != '' and not os.path.isdir(os.path.dirname(fdomain)):
+        os.makedirs(os.path.dirname(fdomain))
+    domain.write(fdomain)
+    return domain
+
+
+def _domain_key(get_theta, inputs, kwargs):
+    ''' short hash of the arguments of `cached_domain`
+    '''
+    h = hashlib.sha1()
+    h.update(('%s.%s;' % (getattr(get_theta, '__module__', None),
+        getattr(get_theta, '__qualname__', repr(get_theta)))).encode())
+    for k in sorted(kwargs.keys()):
+        v = kwargs[k]
+        if v is not None: v = np.asarray(v).tolist()
+        h.update(('%s=%r;' % (k, v)).encode())
+    for f in (inputs or []):
+        st = os.stat(f)
+        h.update(('%s:%i:%r;' % (os.path.abspath(f), st.st_size, st.st_mtime)).encode())
+    return h.hexdigest()[:16]
@@ -0,0 +1,276 @@
+'''
+
+precomputed nightly ephemeris at Kitt Peak. Sun set/rise, twilight
+boundaries, moon rise/set and moon illumination are solved once per night for
+2009-2026 (BOSS and DESI years) and stored in a small binary table so that
+they can be looked up by MJD without solving any astronomy equations. Nights
+outside of the table are solved when they are requested.
+
+The module also includes `sky_geometry`, which calculates the airmass, moon,
+and sun parameters for arrays of pointings and times offline.
+
+'''
+import os
+import numpy as np
+from contextlib import contextmanager, ExitStack
+# -- feasibgs --
+from . import util as UT
+
+
+# KPNO is at UTC-7 (MST, no daylight savings) so local noon is 19h UTC
+_noon_utc = 19./24.
+
+# location of the Mayall telescope (same as desisurvey config)
+_kpno_lat = 31.963972222    # deg
+_kpno_lon = -111.599336111  # deg
+_kpno_height = 2120.        # m
+
+_columns = ['noon', 'sunset', 'sunrise', 'dusk_nautical', 'dawn_nautical',
+        'dusk_astronomical', 'dawn_astronomical', 'moonrise', 'moonset',
+        'moon_ill']
+
+_EPHEMERIS = None
+_NIGHTS = {} # nights outside of the table
+
+
+def kpno_ephemeris():
+    ''' nightly ephemeris table at Kitt Peak. Each row is one night that
+    starts at local noon (column `noon`) and ends at the next local noon. All
+    times are UTC MJDs; events that do not occur within the night are NaN.
+    `moon_ill` is the moon illumination fraction at local midnight. The table
+    is read (memory-mapped) once and cached for the rest of the process.
+    '''
+    global _EPHEMERIS
+    if _EPHEMERIS is None:
+        fephem = _ephemeris_file()
+        if not os.path.isfile(fephem): _build_ephemeris(fephem)
+        _EPHEMERIS = np.load(fephem, mmap_mode='r')
+    return _EPHEMERIS
+
+
+def night_index(mjd):
+    ''' index of the night in `kpno_ephemeris` for given MJD(s)
+    '''
+    ephem = kpno_ephemeris()
+    inight = _night_number(mjd)
+    if np.any(inight < 0) or np.any(inight >= len(ephem)):
+        raise ValueError('MJD outside of the range of the ephemeris table: %.1f - %.1f' %
+                (ephem['noon'][0], ephem['noon'][-1] + 1.))
+    return inight
+
+
+def get_night(mjd):
+    ''' ephemeris of the night(s) that contain the given MJD(s). Nights outside
+    of the `kpno_ephemeris` table are solved with `_solve_nights` and cached.
+
+    :param mjd:
+        float or array of UTC MJDs
+
+    :return night:
+        dictionary with the columns of `kpno_ephemeris`
+    '''
+    ephem = kpno_ephemeris()
+    inight = _night_number(mjd)
+    intable = (inight >= 0) & (inight < len(ephem))
+    if np.all(intable):
+        return dict([(k, ephem[k][inight]) for k in _columns])
+
+    # solve the nights that are not in the table or the cache
+    outside = np.unique(inight[~intable])
+    unsolved = np.array([i for i in outside if i not in _NIGHTS], dtype=int)
+    if len(unsolved) > 0:
+        solved = _solve_nights(ephem['noon'][0] + unsolved)
+        for i, row in zip(unsolved, solved): _NIGHTS[i] = row
+
+    night = {}
+    for k in _columns:
+        _night = np.empty(inight.size)
+        _night[intable.ravel()] = ephem[k][inight[intable]]
+        _night[~intable.ravel()] = [_NIGHTS[i][k] for i in inight[~intable]]
+        night[k] = _night.reshape(inight.shape)
+    return night
+
+
+def night_fraction(mjd):
+    ''' fraction of the night between sun set and sun rise at the given MJD(s).
+    This is the fractional hour used in Parker's sky model.
+    '''
+    night = get_night(mjd)
+    return (np.asarray(mjd) - night['sunset']) / (night['sunrise'] - night['sunset'])
+
+
+def sky_geometry(ra, dec, mjd):
+    ''' airmass, moon, and sun parameters at Kitt Peak for pointings (`ra`,
+    `dec`) observed at UTC `mjd`. The inputs are broadcast against each other.
+    The sun and moon positions are only calculated once for each unique MJD
+    and the IERS table bundled with astropy is used, so nothing is downloaded.
+
+    :param ra:
+        right ascension [deg]
+
+    :param dec:
+        declination [deg]
+
+    :param mjd:
+        UTC MJD of the observations
+
+    :return geo:
+        dictionary with (N,) arrays of `airmass`, `moon_ill` (illumination
+        fraction), `moon_phase` (phase angle [deg]; 0 is full and 180 is new),
+        `moon_alt`, `moon_sep`, `sun_alt`, and `sun_sep` [deg]
+    '''
+    import astropy.units as u
+    from astropy.time import Time
+    from astropy.coordinates import SkyCoord, AltAz, get_sun, get_body
+    kpno = _kpno_location()
+
+    ra, dec, mjd = [_x.ravel() for _x in np.broadcast_arrays(
+        np.atleast_1d(ra).astype(float), np.atleast_1d(dec).astype(float),
+        np.atleast_1d(mjd).astype(float))]
+
+    with _offline_iers():
+        # sun and moon at the unique times
+        umjd, inv = np.unique(mjd, return_inverse=True)
+        utime = Time(umjd, format='mjd', scale='utc')
+        uframe = AltAz(obstime=utime, location=kpno)
+
+        sun = get_sun(utime)
+        moon = get_body('moon', utime, location=kpno)
+        sun_alt = sun.transform_to(uframe).alt.deg
+        moon_alt = moon.transform_to(uframe).alt.deg
+
+        elongation = np.radians(_angsep(sun.ra.deg, sun.dec.deg, moon.ra.deg, moon.dec.deg))
+        sun_dist = sun.distance.to(u.km).value
+        moon_dist = moon.distance.to(u.km).value
+        phase = np.arctan2(sun_dist * np.sin(elongation), moon_dist - sun_dist * np.cos(elongation))
+
+        # pointings
+        coord = SkyCoord(ra=ra * u.deg, dec=dec * u.deg)
+        altaz = coord.transform_to(AltAz(obstime=utime[inv], location=kpno))
+
+    geo = {}
+    geo['airmass']      = altaz.secz.value
+    geo['moon_ill']     = (0.5 * (1. + np.cos(phase)))[inv]
+    geo['moon_phase']   = np.degrees(phase)[inv]
+    geo['moon_alt']     = moon_alt[inv]
+    geo['moon_sep']     = _angsep(ra, dec, moon.ra.deg[inv], moon.dec.deg[inv])
+    geo['sun_alt']      = sun_alt[inv]
+    geo['sun_sep']      = _angsep(ra, dec, sun.ra.deg[inv], sun.dec.deg[inv])
+    return geo
+
+
+def _angsep(ra1, dec1, ra2, dec2):
+    ''' angular separation [deg] between (ra1, dec1) and (ra2, dec2) in degrees
+    '''
+    ra1, dec1, ra2, dec2 = np.radians(ra1), np.radians(dec1), np.radians(ra2), np.radians(dec2)
+    cos_sep = np.sin(dec1) * np.sin(dec2) + np.cos(dec1) * np.cos(dec2) * np.cos(ra1 - ra2)
+    return np.degrees(np.arccos(np.clip(cos_sep, -1., 1.)))
+
+
+def _kpno_location():
+    from astropy import units as u
+    from astropy.coordinates import EarthLocation
+    return EarthLocation.from_geodetic(lon=_kpno_lon * u.deg, lat=_kpno_lat * u.deg,
+            height=_kpno_height * u.m)
+
+
+@contextmanager
+def _offline_iers():
+    ''' context in which the IERS-B table bundled with astropy is used and
+    IERS-A is never downloaded. Times past the end of the table fall back to
+    the predicted values with a warning rather than an error. The astropy
+    IERS configuration is restored on exit.
+    '''
+    from astropy.utils import iers
+    with ExitStack() as stack:
+        stack.enter_context(iers.conf.set_temp('auto_download', False))
+        stack.enter_context(iers.conf.set_temp('auto_max_age', None))
+        if hasattr(iers.conf, 'iers_degraded_accuracy'):
+            stack.enter_context(iers.conf.set_temp('iers_degraded_accuracy', 'warn'))
+        yield
+
+
+def _ephemeris_file():
+    ''' the table shipped with the code in dat/sky/ if there is one, otherwise
+    the table built in $FEASIBGS_DIR/sky/
+    '''
+    if UT.code_dir() is not None:
+        fephem = os.path.join(UT.code_dir(), 'dat', 'sky', 'kpno_ephemeris.npy')
+        if os.path.isfile(fephem): return fephem
+    return os.path.join(UT.dat_dir(), 'sky', 'kpno_ephemeris.npy')
+
+
+def _night_number(mjd):
+    ''' number of nights since the first night of `kpno_ephemeris` (negative
+    before the table)
+    '''
+    return np.floor(np.asarray(mjd, dtype=float) - kpno_ephemeris()['noon'][0]).astype(int)
+
+
+def _build_ephemeris(fephem, first='2009-01-01', last='2027-01-01'):
+    ''' solve for the nightly ephemeris at Kitt Peak between `first` and `last`
+    dates and save it to the .npy file `fephem`. This only needs to be run once.
+    '''
+    from astropy.time import Time
+    mjd0 = np.floor(Time(first).mjd) + _noon_utc
+    nnight = int(np.floor(Time(last).mjd - mjd0))
+    ephem = np.concatenate([_solve_nights(mjd0 + np.arange(i0, min(i0 + 500, nnight)))
+        for i0 in range(0, nnight, 500)])
+    if not os.path.isdir(os.path.dirname(fephem)): os.makedirs(os.path.dirname(fephem))
+    np.save(fephem, ephem)
+    return None
+
+
+def _solve_nights(noon, dt=10./1440.):
+    ''' solve the ephemeris of the nights that start at local noon MJDs
+    `noon`. The sun and moon altitudes are calculated every `dt` days over
+    each night and the events are the linearly interpolated crossings of the
+    horizon (0 deg) and the nautical (-12 deg) and astronomical (-18 deg)
+    twilight altitudes, as in astroplan. With the default 10 min sampling the
+    event times agree with astroplan to ~1 sec. Only astropy
+    (with the bundled IERS table) is used, so nothing is downloaded.
+    '''
+    from astropy.time import Time
+    from astropy.coordinates import AltAz, get_sun, get_body
+    kpno = _kpno_location()
+    noon = np.atleast_1d(noon).astype(float)
+
+    tgrid = noon[:,None] + dt * np.arange(int(np.round(1./dt)) + 1)[None,:]
+    with _offline_iers():
+        time = Time(tgrid.ravel(), format='mjd', scale='utc')
+        frame = AltAz(obstime=time, location=kpno)
+        sun_alt = get_sun(time).transform_to(frame).alt.deg.reshape(tgrid.shape)
+        moon_alt = get_body('moon', time, location=kpno).transform_to(frame).alt.deg.reshape(tgrid.shape)
+
+    ephem = np.zeros(len(noon), dtype=[(k, 'f8') for k in _columns])
+    ephem['noon']               = noon
+    ephem['sunset']             = _crossing(tgrid, sun_alt, 0., rising=False)
+    ephem['sunrise']            = _crossing(tgrid, sun_alt, 0., rising=True)
+    ephem['dusk_nautical']      = _crossing(tgrid, sun_alt, -12., rising=False)
+    ephem['dawn_nautical']      = _crossing(tgrid, sun_alt, -12., rising=True)
+    ephem['dusk_astronomical']  = _crossing(tgrid, sun_alt, -18., rising=False)
+    ephem['dawn_astronomical']  = _crossing(tgrid, sun_alt, -18., rising=True)
+    # moon events that do not happen within the night are NaN
+    ephem['moonrise']           = _crossing(tgrid, moon_alt, 0., rising=True)
+    ephem['moonset']            = _crossing(tgrid, moon_alt, 0., rising=False)
+
+    midnight = 0.5 * (ephem['sunset'] + ephem['sunrise'])
+    ephem['moon_ill'] = sky_geometry(0., 0., midnight)['moon_ill']
+    return ephem
+
+
+def _crossing(t, alt, alt0, rising=True):
+    ''' time of the first crossing of altitude `alt0` in each row of the
+    sampled altitudes `alt` at times `t`, linearly interpolated. NaN if the
+    altitude is not crossed.
+    '''
+    above = (alt > alt0)
+    if rising: cross = ~above[:,:-1] & above[:,1:]
+    else: cross = above[:,:-1] & ~above[:,1:]
+    rows = np.arange(t.shape[0])
+    j = np.argmax(cross, axis=1)
+    a0, a1 = alt[rows,j], alt[rows,j+1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tcross = t[rows,j] + (alt0 - a0) / (a1 - a0) * (t[rows,j+1] - t[rows,j])
+    tcross[~np.any(cross, axis=1)] = np.nan
+    return tcross
@@ -0,0 +1,235 @@
+'''
+
+footprint index of the Legacy Survey sweep files and tractor bricks. The RA
+and Dec bounds, object counts, release (north/south), and path of every
+sweep file and brick are compiled once into a table that is stored in
+`dat_dir()/legacy/` so catalog builders can decide which files to open with
+rectangle and cone overlap queries instead of parsing file names.
+
+'''
+import os
+import glob
+import numpy as np
+from astropy.io import fits
+# -- local --
+from . import util as UT
+
+
+# sweep and tractor directories of each data release relative to the legacy
+# survey directory at NERSC
+dir_legacy = '/global/project/projectdirs/cosmo/data/legacysurvey/'
+legacy_dirs = {
+        5: {'south': ('dr5/sweep/5.0/', 'dr5/tractor/')},
+        7: {'south': ('dr7/sweep/7.1/', 'dr7/tractor/')},
+        8: {'north': ('dr8/north/sweep/8.0/', 'dr8/north/tractor/'),
+            'south': ('dr8/south/sweep/8.0/', 'dr8/south/tractor/')}}
+
+_dtype = [('kind', 'U5'), ('release', 'U5'), ('name', 'U64'), ('path', 'U256'),
+        ('ra_min', 'f8'), ('ra_max', 'f8'), ('dec_min', 'f8'), ('dec_max', 'f8'),
+        ('nobj', 'i8')]
+
+_FOOTPRINTS = {}
+
+
+class Footprint(object):
+    ''' footprint index of sweep files and bricks
+
+    :param table:
+        structured array with columns `kind` ('sweep' or 'brick'),
+        `release` ('north' or 'south'), `name`, `path`, `ra_min`, `ra_max`,
+        `dec_min`, `dec_max`, and `nobj` (-1 if not counted)
+    '''
+    def __init__(self, table):
+        self.table = table
+
+    def rectangle(self, ra_lim, dec_lim, kind='sweep', release=None):
+        ''' sweep files or bricks that overlap with an RA/Dec rectangle.
+        Rectangles with ra_lim[0] > ra_lim[1] wrap around RA = 0.
+
+        :return rows:
+            rows of the footprint table
+        '''
+        tab = self._select(kind, release)
+        in_dec = (tab['dec_max'] >= dec_lim[0]) & (tab['dec_min'] <= dec_lim[1])
+        in_ra = ra_overlap(tab['ra_min'], tab['ra_max'], ra_lim)
+        return tab[in_dec & in_ra]
+
+    def cone(self, ra, dec, radius, kind='sweep', release=None):
+        ''' sweep files or bricks that overlap with a cone of `radius`
+        degrees around (ra, dec). The cone is approximated by its RA/Dec
+        bounding rectangle, so a few extra files near the corners may be
+        included but none are missed.
+        '''
+        dec_lo, dec_hi = dec - radius, dec + radius
+        if dec_lo <= -90. or dec_hi >= 90.:
+            return self.rectangle([0., 360.], [max(dec_lo, -90.), min(dec_hi, 90.)],
+                    kind=kind, release=release)
+        dra = radius / np.cos(np.radians(max(np.abs(dec_lo), np.abs(dec_hi))))
+        if dra >= 180.:
+            ra_lim = [0., 360.]
+        else:
+            ra_lim = [(ra - dra) % 360., (ra + dra) % 360.]
+        return self.rectangle(ra_lim, [dec_lo, dec_hi], kind=kind, release=release)
+
+    def paths(self, rows, prefer=('north', 'south')):
+        ''' one path for each unique file name in `rows`. Files that are in
+        more than one release are taken from the first release in `prefer`.
+        '''
+        rank = np.array([list(prefer).index(r) if r in prefer else len(prefer)
+            for r in rows['release']])
+        isort = np.lexsort((rank, rows['name']))
+        _, iuniq = np.unique(rows['name'][isort], return_index=True)
+        return list(rows['path'][isort][iuniq])
+
+    def brick_files(self, bricknames, prefer=('north', 'south')):
+        ''' tractor file paths of bricks
+
+        :raises ValueError:
+            if a brick is not in the footprint
+        '''
+        bricks = self._select('brick', None)
+        rank = np.array([list(prefer).index(r) if r in prefer else len(prefer)
+            for r in bricks['release']])
+        # preferred release last so it overwrites the others
+        order = np.argsort(-rank, kind='mergesort')
+        paths = dict(zip(bricks['name'][order], bricks['path'][order]))
+        files = []
+        for brick in bricknames:
+            if isinstance(brick, bytes): brick = brick.decode()
+            if brick not in paths: raise ValueError('brick %s is not in the footprint' % brick)
+            files.append(paths[brick])
+        return files
+
+    def _select(self, kind, release):
+        sel = (self.table['kind'] == kind)
+        if release is not None: sel &= (self.table['release'] == release)
+        return self.table[sel]
+
+    @classmethod
+    def build(cls, dr, dir_legacy=dir_legacy, count=True, silent=True):
+        ''' compile the footprint of the sweep files and bricks of Legacy
+        Survey data release `dr`. Brick bounds are taken from the
+        survey-bricks file when it is available and otherwise from the brick
+        names.
+
+        :param count:
+            If True, count the objects in each file from its FITS header
+
+        Raises a ValueError if there are no sweep files or no bricks (e.g.
+        `dir_legacy` does not have the data release).
+        '''
+        rows = []
+        for release, (dir_sweep, dir_tractor) in legacy_dirs[dr].items():
+            for f in sorted(glob.glob(os.path.join(dir_legacy, dir_sweep, 'sweep-*.fits'))):
+                rows.append(('sweep', release, os.path.basename(f), f) + sweep_bounds(f) +
+                        (_nobj(f) if count else -1,))
+
+            fbricks = sorted(glob.glob(os.path.join(dir_legacy, dir_tractor, '*', 'tractor-*.fits')))
+            names = [os.path.basename(f).replace('tractor-', '').replace('.fits', '') for f in fbricks]
+            bounds = _survey_bricks(os.path.join(dir_legacy, 'dr%i' % dr, 'survey-bricks.fits.gz'))
+            for f, name in zip(fbricks, names):
+                rows.append(('brick', release, name, f) + bounds.get(name, brick_bounds(name)) +
+                        (_nobj(f) if count else -1,))
+            if not silent: print('%s: %i sweep files and %i bricks' %
+                    (release, np.sum([r[0] == 'sweep' and r[1] == release for r in rows]), len(fbricks)))
+        for kind in ['sweep', 'brick']:
+            if not any([r[0] == kind for r in rows]):
+                raise ValueError('no %s files of DR%i found in %s' % (kind, dr, dir_legacy))
+        return cls(np.array(rows, dtype=_dtype))
+
+    def write(self, fname):
+        np.save(fname, self.table)
+        return None
+
+    @classmethod
+    def read(cls, fname):
+        return cls(np.load(fname))
+
+
+def footprint(dr, dir_legacy=dir_legacy, count=True, silent=True):
+    ''' footprint of Legacy Survey data release `dr`. It is built once,
+    written to `dat_dir()/legacy/footprint.dr{dr}.npy`, and cached for the
+    rest of the process. Empty footprints are never written, and an empty
+    cached footprint is rebuilt.
+    '''
+    if dr not in _FOOTPRINTS:
+        ffp = _footprint_file(dr)
+        fp = None
+        if os.path.isfile(ffp):
+            fp = Footprint.read(ffp)
+            if len(fp.table) == 0: fp = None
+        if fp is None:
+            if not silent: print('building %s' % ffp)
+            fp = Footprint.build(dr, dir_legacy=dir_legacy, count=count, silent=silent)
+            fp.write(ffp)
+        _FOOTPRINTS[dr] = fp
+    return _FOOTPRINTS[dr]
+
+
+def ra_overlap(ra_lo, ra_hi, ra_lim):
+    ''' whether the RA intervals [ra_lo, ra_hi] overlap with the range
+    `ra_lim`. Ranges with ra_lim[0] > ra_lim[1] wrap around RA = 0 and are
+    split into [ra_lim[0], 360] and [0, ra_lim[1]]. The intervals may extend
+    past 0 or 360 (e.g. bricks at RA ~ 0), so each part is also compared with
+    the intervals shifted by +/-360.
+    '''
+    ra_min, ra_max = ra_lim
+    if ra_min > ra_max:
+        return ra_overlap(ra_lo, ra_hi, [ra_min, 360.]) | ra_overlap(ra_lo, ra_hi, [0., ra_max])
+    overlap = np.zeros(np.shape(ra_lo)).astype(bool)
+    for shift in [-360., 0., 360.]:
+        overlap |= (ra_hi + shift >= ra_min) & (ra_lo + shift <= ra_max)
+    return overlap
+
+
+def sweep_bounds(fsweep):
+    ''' RA and Dec bounds of a sweep file parsed from its name, e.g.
+    sweep-150m005-160p000.fits
+
+    :return ra_min, ra_max, dec_min, dec_max:
+    '''
+    name = os.path.basename(fsweep).replace('.fits', '')
+    _, radec1, radec2 = name.split('-')
+    ra_min, dec_min = _parse_radec(radec1)
+    ra_max, dec_max = _parse_radec(radec2)
+    return ra_min, ra_max, dec_min, dec_max
+
+
+def brick_bounds(brickname):
+    ''' approximate RA and Dec bounds of a brick from its name, e.g.
+    1501p025 is centered at RA = 150.1 and Dec = +2.5. Bricks are 0.25 deg
+    in Dec and 0.25 deg / cos(Dec) in RA.
+    '''
+    if isinstance(brickname, bytes): brickname = brickname.decode()
+    ra = float(brickname[:4]) / 10.
+    dec = float(brickname[5:8]) / 10. * [1., -1.][brickname[4] == 'm']
+    dra = 0.125 / max(np.cos(np.radians(dec)), 1e-3)
+    return ra - dra, ra + dra, dec - 0.125, dec + 0.125
+
+
+def _parse_radec(radec):
+    ''' RRRsDDD string of a sweep file name
+    '''
+    if 'p' in radec: ra, dec = radec.split('p'); sign = 1.
+    else: ra, dec = radec.split('m'); sign = -1.
+    return float(ra), sign * float(dec)
+
+
+def _survey_bricks(fbricks):
+    ''' brick bounds from the survey-bricks file (if available)
+    '''
+    if not os.path.isfile(fbricks): return {}
+    bricks = fits.open(fbricks)[1].data
+    names = [b.decode() if isinstance(b, bytes) else b for b in bricks['BRICKNAME']]
+    return dict(zip(names, zip(bricks['RA1'].astype(float), bricks['RA2'].astype(float),
+        bricks['DEC1'].astype(float), bricks['DEC2'].astype(float))))
+
+
+def _nobj(fname):
+    ''' number of objects in a FITS catalog from its header
+    '''
+    return fits.getheader(fname, 1)['NAXIS2']
+
+
+def _footprint_file(dr):
+    return os.path.join(UT.dat_dir(), 'legacy', 'footprint.dr%i.npy' % dr)
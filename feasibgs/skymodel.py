@@ -14,6 +14,7 @@ import specsim
 from specsim.atmosphere import Moon 
 # -- feasibgs -- 
 from . import util as UT 
+from . import ephemeris as Ephem
 
 
 def Isky_regression(airmass, moonill, moonalt, moonsep, sunalt, sunsep):
@@ -145,94 +146,100 @@ def Isky_parker(airmass, ecl_lat, gal_lat, gal_lon, tai, sun_alt, sun_sep, moon_
         moon separation angle: 0 - 180 deg 
     
     '''
-    from astroplan import Observer
-    from astropy.coordinates import EarthLocation
-    X = airmass    # air mass 
-    beta = ecl_lat # ecliptic latitude ( used for zodiacal light contribution ) 
-    l = gal_lat    # galactic latitude ( used for ISL contribution ) 
-    b = gal_lon    # galactic longitude ( used for ISL contribution ) 
-
-    _kpno = EarthLocation.of_site('kitt peak')
-    obs_time = Time(tai/86400., scale='tai', format='mjd', location=_kpno)
-    mjd = obs_time.mjd
+    # common shape of all the observing conditions 
+    shape = np.broadcast(*[np.asarray(_c) for _c in [airmass, ecl_lat, gal_lat, gal_lon, 
+        tai, sun_alt, sun_sep, moon_phase, moon_ill, moon_alt, moon_sep]]).shape
 
-    # fractional months ( used for seasonal contribution) 
-    month_frac = obs_time.datetime.month + obs_time.datetime.day/30. 
-    
-    # fractional hour ( used for hourly contribution) 
-    kpno = Observer(_kpno)
-    sun_rise    = kpno.sun_rise_time(obs_time, which='next')
-    sun_set     = kpno.sun_set_time(obs_time, which='previous')
-    hour        = ((obs_time - sun_set).sec)/3600.
-    hour_frac   = hour/((Time(sun_rise, format='mjd') - Time(sun_set,format = 'mjd')).sec/3600.)
-
-    alpha = sun_alt    # sun altitude
-    delta = sun_sep    # sun separation (separation between the target and the sun's location)
-    
-    # used for scattered moonlight
-    g = moon_phase     # moon phase 
-    altm = moon_alt
-    illm = moon_ill
-    delm = moon_sep
+    mjd, month_frac, hour_frac = _parker_time_params(tai) 
     
-    # get coefficients 
-    coeffs = _read_parkerCoeffs()
+    _w, Isky = Isky_parker_batch(airmass, ecl_lat, gal_lat, gal_lon, mjd, month_frac, hour_frac, 
+            sun_alt, sun_sep, moon_phase, moon_ill, moon_alt, moon_sep)
+    return _w, Isky.reshape(shape + (len(_w),))
+
+
+def Isky_parker_batch(airmass, ecl_lat, gal_lat, gal_lon, mjd, month_frac, hour_frac, 
+        sun_alt, sun_sep, moon_phase, moon_ill, moon_alt, moon_sep): 
+    ''' Parker's sky model evaluated for N sets of observing conditions at
+    once. All the inputs are broadcast against each other so scalars and
+    arrays of length N can be mixed. Unlike `Isky_parker`, the time dependent
+    parameters (`mjd`, `month_frac`, `hour_frac`) are passed directly, see 
+    `_parker_time_params`. 
+
+    :param mjd: 
+        MJD of the observations (used for solar flux contribution) 
+
+    :param month_frac: 
+        fractional month (used for seasonal contribution) 
+
+    :param hour_frac: 
+        fraction of the night between sun set and sun rise (used for hourly
+        contribution) 
+
+    See `Isky_parker` for the rest of the parameters. 
+
+    :return wave, Isky: 
+        wavelength [Angstrom] and (N, nwave) array of sky surface brightnesses 
+    '''
+    conds = np.broadcast_arrays(*[np.atleast_1d(np.asarray(_c, dtype=float)) for _c in 
+        [airmass, ecl_lat, gal_lat, gal_lon, mjd, month_frac, hour_frac, sun_alt, 
+            sun_sep, moon_phase, moon_ill, moon_alt, moon_sep]])
+    # (N, 1) columns that broadcast against the (nwave,) coefficients 
+    X, beta, l, b, mjd, month_frac, hour_frac, alpha, delta, g, illm, altm, delm = \
+            [_c.ravel()[:,None] for _c in conds]
+
+    # get compiled coefficients (cached after the first call)
+    coeffs = _parker_bundle()
 
     # sky continuum 
     _w, _Icont = _parker_Icontinuum(coeffs, X, beta, l, b, mjd, month_frac, hour_frac, alpha, delta, altm, illm, delm, g)
     S_continuum = _Icont / np.pi  # BOSS has 2 arcsec diameter
 
     # sky emission from the UVES continuum subtraction
-    w_uves, S_uves = np.loadtxt(''.join([UT.code_dir(), 'dat/sky/UVES_sky_emission.dat']), 
-            unpack=True, usecols=[0,1]) 
-    f_uves = interp1d(w_uves, S_uves, bounds_error=False, fill_value='extrapolate')
-    S_emission = f_uves(_w)
+    S_emission = coeffs['uves_emission']
+
+    return _w, S_continuum + S_emission
+
 
-    return _w, S_continuum + S_emission 
+def _parker_time_params(tai): 
+    ''' MJD, fractional month, and fractional hour of the night used in
+    Parker's sky model given `tai` time in seconds. The fractional hour is
+    looked up from the precomputed KPNO ephemeris table. 
+    '''
+    obs_time = Time(np.atleast_1d(tai)/86400., scale='tai', format='mjd')
+    mjd = obs_time.mjd
+
+    # fractional months ( used for seasonal contribution) 
+    ymdhms = obs_time.ymdhms
+    month_frac = ymdhms['month'] + ymdhms['day']/30. 
+    
+    # fractional hour ( used for hourly contribution) 
+    hour_frac = Ephem.night_fraction(obs_time.utc.mjd) 
+    return mjd, month_frac, hour_frac
 
 
 def Isky_parker_radecobs(ra, dec, obs_time): 
     ''' wrapper for Isky_parker, where the input parameters are calculated based
-    on RA, Dec, and obs_time 
+    on RA, Dec, and obs_time. RA and Dec can be arrays, in which case a
+    (N, nwave) array of sky brightnesses is returned.
     '''
-    from astroplan import download_IERS_A
-    from astropy.coordinates import EarthLocation, SkyCoord, AltAz, get_sun, get_moon
- 
-    download_IERS_A()
+    from astropy.coordinates import SkyCoord
     # target coordinates 
-    coord = SkyCoord(ra=ra * u.deg, dec=dec * u.deg) 
+    coord = SkyCoord(ra=np.atleast_1d(ra) * u.deg, dec=np.atleast_1d(dec) * u.deg) 
+    ecl_lat = coord.barycentrictrueecliptic.lat.deg
+    gal_lat = coord.galactic.b.deg   # galactic latitude ( used for ISL contribution ) 
+    gal_lon = coord.galactic.l.deg   # galactic longitude ( used for ISL contribution ) 
+
     # observed time (UTC)          
     utc_time = Time(obs_time)
-    kpno = EarthLocation.of_site('kitt peak')
-
-    kpno_altaz = AltAz(obstime=utc_time, location=kpno) 
-    coord_altaz = coord.transform_to(kpno_altaz)
-
-    airmass = coord_altaz.secz
-    elc_lat = coord.barycentrictrueecliptic.lat.deg
-    gal_lat = coord.galactic.l.deg   # galactic latitude ( used for ISL contribution ) 
-    gal_lon = coord.galactic.b.deg   # galactic longitude ( used for ISL contribution ) 
-
-    tai = utc_time.tai   
-
-    # sun altitude (degrees)
-    sun = get_sun(utc_time) 
-    sun_altaz   = sun.transform_to(kpno_altaz) 
-    sunalt      = sun_altaz.alt.deg
-    # sun separation
-    sunsep      = sun.separation(coord).deg
-
-    # used for scattered moonlight
-    moon = get_moon(utc_time)
-    moon_altaz = moon.transform_to(kpno_altaz) 
-    moon_alt = moon_altaz.alt.deg 
-    moon_sep = moon.separation(coord).deg #coord.separation(self.moon).deg
-            
-    elongation  = sun.separation(moon)
-    phase       = np.arctan2(sun.distance * np.sin(elongation), moon.distance - sun.distance*np.cos(elongation))
-    moon_phase  = phase.value
-    moon_ill    = (1. + np.cos(phase))/2.
-    return Isky_parker(airmass, ecl_lat, gal_lat, gal_lon, tai, sun_alt, sun_sep, moon_phase, moon_ill, moon_alt, moon_sep)
+    # airmass, sun, and moon (offline; no IERS download) 
+    geo = Ephem.sky_geometry(ra, dec, utc_time.utc.mjd)
+
+    mjd, month_frac, hour_frac = _parker_time_params(utc_time.tai.mjd * 86400.)
+    wave, Isky = Isky_parker_batch(geo['airmass'], ecl_lat, gal_lat, gal_lon, 
+            mjd, month_frac, hour_frac, geo['sun_alt'], geo['sun_sep'], 
+            geo['moon_phase'], geo['moon_ill'], geo['moon_alt'], geo['moon_sep'])
+    shape = np.broadcast(np.asarray(ra), np.asarray(dec), utc_time.mjd).shape
+    return wave, Isky.reshape(shape + (len(wave),))
 
 
 def _specsim_initialize(config, model='regression'): 
@@ -317,41 +324,111 @@ class _Moon(Moon):
         self.KS_M2 = 4.
 
     def _update(self):
-        """Update the model based on the current parameter values.
+        """Update the model based on the current parameter values. The moon
+        geometry (airmass, moon_zenith, separation_angle, moon_phase) can be
+        arrays of length N, in which case the surface brightness is a 
+        (N, nwave) array. 
         """
         self._update_required = False
+        
+        # broadcast the moon geometry to (N,) arrays 
+        airmass, obs_zenith, moon_zenith, separation_angle, moon_phase = np.broadcast_arrays(
+                np.atleast_1d(self.airmass), 
+                np.atleast_1d(self.obs_zenith.to(u.rad).value), 
+                np.atleast_1d(self.moon_zenith.to(u.deg).value), 
+                np.atleast_1d(self.separation_angle.to(u.deg).value),
+                np.atleast_1d(self.moon_phase))
+        moon_zenith = moon_zenith * u.deg 
+        separation_angle = separation_angle * u.deg 
 
         # Calculate the V-band surface brightness of scattered moonlight.
         if self.model == 'refit_ks': 
             self._scattered_V = krisciunas_schaefer_free(
-                self.obs_zenith, self.moon_zenith, self.separation_angle,
-                self.moon_phase, self.vband_extinction, self.KS_CR, self.KS_CM0,
+                obs_zenith * u.rad, moon_zenith, separation_angle,
+                moon_phase, self.vband_extinction, self.KS_CR, self.KS_CM0,
                 self.KS_CM1, self.KS_M0, self.KS_M1, self.KS_M2)
         elif self.model == 'regression': 
             self._scattered_V = _scattered_V_regression(
-                    self.airmass, 
-                    0.5 * (np.cos(np.pi * self.moon_phase) + 1.), 
-                    90 - self.moon_zenith.value, 
-                    self.separation_angle.value) * u.mag / u.arcsec**2
+                    airmass, 
+                    0.5 * (np.cos(np.pi * moon_phase) + 1.), 
+                    90 - moon_zenith.value, 
+                    separation_angle.value) * u.mag / u.arcsec**2
         else: 
             raise NotImplementedError 
 
         # Calculate the wavelength-dependent extinction of moonlight
         # scattered once into the observed field of view.
+        extinction_coefficient = np.asarray(self._extinction_coefficient)[None,:]
         scattering_airmass = (
-            1 - 0.96 * np.sin(self.moon_zenith) ** 2) ** (-0.5)
+            1 - 0.96 * np.sin(moon_zenith[:,None]) ** 2) ** (-0.5)
         extinction = (
-            10 ** (-self._extinction_coefficient * scattering_airmass / 2.5) *
-            (1 - 10 ** (-self._extinction_coefficient * self.airmass / 2.5)))
-        self._surface_brightness = self._moon_spectrum * extinction
+            10 ** (-extinction_coefficient * scattering_airmass / 2.5) *
+            (1 - 10 ** (-extinction_coefficient * airmass[:,None] / 2.5)))
+        surface_brightness = self._moon_spectrum * extinction
 
-        # Renormalized the extincted spectrum to the correct V-band magnitude.
+        # Renormalized the extincted spectra to the correct V-band magnitudes
+        # (all N at once) 
         raw_V = self._vband.get_ab_magnitude(
-            self._surface_brightness, self._wavelength) * u.mag
+            surface_brightness, self._wavelength) * u.mag
 
         area = 1 * u.arcsec ** 2
-        self._surface_brightness *= 10 ** (
-            -(self._scattered_V * area - raw_V) / (2.5 * u.mag)) / area
+        surface_brightness *= (10 ** (
+            -(self._scattered_V * area - raw_V) / (2.5 * u.mag)) / area)[:,None]
+        
+        if self._scalar_geometry(): 
+            surface_brightness = surface_brightness[0]
+            self._scattered_V = self._scattered_V[0]
+        self._surface_brightness = surface_brightness 
+
+    def _scalar_geometry(self): 
+        return all([np.ndim(getattr(self, k)) == 0 for k in 
+            ['airmass', 'moon_zenith', 'separation_angle', 'moon_phase']])
+
+    @property
+    def airmass(self):
+        return self._airmass
+
+    @airmass.setter
+    def airmass(self, airmass):
+        if np.ndim(airmass) == 0: self._airmass = float(airmass) 
+        else: self._airmass = np.asarray(airmass, dtype=float) 
+        self._update_required = True
+
+    @property
+    def obs_zenith(self):
+        # invert eqn. 3 of KS1991 (as in specsim) so that the KS model airmass
+        # is the observing airmass 
+        return np.arcsin(np.sqrt((1 - np.asarray(self.airmass) ** -2) / 0.96)) * u.rad
+
+    @property
+    def moon_zenith(self):
+        return self._moon_zenith
+
+    @moon_zenith.setter
+    def moon_zenith(self, moon_zenith):
+        self._moon_zenith = moon_zenith 
+        self._visible = self._moon_zenith < 90 * u.deg
+        self._update_required = True
+
+    @property
+    def separation_angle(self):
+        return self._separation_angle
+
+    @separation_angle.setter
+    def separation_angle(self, separation_angle):
+        self._separation_angle = separation_angle 
+        self._update_required = True
+
+    @property
+    def moon_phase(self):
+        return self._moon_phase
+
+    @moon_phase.setter
+    def moon_phase(self, moon_phase):
+        if np.any((np.asarray(moon_phase) < 0) | (np.asarray(moon_phase) > 1)): 
+            raise ValueError('Invalid moon phase. Expected 0-1.')
+        self._moon_phase = moon_phase 
+        self._update_required = True
 
     @property
     def KS_CR(self):
@@ -422,18 +499,18 @@ reg_model_coeffs = np.array([
 reg_model_intercept = 20.507688847655775
 
 
+# exponents of (airmass, moon_frac, moon_alt, moon_sep) of each polynomial
+# feature of the regression, in the order of the coefficients above
+reg_model_powers = np.array([np.bincount(np.array(comb, dtype=int), minlength=4) for comb in 
+    chain.from_iterable(combinations_with_replacement(range(4), i) for i in range(0, 4))])
+
+
 def _scattered_V_regression(airmass, moon_frac, moon_alt, moon_sep):
     ''' 4th degree polynomial regression fit to the V-band scattered moonlight
-    from BOSS and DESI CMX data. 
+    from BOSS and DESI CMX data. Inputs can be scalars or arrays of length N.
     '''
-    theta = np.atleast_2d(np.array([airmass, moon_frac, moon_alt, moon_sep]).T)
-
-    combs = chain.from_iterable(combinations_with_replacement(range(4), i) 
-            for i in range(0, 4))
-    theta_transform = np.empty((theta.shape[0], len(reg_model_coeffs)))
-    for i, comb in enumerate(combs):
-        theta_transform[:, i] = theta[:, comb].prod(1)
-
+    theta = np.atleast_2d(np.array(np.broadcast_arrays(airmass, moon_frac, moon_alt, moon_sep)).T)
+    theta_transform = np.prod(theta[:,None,:] ** reg_model_powers[None,:,:], axis=2)
     return np.dot(theta_transform, reg_model_coeffs.T) + reg_model_intercept
 
 
@@ -569,12 +646,129 @@ def _twilight_coeffs():
 ##########################################################################
 # contributions to parker's sky surface brightness model  
 ##########################################################################
+_PARKER_BUNDLE = None 
+
+
+def _parker_bundle(): 
+    ''' compiled coefficient bundle of parker's model. All the inputs of the 
+    model are pre-evaluated on the model wavelength grid (or tabulated on a grid 
+    of the observing conditions) and stored in a single .npz file. The bundle is 
+    read once and cached for the rest of the process so that evaluating the
+    model does no file I/O. 
+    '''
+    global _PARKER_BUNDLE
+    if _PARKER_BUNDLE is None: 
+        fbundle = _parker_bundle_file() 
+        if not os.path.isfile(fbundle): _build_parker_bundle(fbundle)
+
+        npz = np.load(fbundle) 
+        _PARKER_BUNDLE = dict((k, npz[k]) for k in npz.files) 
+        npz.close() 
+    return _PARKER_BUNDLE
+
+
+_PARKER_INPUTS = ['MoonResults.csv', 'albedo_constants.csv', 'ZenithExtinction-KPNO.dat', 
+        'solar_flux.npy', 's10_zodi.pkl', 'isl_map.pkl', 'UVES_sky_emission.dat']
+
+
+def _parker_bundle_file(): 
+    ''' the bundle shipped with the code in dat/sky/ if there is one, otherwise 
+    the bundle compiled in $FEASIBGS_DIR/sky/ 
+    '''
+    fbundle = os.path.join(UT.code_dir(), 'dat', 'sky', 'parker_coeffs.npz')
+    if os.path.isfile(fbundle): return fbundle 
+    return os.path.join(UT.dat_dir(), 'sky', 'parker_coeffs.npz')
+
+
+def _parker_inputs_missing(): 
+    ''' inputs of parker's model that are missing from dat/sky/
+    '''
+    return [f for f in _PARKER_INPUTS 
+            if not os.path.isfile(os.path.join(UT.code_dir(), 'dat', 'sky', f))]
+
+
+def _build_parker_bundle(fbundle): 
+    ''' compile the coefficients of parker's model and all the supporting data
+    (albedo constants, KPNO zenith extinction, solar flux, ISL and zodiacal
+    light maps, UVES emission) onto the model wavelength grid and save them to 
+    a single uncompressed .npz file `fbundle`. This only needs to be run once. 
+    '''
+    missing = _parker_inputs_missing() 
+    if len(missing) > 0: 
+        raise IOError("parker's model inputs missing from dat/sky/: %s" % ', '.join(missing))
+
+    coeffs = _read_parkerCoeffs() 
+    wl = np.array(coeffs['wl']) # nm 
+    nwave = len(wl) 
+
+    bundle = {} 
+    bundle['wl'] = wl 
+    for k in ['c0', 'c_am', 'c_zodi', 'c_isl', 'sol', 'I', 
+            't0', 't1', 't2', 't3', 't4', 
+            'm0', 'm1', 'm2', 'm3', 'm4', 'm5', 'm6']: 
+        bundle[k] = np.array(coeffs[k]).astype(float)
+    
+    # seasonal coefficients (Fragelius thesis Eq. 4.25). january is the 
+    # reference month with no seasonal contribution 
+    months = ['feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+    bundle['seasonal'] = np.array([np.zeros(nwave)] + 
+            [np.array(coeffs[mon]).astype(float) for mon in months])
+    
+    # hourly coefficients (Fragelius thesis Eq. 4.26) for the 7 fractional
+    # hour levels; the first and last levels have no hourly contribution
+    bundle['hourly'] = np.array([np.zeros(nwave)] + 
+            [np.array(coeffs['c%i' % i]).astype(float) for i in range(2, 7)] + 
+            [np.zeros(nwave)])
+
+    # albedo constants (Fragelius thesis Eq. 4.28) 
+    albedo_table = pd.read_csv(os.path.join(UT.code_dir(), 'dat', 'sky', 'albedo_constants.csv'), 
+            sep=r'\s+') 
+    for col in ['a0', 'a1', 'a2', 'a3', 'd1', 'd2', 'd3']: 
+        line = interp1d(albedo_table['WAVELENGTH'], albedo_table[col], 
+                bounds_error=False, fill_value=0)
+        bundle['albedo_'+col] = line(wl) 
+
+    # KPNO zenith extinction (Fragelius thesis Eq. 4.24) 
+    zen_ext = np.loadtxt(os.path.join(UT.code_dir(), 'dat', 'sky', 'ZenithExtinction-KPNO.dat'))
+    zext = interp1d(zen_ext[:,0]/10., zen_ext[:,1], bounds_error=False, fill_value='extrapolate')
+    bundle['k_zenith'] = zext(wl) 
+
+    # solar flux as a function of MJD 
+    solar_data = np.load(os.path.join(UT.code_dir(), 'dat', 'sky', 'solar_flux.npy'))
+    isort = np.argsort(solar_data['MJD']) 
+    bundle['solar_mjd'] = np.array(solar_data['MJD'][isort]) 
+    bundle['solar_flux'] = np.array(solar_data['fluxobsflux'][isort]) 
+
+    # zodiacal light as a function of ecliptic latitude (linear interp1d knots) 
+    zodi_data = pickle.load(open(os.path.join(UT.code_dir(), 'dat', 'sky', 's10_zodi.pkl'), 'rb'))
+    bundle['zodi_x'] = np.array(zodi_data.x) 
+    bundle['zodi'] = np.array(zodi_data.y) 
+
+    # ISL map tabulated on a 1 deg grid 
+    isl_data = pickle.load(open(os.path.join(UT.code_dir(), 'dat', 'sky', 'isl_map.pkl'), 'rb'))
+    isl_x = np.linspace(isl_data.x_min, isl_data.x_max, int(np.ceil(isl_data.x_max - isl_data.x_min)) + 1) 
+    isl_y = np.linspace(isl_data.y_min, isl_data.y_max, int(np.ceil(isl_data.y_max - isl_data.y_min)) + 1) 
+    bundle['isl_x'] = isl_x
+    bundle['isl_y'] = isl_y
+    bundle['isl'] = isl_data(isl_x, isl_y) # shape (len(isl_y), len(isl_x))
+
+    # sky emission from the UVES continuum subtraction 
+    w_uves, S_uves = np.loadtxt(os.path.join(UT.code_dir(), 'dat', 'sky', 'UVES_sky_emission.dat'), 
+            unpack=True, usecols=[0,1]) 
+    f_uves = interp1d(w_uves, S_uves, bounds_error=False, fill_value='extrapolate')
+    bundle['uves_emission'] = f_uves(10. * wl) 
+
+    if not os.path.isdir(os.path.dirname(fbundle)): os.makedirs(os.path.dirname(fbundle))
+    np.savez(fbundle, **bundle) 
+    return None 
+
+
 def _read_parkerCoeffs(): 
     ''' read the coefficients of parker's model 
     '''
-    f = ''.join([UT.code_dir(), 'dat/sky/MoonResults.csv']) 
+    f = os.path.join(UT.code_dir(), 'dat', 'sky', 'MoonResults.csv')
 
-    _coeffs = pd.DataFrame.from_csv(f)
+    _coeffs = pd.read_csv(f, index_col=0)
     _coeffs.columns = [
             'wl', 'model', 'data_var', 'unexplained_var',' X2', 'rX2', 
             'c0', 'c_am', 'tau', 'tau2', 'c_zodi', 'c_isl', 'sol', 'I', 
@@ -583,29 +777,31 @@ def _read_parkerCoeffs():
             'c2', 'c3', 'c4', 'c5', 'c6'
             ]
     # keep moon models
-    coeffs = _coeffs[coeffs['model'] == 'moon']
+    coeffs = _coeffs[_coeffs['model'] == 'moon']
 
     # order based on wavelengths for convenience
     wave_sort = np.argsort(np.array(coeffs['wl']))  
     
-    for k in coeffs.keys(): 
-        coeffs[k] = np.array(coeffs[k])[wave_sort]
-
-    return coeffs
+    return coeffs.iloc[wave_sort]
 
 
 def _parker_Icontinuum(coeffs, X, beta, l, b, mjd, month_frac, hour_frac, alpha, delta, altm, illm, delm, g): 
-    ''' sky continuum (Fragelius thesis Eq. 4.23)
+    ''' sky continuum (Fragelius thesis Eq. 4.23). The observing conditions 
+    can be scalars or (N, 1) arrays, in which case the continuum has shape 
+    (N, nwave). 
+    
+    :param coeffs: 
+        compiled coefficient bundle from `_parker_bundle`
     '''
     # airmass contrib.  
     _Iairmass = coeffs['c_am'] * X  
 
     # zodiacal contrib. (func. of ecliptic latitude) 
-    _Izodiacal = coeffs['c_zodi'] * _parker_Izodi(beta)
+    _Izodiacal = coeffs['c_zodi'] * _parker_Izodi(beta, coeffs)
     
-    _Iisl = coeffs['c_isl'] * _parker_Iisl(l, b) 
+    _Iisl = coeffs['c_isl'] * _parker_Iisl(l, b, coeffs) 
 
-    _Isolar_flux = coeffs['sol'] * _parker_Isf(mjd - coeffs['I']) 
+    _Isolar_flux = coeffs['sol'] * _parker_Isf(mjd - coeffs['I'], coeffs) 
 
     _Iseasonal = _parker_cI_seas(month_frac, coeffs) 
 
@@ -625,7 +821,7 @@ def _parker_Icontinuum(coeffs, X, beta, l, b, mjd, month_frac, hour_frac, alpha,
     # I_continuum(lambda)
     Icont = (_Iairmass + _Izodiacal + _Iisl + _Isolar_flux + _Iseasonal + _Ihourly + _Iadd_continuum) * _dT + _Itwilight + _Imoon
 
-    return 10*coeffs['wl'], np.array(Icont)
+    return 10*coeffs['wl'], np.atleast_2d(Icont)
 
 
 def _parker_cI_moon_exp(altm, illm, deltam, g, airmass, coeffs): 
@@ -647,27 +843,18 @@ def _parker_albedo(g, coeffs):
     ''' albedo, i.e. reflectivity of the moon (Fragelius thesis Eq. 4.28)
     g is the lunar phase (g = 0 for full moon and 180 for new moon) 
     '''
-    albedo_table = pd.read_csv(''.join([UT.code_dir(), 'dat/sky/albedo_constants.csv']), 
-            delim_whitespace=True) 
-    albedo_constants = {}
-    for col in list(albedo_table):
-        line = interp1d(albedo_table['WAVELENGTH'], albedo_table[col], 
-                bounds_error=False, fill_value=0)
-        albedo_constants[col] = line 
-
     p1 = 4.06054
     p2 = 12.8802
     p3 = -30.5858
     p4 = 16.7498
-    A = []
-    for i in range(4):
-        A.append(albedo_constants['a%d'%i](coeffs['wl'])*(g**i))
-    A.append(albedo_constants['d1'](coeffs['wl']) * np.exp(-g/p1))
-    A.append(albedo_constants['d2'](coeffs['wl']) * np.exp(-g/p2))
-    A.append(albedo_constants['d3'](coeffs['wl']) * np.cos((g - p3)/p4))
-    lnA = np.sum(A, axis=0)
-    Al  = np.exp(lnA)
-    return Al
+    lnA = (coeffs['albedo_a0'] + 
+            coeffs['albedo_a1'] * g + 
+            coeffs['albedo_a2'] * g**2 + 
+            coeffs['albedo_a3'] * g**3 + 
+            coeffs['albedo_d1'] * np.exp(-g/p1) + 
+            coeffs['albedo_d2'] * np.exp(-g/p2) + 
+            coeffs['albedo_d3'] * np.cos((g - p3)/p4))
+    return np.exp(lnA)
 
 
 def _parker_cI_twi_exp(alpha, delta, airmass, coeffs): 
@@ -675,27 +862,21 @@ def _parker_cI_twi_exp(alpha, delta, airmass, coeffs):
     off the atmosphere into the field of view. (Fragelius thesis Eq. 4.27)
     no observations are made when sun is above -14 altitude.
     '''
-    if alpha > -20.: 
-        twi = (
-                coeffs['t0'] * np.abs(alpha) + # CT2
-                coeffs['t1'] * alpha**2 +      # CT1
-                coeffs['t2'] * delta**2 +      # CT3
-                coeffs['t3'] * delta           # CT4
-                ) * np.exp(-coeffs['t4'] * airmass)
-    else: 
-        twi = np.zeros(len(coeffs['t0'])) 
-    return twi
+    twi = (
+            coeffs['t0'] * np.abs(alpha) + # CT2
+            coeffs['t1'] * alpha**2 +      # CT1
+            coeffs['t2'] * delta**2 +      # CT3
+            coeffs['t3'] * delta           # CT4
+            ) * np.exp(-coeffs['t4'] * airmass)
+    # no twilight contribution when the sun is below -20 altitude
+    return np.where(np.asarray(alpha) > -20., twi, 0.) 
 
 
 def _parker_deltaT(airmass, coeffs): 
     '''effective transmission curve that accounts for the additional extinction 
     for observing at higher airmass (Fragelius thesis Eq. 4.24)
     '''
-    zen_ext = np.loadtxt(''.join([UT.code_dir(), 'dat/sky/ZenithExtinction-KPNO.dat']))
-    zen_wave = zen_ext[:,0]/10.
-    ext = zen_ext[:,1]
-    zext = interp1d(zen_wave, ext, bounds_error=False, fill_value='extrapolate')
-    k = zext(coeffs['wl'])
+    k = coeffs['k_zenith']
     return 1 - (10**(-0.4*k) - 10**(-0.4*k*airmass))
 
 
@@ -703,50 +884,40 @@ def _parker_cI_hour(hour_frac, coeffs):
     ''' Fragelius thesis Eq. 4.26
     '''
     levels = np.linspace(0,1,7)
-    idx = np.argmin(np.abs(levels - hour_frac))
-
-    _hours = np.zeros(6)
-    _hours[idx] = 1
-
-    for i in range(1,6): 
-        if i == 1: 
-            hours = coeffs['c'+str(i+1)] * _hours[i]
-        else: 
-            hours += coeffs['c'+str(i+1)] * _hours[i]
-    return hours 
+    idx = np.argmin(np.abs(levels - np.atleast_1d(hour_frac).ravel()[:,None]), axis=1)
+    return coeffs['hourly'][idx]
 
 
 def _parker_cI_seas(month_frac, coeffs): 
     # Fragelius thesis Eq. 4.25 
-    mm = np.rint(month_frac)
-    if mm == 13: mm = 1
-    
-    _months = np.zeros(12) 
-    _months[int(mm-1)] = 1
-    
-    month_names = ['feb', 'mar', 'apr', 'may', 'jun', 'jul', 'sep', 'oct', 'nov', 'dec']
-
-    for i, mon in zip(range(1,12),  month_names): 
-        if i == 1: 
-            months = coeffs[mon] * _months[i]
-        else: 
-            months += coeffs[mon] * _months[i]
-    return months 
+    mm = np.rint(np.atleast_1d(month_frac).ravel()).astype(int)
+    mm[mm == 13] = 1
+    return coeffs['seasonal'][mm-1]
 
 
-def _parker_Isf(mjd): 
+def _parker_Isf(mjd, coeffs): 
     # solar flux as a function of MJD 
-    solar_data = np.load(''.join([UT.code_dir(), 'dat/sky/solar_flux.npy'])) 
-    solar_flux = interp1d(solar_data['MJD'], solar_data['fluxobsflux'], bounds_error=False, fill_value=0)
-    return solar_flux(mjd) 
+    return np.interp(mjd, coeffs['solar_mjd'], coeffs['solar_flux'], left=0., right=0.)
 
 
-def _parker_Iisl(gal_lat, gal_long): 
+def _parker_Iisl(gal_lat, gal_long, coeffs): 
     # returns float 
-    isl_data = pickle.load(open(''.join([UT.code_dir(), 'dat/sky/isl_map.p']),'rb'))
-    return isl_data(gal_long, gal_lat)[0]
+    return _interp_grid2d(gal_long, gal_lat, coeffs['isl_x'], coeffs['isl_y'], coeffs['isl'])
+
 
+def _parker_Izodi(ecl_lat, coeffs): 
+    return np.interp(np.abs(ecl_lat), coeffs['zodi_x'], coeffs['zodi'])
 
-def _parker_Izodi(ecl_lat): 
-    zodi_data = pickle.load(open(''.join([UT.code_dir(), 'dat/sky/s10_zodi.p']),'rb'))
-    return zodi_data(np.abs(ecl_lat))
+
+def _interp_grid2d(x, y, xgrid, ygrid, z): 
+    ''' bilinear interpolation of `z` tabulated on the regular grid 
+    (`ygrid`, `xgrid`). Points outside the grid are clamped to the edges. 
+    '''
+    x = np.clip(x, xgrid[0], xgrid[-1]) 
+    y = np.clip(y, ygrid[0], ygrid[-1]) 
+    ix = np.clip(np.searchsorted(xgrid, x) - 1, 0, len(xgrid) - 2) 
+    iy = np.clip(np.searchsorted(ygrid, y) - 1, 0, len(ygrid) - 2) 
+    tx = (x - xgrid[ix]) / (xgrid[ix+1] - xgrid[ix]) 
+    ty = (y - ygrid[iy]) / (ygrid[iy+1] - ygrid[iy]) 
+    return ((1. - tx) * (1. - ty) * z[iy, ix] + tx * (1. - ty) * z[iy, ix+1] + 
+            (1. - tx) * ty * z[iy+1, ix] + tx * ty * z[iy+1, ix+1]) 
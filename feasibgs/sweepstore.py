@@ -0,0 +1,299 @@
+'''
+
+HEALPix partitioned store of Legacy Survey sweep photometry. The sweep files
+are repartitioned into one hdf5 file per (nested) HEALPix pixel with one
+chunked dataset per column, so regional extractions only read the pixels
+that overlap the region and only the requested columns instead of scanning
+every sweep file.
+
+    store = SweepStore(dir_store)
+    store.ingest(fsweeps, columns=['ra', 'dec', 'flux_r'])
+    sweep = store.box([160., 230.], [-2., 18.], columns=['ra', 'dec', 'flux_r'])
+
+'''
+import os
+import glob
+import h5py
+import numpy as np
+from multiprocessing import Pool
+from astropy.io import fits
+# -- feasibgs --
+from .catalogs import Catalog, _unit_vectors
+from .footprint import ra_overlap
+
+
+class SweepStore(object):
+    ''' HEALPix partitioned store of sweep photometry in directory
+    `dir_store`. The pixel files are named `sweep.nside%i.pix%06i.hdf5` and
+    `index.npz` stores the nside, the pixels, their object counts, their
+    RA/Dec bounds and the names of the ingested sweep files.
+
+    :param dir_store:
+        directory of the store
+
+    :param nside:
+        HEALPix nside of the partition. Only used when the store is created;
+        an existing store keeps its nside. (default: 32, ~3.4 deg^2 pixels)
+    '''
+    def __init__(self, dir_store, nside=32):
+        self.dir_store = dir_store
+        if not os.path.isdir(dir_store): os.makedirs(dir_store)
+        self.nside = nside
+        self.index = None
+        if os.path.isfile(self._index_file()):
+            self.index = dict(np.load(self._index_file()))
+            self.nside = int(self.index['nside'])
+
+    def ingest(self, fsweeps, columns=None, rlimit=None, n_proc=1, silent=True):
+        ''' repartition sweep files into the store. The sweep files are read
+        (memory-mapped) and split into pixels in a process pool, and the
+        objects of each pixel are appended to the pixel files. Sweep files
+        that are already in the store (by file name) are skipped, since
+        appending them again would duplicate their objects.
+
+        :param fsweeps:
+            list of sweep files
+
+        :param columns:
+            (optional) sweep columns to store. RA and Dec are always stored.
+            (default: all columns)
+
+        :param rlimit:
+            (optional) only store objects brighter than this extinction
+            corrected r-band magnitude
+        '''
+        ingested = list(self.ingested())
+        _fsweeps = []
+        for fsweep in fsweeps:
+            if os.path.basename(fsweep) in ingested:
+                if not silent: print('%s already ingested; skipping' % os.path.basename(fsweep))
+                continue
+            ingested.append(os.path.basename(fsweep))
+            _fsweeps.append(fsweep)
+        fsweeps = _fsweeps
+        if len(fsweeps) == 0: return None
+
+        _cat = Catalog()
+        args = [(fsweep, columns, rlimit, self.nside) for fsweep in fsweeps]
+        if n_proc > 1:
+            pool = Pool(processes=n_proc)
+            splits = pool.imap(_split_sweep, args)
+        else:
+            splits = map(_split_sweep, args)
+
+        for fsweep, (upix, i0s, cols) in zip(fsweeps, splits):
+            if not silent: print('%i objects in %i pixels from %s' %
+                    (len(cols['ra']), len(upix), os.path.basename(fsweep)))
+            i1s = np.append(i0s[1:], len(cols['ra']))
+            for pix, i0, i1 in zip(upix, i0s, i1s):
+                with h5py.File(self._pixel_file(pix), 'a') as f:
+                    for key in cols.keys():
+                        _cat._h5py_append_dataset(f, key, cols[key][i0:i1])
+        if n_proc > 1:
+            pool.close()
+            pool.join()
+        self._build_index(ingested)
+        return None
+
+    def ingested(self):
+        ''' names of the sweep files ingested into the store
+        '''
+        if self.index is None or 'fsweeps' not in self.index: return np.array([], dtype=str)
+        return self.index['fsweeps']
+
+    def columns(self):
+        ''' columns in the store
+        '''
+        if self.index is None or len(self.index['pix']) == 0: return []
+        with h5py.File(self._pixel_file(self.index['pix'][0]), 'r') as f:
+            return sorted(f.keys())
+
+    def box(self, ra_lim, dec_lim, columns=None):
+        ''' objects within an RA/Dec box. Boxes with ra_lim[0] > ra_lim[1]
+        wrap around RA = 0.
+
+        :param ra_lim:
+            (ra_min, ra_max) in degrees
+
+        :param dec_lim:
+            (dec_min, dec_max) in degrees
+
+        :param columns:
+            (optional) columns to read (default: all columns)
+
+        :return sweep:
+            dictionary of the columns
+        '''
+        ra_min, ra_max = ra_lim
+        dec_min, dec_max = dec_lim
+        wrap = (ra_min > ra_max)
+        pixels = self._box_pixels(ra_lim, dec_lim)
+
+        def _cut(cols):
+            ra, dec = cols['ra'], cols['dec']
+            if wrap: _in_ra = (ra >= ra_min) | (ra <= ra_max)
+            else: _in_ra = (ra >= ra_min) & (ra <= ra_max)
+            return _in_ra & (dec >= dec_min) & (dec <= dec_max)
+        return self._read(pixels, columns, _cut)
+
+    def _box_pixels(self, ra_lim, dec_lim):
+        ''' pixels of the store that overlap with an RA/Dec box
+        '''
+        ind = self.index
+        in_dec = (ind['dec_hi'] >= dec_lim[0]) & (ind['dec_lo'] <= dec_lim[1])
+        in_ra = ra_overlap(ind['ra_lo'], ind['ra_hi'], ra_lim)
+        return ind['pix'][in_dec & in_ra]
+
+    def polygon(self, ra, dec, columns=None):
+        ''' objects within a convex spherical polygon with great circle edges
+
+        :param ra, dec:
+            RA and Dec of the polygon vertices in degrees
+
+        :param columns:
+            (optional) columns to read (default: all columns)
+        '''
+        import healpy as hp
+        vert = _unit_vectors(ra, dec)
+        # orient the edges counterclockwise around the centroid
+        normals = np.cross(vert, np.roll(vert, -1, axis=0))
+        if np.dot(normals[0], vert.mean(axis=0)) < 0: normals = -normals
+
+        pixels = np.intersect1d(self.index['pix'],
+                hp.query_polygon(self.nside, vert, inclusive=True, nest=True))
+
+        def _cut(cols):
+            xyz = _unit_vectors(cols['ra'], cols['dec'])
+            return np.all(np.dot(xyz, normals.T) >= 0., axis=1)
+        return self._read(pixels, columns, _cut)
+
+    def tiles(self, tile_ra, tile_dec, radius=1.605, columns=None):
+        ''' objects within `radius` of any of the tile centers
+
+        :param tile_ra, tile_dec:
+            RA and Dec of the tile centers in degrees
+
+        :param radius:
+            tile radius in degrees (default: 1.605, DESI focal plane)
+
+        :param columns:
+            (optional) columns to read (default: all columns)
+        '''
+        import healpy as hp
+        from scipy.spatial import cKDTree
+        centers = _unit_vectors(np.atleast_1d(tile_ra), np.atleast_1d(tile_dec))
+        pixels = np.unique(np.concatenate([hp.query_disc(self.nside, c, np.radians(radius),
+            inclusive=True, nest=True) for c in centers]))
+        pixels = np.intersect1d(self.index['pix'], pixels)
+
+        tree = cKDTree(centers)
+        chord = 2. * np.sin(0.5 * np.radians(radius))
+
+        def _cut(cols):
+            dist, _ = tree.query(_unit_vectors(cols['ra'], cols['dec']))
+            return dist <= chord
+        return self._read(pixels, columns, _cut)
+
+    def _read(self, pixels, columns, cut):
+        ''' read columns of the objects in the pixels that pass `cut`
+        '''
+        if columns is None: columns = self.columns()
+        columns = [c.lower() for c in columns]
+        read_cols = list(columns) + [c for c in ['ra', 'dec'] if c not in columns]
+
+        chunks = dict([(c, []) for c in columns])
+        for pix in pixels:
+            with h5py.File(self._pixel_file(pix), 'r') as f:
+                cols = dict([(c, f[c][...]) for c in read_cols])
+            sel = cut(cols)
+            for c in columns:
+                chunks[c].append(cols[c][sel])
+
+        sweep = {}
+        for c in columns:
+            if len(chunks[c]) > 0: sweep[c] = np.concatenate(chunks[c], axis=0)
+            else: sweep[c] = self._empty(c)
+        return sweep
+
+    def _empty(self, column):
+        ''' empty array with the dtype and shape of a column of the store. The
+        dtype is in native byte order like the concatenated non-empty reads.
+        '''
+        if self.index is None or len(self.index['pix']) == 0: return np.zeros(0)
+        with h5py.File(self._pixel_file(self.index['pix'][0]), 'r') as f:
+            ds = f[column]
+            return np.zeros((0,) + ds.shape[1:], dtype=ds.dtype.newbyteorder('='))
+
+    def _build_index(self, fsweeps):
+        ''' index of the pixels in the store: object counts and RA/Dec bounds
+
+        :param fsweeps:
+            names of the sweep files in the store
+        '''
+        import healpy as hp
+        fpix = sorted(glob.glob(os.path.join(self.dir_store, 'sweep.nside%i.pix*.hdf5' % self.nside)))
+        pix = np.array([int(os.path.basename(f).split('.pix')[1].split('.')[0]) for f in fpix], dtype=int)
+        count = np.zeros(len(pix), dtype=int)
+        for i, f in enumerate(fpix):
+            with h5py.File(f, 'r') as _f: count[i] = _f['ra'].shape[0]
+
+        # bounds of the pixels from their boundaries
+        ra_lo, ra_hi = np.zeros(len(pix)), np.zeros(len(pix))
+        dec_lo, dec_hi = np.zeros(len(pix)), np.zeros(len(pix))
+        for i, p in enumerate(pix):
+            xyz = hp.boundaries(self.nside, p, step=4, nest=True).T
+            ra_b, dec_b = hp.vec2ang(xyz, lonlat=True)
+            ra_c, _ = hp.pix2ang(self.nside, p, nest=True, lonlat=True)
+            # unwrap RA around the pixel center
+            ra_b = ra_c + ((ra_b - ra_c + 180.) % 360. - 180.)
+            ra_lo[i], ra_hi[i] = ra_b.min(), ra_b.max()
+            dec_lo[i], dec_hi[i] = dec_b.min(), dec_b.max()
+            if np.abs(dec_b).max() > 89.: # pixels at the poles
+                ra_lo[i], ra_hi[i] = 0., 360.
+                if dec_b.max() > 0: dec_hi[i] = 90.
+                else: dec_lo[i] = -90.
+
+        self.index = {'nside': self.nside, 'pix': pix, 'count': count,
+                'ra_lo': ra_lo, 'ra_hi': ra_hi, 'dec_lo': dec_lo, 'dec_hi': dec_hi,
+                'fsweeps': np.array(fsweeps, dtype=str)}
+        np.savez(self._index_file(), **self.index)
+        return None
+
+    def _pixel_file(self, pix):
+        return os.path.join(self.dir_store, 'sweep.nside%i.pix%06i.hdf5' % (self.nside, pix))
+
+    def _index_file(self):
+        return os.path.join(self.dir_store, 'index.npz')
+
+
+def _split_sweep(args):
+    ''' read the columns of a (memory-mapped) sweep file and sort the objects
+    by HEALPix pixel.
+
+    :return upix, i0s, cols:
+        unique pixels, index of the first object of each pixel, and the
+        sorted columns
+    '''
+    import healpy as hp
+    fsweep, columns, rlimit, nside = args
+    with fits.open(fsweep, memmap=True) as hdul:
+        sweep = hdul[1].data
+        keep = np.ones(len(sweep)).astype(bool)
+        if rlimit is not None:
+            rflux = sweep['FLUX_R'] / sweep['MW_TRANSMISSION_R']
+            keep = (rflux > 10**((22.5 - rlimit)/2.5))
+        if columns is None:
+            columns = sweep.names
+        else:
+            columns = list(columns) + [k for k in ['ra', 'dec'] if k not in [c.lower() for c in columns]]
+        cols = {}
+        for key in columns:
+            cols[key.lower()] = np.array(sweep[key][keep])
+
+    pix = hp.ang2pix(nside, cols['ra'], cols['dec'], nest=True, lonlat=True)
+    isort = np.argsort(pix, kind='mergesort')
+    for key in cols.keys():
+        cols[key] = cols[key][isort]
+    upix, i0s = np.unique(pix[isort], return_index=True)
+    return upix, i0s, cols
+
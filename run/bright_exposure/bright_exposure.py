@@ -19,6 +19,8 @@ from desispec.io import read_spectra
 from feasibgs import util as UT
 from feasibgs import catalogs as Cat
 from feasibgs import skymodel as Sky
+from feasibgs import continuum as Cont
+from feasibgs import domain as Dom
 # -- plotting -- 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -100,12 +102,9 @@ def texp_factor(validate=False, silent=True, wrange=4500):
     sky_dark= surface_brightness_dict['dark'] 
     
     # get the continuums 
-    w_cont, sky_dark_cont = getContinuum(wave, sky_dark.value)
+    w_cont, sky_dark_cont = Cont.binned_continuum(wave, sky_dark.value)
 
-    sky_bright_cont = np.zeros((len(sky_bright), len(w_cont)))
-    for isky in range(len(sky_bright)):  
-        _, sky_bright_cont_i = getContinuum(wave, sky_bright[isky])
-        sky_bright_cont[isky,:] = sky_bright_cont_i
+    _, sky_bright_cont = Cont.binned_continuum(wave, sky_bright)
 
     # calculate (new sky brightness)/(nominal dark sky brightness), which is the correction
     # factor for the exposure time. 
@@ -225,9 +224,8 @@ def texp_factor_GP(validate=False):
     _thetas = np.zeros((5000, 6))
     for i in range(6): 
         _thetas[:,i] = np.random.uniform(thetas[:,i].min(), thetas[:,i].max(), 5000)
-    print('convex hull') 
-    param_hull = sp.spatial.Delaunay(thetas[::10,:])
-    inhull = (param_hull.find_simplex(_thetas) >= 0) 
+    print('domain of the exposures') 
+    inhull = Dom.ConditionDomain(thetas).inside(_thetas) 
     thetas_test = _thetas[inhull]
     print('test set size', thetas_test.shape)
     mu_theta_test = np.zeros(np.sum(inhull))
@@ -321,8 +319,7 @@ def test_texp_factor_GP():
     _thetas = np.zeros((5000, 6))
     for i in range(6): 
         _thetas[:,i] = np.random.uniform(thetas[:,i].min(), thetas[:,i].max(), 5000)
-    param_hull = sp.spatial.Delaunay(thetas[::10,:])
-    inhull = (param_hull.find_simplex(_thetas) >= 0) 
+    inhull = Dom.ConditionDomain(thetas).inside(_thetas) 
     thetas_test = _thetas[inhull]
 
     for typ in ['nottwi', 'twi']:
@@ -347,18 +344,6 @@ def test_texp_factor_GP():
     return None
 
 
-def getContinuum(ww, sb): 
-    ''' smooth out the sufrace brightness somehow...
-    '''
-    wavebin = np.linspace(3.6e3, 1e4, 10)
-    sb_med = np.zeros(len(wavebin)-1)
-    for i in range(len(wavebin)-1): 
-        inwbin = ((wavebin[i] < ww) & (ww < wavebin[i+1]) & np.isfinite(sb))
-        if np.sum(inwbin) > 0.: 
-            sb_med[i] = np.median(sb[inwbin])
-    return 0.5*(wavebin[1:]+wavebin[:-1]), sb_med
-
-
 def sky_KSrescaled_twi(airmass, moonill, moonalt, moonsep, sun_alt, sun_sep):
     ''' calculate sky brightness using rescaled KS coefficients plus a twilight
     factor from Parker. 
@@ -13,6 +13,7 @@ from astropy.io import fits
 from astropy.table import Table as aTable
 # -- feasibgs -- 
 from feasibgs import util as UT
+from feasibgs import domain as Dom 
 # -- plotting -- 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -205,29 +206,21 @@ def surveysim_convexhull(expfile):
     thetas[:,3] = sun_alt
     thetas[:,4] = sun_sep
 
-    # read BGS exposures used to train the GP 
-    _fexps = h5py.File(''.join([UT.dat_dir(), 'bgs_survey_exposures.withsun.hdf5']), 'r')
-    theta_train = np.zeros((len(_fexps['MOONALT'][...]), 5))
-    theta_train[:,0] = _fexps['MOONFRAC'][...]
-    theta_train[:,1] = _fexps['MOONALT'][...]
-    theta_train[:,2] = _fexps['MOONSEP'][...]
-    theta_train[:,3] = _fexps['SUNALT'][...]
-    theta_train[:,4] = _fexps['SUNSEP'][...]
-
-    theta_hull = sp.spatial.Delaunay(theta_train)
-    inhull = (theta_hull.find_simplex(thetas) >= 0) 
-
-    fboss = os.path.join(UT.dat_dir(), 'sky', 'Bright_BOSS_Sky_blue.fits')
-    boss = aTable.read(fboss)
-    theta_boss = np.zeros((len(boss['MOON_ALT']), 5))
-    theta_boss[:,0] = boss['MOON_ILL']
-    theta_boss[:,1] = boss['MOON_ALT']
-    theta_boss[:,2] = boss['MOON_SEP']
-    theta_boss[:,3] = boss['SUN_ALT']
-    theta_boss[:,4] = boss['SUN_SEP']
-    
-    theta_hull_boss = sp.spatial.Delaunay(theta_boss)
-    inbosshull = (theta_hull_boss.find_simplex(thetas) >= 0) 
+    # domains of the BGS exposures used to train the GP and the BOSS skies 
+    # (built once and stored) 
+    dom_train = Dom.cached_domain(os.path.join(UT.dat_dir(), 'bright_exposure', 'domain.GPtrain.npz'), 
+            _theta_train, inputs=[''.join([UT.dat_dir(), 'bgs_survey_exposures.withsun.hdf5'])], 
+            names=['moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep'])
+    theta_train = dom_train.theta 
+    inhull, dist_train, _ = dom_train.query(thetas)
+
+    dom_boss = Dom.cached_domain(os.path.join(UT.dat_dir(), 'bright_exposure', 'domain.BOSS.npz'), 
+            _theta_boss, inputs=[os.path.join(UT.dat_dir(), 'sky', 'Bright_BOSS_Sky_blue.fits')], 
+            names=['moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep'])
+    theta_boss = dom_boss.theta 
+    inbosshull, dist_boss, _ = dom_boss.query(thetas)
+    print('%i of %i exposures within training set' % (np.sum(inhull), len(inhull)))
+    print('%i of %i exposures within BOSS skies' % (np.sum(inbosshull), len(inbosshull)))
 
     fig = plt.figure(figsize=(15,5))
     sub = fig.add_subplot(131)
@@ -292,6 +285,34 @@ def surveysim_convexhull(expfile):
     return None 
 
 
+def _theta_train(): 
+    ''' moon and sun parameters of the BGS exposures used to train the GP
+    '''
+    _fexps = h5py.File(''.join([UT.dat_dir(), 'bgs_survey_exposures.withsun.hdf5']), 'r')
+    theta_train = np.zeros((len(_fexps['MOONALT'][...]), 5))
+    theta_train[:,0] = _fexps['MOONFRAC'][...]
+    theta_train[:,1] = _fexps['MOONALT'][...]
+    theta_train[:,2] = _fexps['MOONSEP'][...]
+    theta_train[:,3] = _fexps['SUNALT'][...]
+    theta_train[:,4] = _fexps['SUNSEP'][...]
+    _fexps.close() 
+    return theta_train 
+
+
+def _theta_boss(): 
+    ''' moon and sun parameters of the BOSS skies 
+    '''
+    fboss = os.path.join(UT.dat_dir(), 'sky', 'Bright_BOSS_Sky_blue.fits')
+    boss = aTable.read(fboss)
+    theta_boss = np.zeros((len(boss['MOON_ALT']), 5))
+    theta_boss[:,0] = boss['MOON_ILL']
+    theta_boss[:,1] = boss['MOON_ALT']
+    theta_boss[:,2] = boss['MOON_SEP']
+    theta_boss[:,3] = boss['SUN_ALT']
+    theta_boss[:,4] = boss['SUN_SEP']
+    return theta_boss 
+
+
 def surveysim_convexhull_exposure_samples(expfile): 
     ''' read in surveysim output and examine the observing parameters and construct
     a sample of exposures that includes the convexhull and a random set of exposures. 
@@ -384,48 +405,7 @@ def surveysim_convexhull_exposure_samples(expfile):
 def get_thetaSky(ra, dec, mjd): 
     ''' given RA, Dec, and mjd time return sky parameters at kitt peak 
     '''
-    import ephem 
-    from astropy.time import Time
-    import desisurvey.config
-    import desisurvey.utils as dutils
-    config = desisurvey.config.Configuration()
-
-    mayall = ephem.Observer()
-    mayall.lat = config.location.latitude().to(u.rad).value
-    mayall.lon = config.location.longitude().to(u.rad).value
-    mayall.elevation = config.location.elevation().to(u.m).value
-    # Configure atmospheric refraction model for rise/set calculations.
-    mayall.pressure = 1e3 * config.location.pressure().to(u.bar).value
-    mayall.temp = config.location.temperature().to(u.C).value
-
-    # observed time (MJD) 
-    mjd_time = Time(mjd, format='mjd')
-
-    moon_alt    = np.zeros(len(mjd))
-    moon_ra     = np.zeros(len(mjd))
-    moon_dec    = np.zeros(len(mjd)) 
-    moon_ill    = np.zeros(len(mjd))
-    sun_alt     = np.zeros(len(mjd))
-    sun_ra      = np.zeros(len(mjd))
-    sun_dec     = np.zeros(len(mjd)) 
-    for i in range(len(mjd)):
-        mayall.date = mjd_time.datetime[i] 
-        _moon = ephem.Moon()
-        _moon.compute(mayall) 
-        _sun = ephem.Sun()
-        _sun.compute(mayall) 
-        
-        moon_alt[i] = 180./np.pi*_moon.alt
-        moon_ra[i]  = 180./np.pi*_moon.ra
-        moon_dec[i] = 180./np.pi*_moon.dec
-        moon_ill[i] = _moon.moon_phase
-        sun_alt[i] = 180./np.pi*_sun.alt
-        sun_ra[i]  = 180./np.pi*_sun.ra
-        sun_dec[i] = 180./np.pi*_sun.dec
-
-    moon_sep    = np.diag(dutils.separation_matrix(moon_ra, moon_dec, np.atleast_1d(ra), np.atleast_1d(dec)))
-    sun_sep     = np.diag(dutils.separation_matrix(sun_ra, sun_dec, np.atleast_1d(ra), np.atleast_1d(dec)))
-    return moon_ill, moon_alt, moon_sep, sun_alt, sun_sep
+    return UT.get_thetaSky(ra, dec, mjd)
 
 
 if __name__=="__main__": 
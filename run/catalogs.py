@@ -1,6 +1,10 @@
 #!/bin/python
 '''
 '''
+import os 
+import time 
+import h5py 
+import numpy as np 
 from feasibgs import catalogs as Cat
 
 def legacy_1400deg2_test_region(rlimit=21.):
@@ -21,6 +25,57 @@ def legacy_1400deg2_test_region_collect_sweeps(rlimit=21.):
     return None
 
 
+def benchmark_hdf5_read(fcatalog=None, compression=None, nrepeat=3): 
+    ''' compare the read throughput of the column subsets of a catalog in its
+    current layout to the same catalog rewritten with chunked, typed (and
+    optionally compressed) datasets by `Catalog._h5py_create_dataset`. 
+
+    :param fcatalog: 
+        hdf5 catalog (default: GAMA-Legacy G15 catalog) 
+    '''
+    if fcatalog is None: fcatalog = Cat.GamaLegacy()._File('g15', dr_gama=3, dr_legacy=7)
+    fnew = fcatalog.replace('.hdf5', '.chunked.hdf5') 
+
+    # rewrite the catalog 
+    cat = Cat.Catalog() 
+    fin = h5py.File(fcatalog, 'r') 
+    fout = h5py.File(fnew, 'w') 
+    def _copy(name, obj): 
+        if isinstance(obj, h5py.Dataset): 
+            grp = fout.require_group(os.path.dirname(name) or '/')
+            cat._h5py_create_dataset(grp, os.path.basename(name), obj[...], compression=compression)
+    fin.visititems(_copy)
+    fout.close() 
+    fin.close() 
+    print('%s: %.1f MB' % (fcatalog, os.path.getsize(fcatalog)/1e6))
+    print('%s: %.1f MB' % (fnew, os.path.getsize(fnew)/1e6))
+
+    # typical column subsets 
+    subsets = {
+            'positions': ['gama-photo/ra', 'gama-photo/dec'], 
+            'redshifts': ['gama-spec/z'], 
+            'fluxes': ['legacy-photo/flux_%s' % b for b in 'grz'], 
+            'apfluxes': ['legacy-photo/apflux_%s' % b for b in 'grz'], 
+            'bricks': ['legacy-photo/brickname', 'legacy-photo/objid']}
+
+    for name, cols in subsets.items(): 
+        # both layouts are credited with the bytes of the typed columns in the
+        # new file; variable-length strings load as object arrays whose
+        # nbytes only counts the pointers 
+        with h5py.File(fnew, 'r') as f: 
+            nbyte = np.sum([f[c].dtype.itemsize * f[c].size for c in cols if c in f]) 
+        for fname in [fcatalog, fnew]: 
+            dt = [] 
+            for i in range(nrepeat): 
+                t0 = time.time() 
+                with h5py.File(fname, 'r') as f: 
+                    cols_in = [c for c in cols if c in f]
+                    data = [f[c][...] for c in cols_in]
+                dt.append(time.time() - t0) 
+            print('%s %s: %.3f s, %.1f MB/s' % (name, os.path.basename(fname), np.min(dt), nbyte/1e6/np.min(dt)))
+    return None 
+
+
 if __name__=="__main__":
     #legacy_1400deg2_test_region_collect_sweeps(rlimit=21.)
     legacy_1400deg2_test_region(rlimit=21.)
@@ -24,6 +24,8 @@ from desietcimg.util import load_raw
 # -- feasibgs --
 from feasibgs import util as UT
 from feasibgs import skymodel as Sky
+from feasibgs import continuum as Cont
+from feasibgs import ephemeris as Ephem
 # -- astro -- 
 import astropy.units as u
 from astropy.time import Time
@@ -201,7 +203,7 @@ def fexptime_model(airmass, moonill, moonalt, moonsep, sun_alt, sun_sep):
     '''
     # get sky brightness from updated model 
     wave, sky_bright = Sky.Isky_newKS_twi(airmass, moonill, moonalt, moonsep, sun_alt, sun_sep)
-    _, sky_bright_cont = getContinuum(wave.value, sky_bright)
+    _, sky_bright_cont = Cont.binned_continuum(wave.value, sky_bright)
     
     # nominal dark sky brightness 
     config = desisim.simexp._specsim_config_for_wave(wave.value, dwave_out=None, specsim_config_file='desi')
@@ -210,7 +212,7 @@ def fexptime_model(airmass, moonill, moonalt, moonsep, sun_alt, sun_sep):
     sky_dark= surface_brightness_dict['dark'] 
     
     # get the continuums for dark sky 
-    w_cont, sky_dark_cont = getContinuum(wave.value, sky_dark.value)
+    w_cont, sky_dark_cont = Cont.binned_continuum(wave.value, sky_dark.value)
 
     # calculate (new sky brightness)/(nominal dark sky brightness), which is the correction
     # factor for the exposure time. 
@@ -230,7 +232,7 @@ def fexptime_omodel(airmass, moonill, moonalt, moonsep):
 
     sky_bright = skymodel.surface_brightness
     
-    _, sky_bright_cont = getContinuum(skymodel._wavelength.value, sky_bright.value)
+    _, sky_bright_cont = Cont.binned_continuum(skymodel._wavelength.value, sky_bright.value)
 
     # nominal dark sky brightness 
     config = desisim.simexp._specsim_config_for_wave(skymodel._wavelength.value, dwave_out=None, specsim_config_file='desi')
@@ -239,7 +241,7 @@ def fexptime_omodel(airmass, moonill, moonalt, moonsep):
     sky_dark= surface_brightness_dict['dark'] 
 
     # get the continuums for dark sky 
-    w_cont, sky_dark_cont = getContinuum(skymodel._wavelength.value, sky_dark.value)
+    w_cont, sky_dark_cont = Cont.binned_continuum(skymodel._wavelength.value, sky_dark.value)
     
     # calculate (new sky brightness)/(nominal dark sky brightness), which is the correction
     # factor for the exposure time. 
@@ -607,6 +609,9 @@ def get_obscond(ra, dec, mjd):
     phase       = np.arctan2(sun.distance * np.sin(elongation), moon.distance - sun.distance*np.cos(elongation))
     obscond['moon_phase']   = phase.value
     obscond['moon_ill']     = (1. + np.cos(phase.value))/2.
+
+    # fraction of the night (used for the hourly contribution in Parker's model)
+    obscond['hour_frac'] = Ephem.night_fraction(mjd) 
     return obscond
 
 
@@ -679,18 +684,6 @@ def make_obscond_table():
     return None
 
 
-def getContinuum(ww, sb): 
-    ''' smooth out the sufrace brightness somehow...
-    '''
-    wavebin = np.linspace(3.6e3, 1e4, 10)
-    sb_med = np.zeros(len(wavebin)-1)
-    for i in range(len(wavebin)-1): 
-        inwbin = ((wavebin[i] < ww) & (ww < wavebin[i+1]) & np.isfinite(sb))
-        if np.sum(inwbin) > 0.: 
-            sb_med[i] = np.median(sb[inwbin])
-    return 0.5*(wavebin[1:]+wavebin[:-1]), sb_med
-
-
 if __name__=='__main__': 
     #make_obscond_table()
     #darksky()
@@ -146,6 +146,14 @@ _vband_extinction = 0.15154
 # surface brightness of the nominal dark sky at ~4500A.
 _dark_sky_4500A = 1.519 
 
+# re-fit KS coefficients of the scattered moonlight model 
+_KS_CR = 458173.535128
+_KS_CM0 = 5.540103
+_KS_CM1 = 178.141045
+
+# supporting data for the bright sky model (see `_load_skydata`) 
+_SKYDATA = None
+
 def moon_exposure_factor(moon_frac, moon_sep, moon_alt, airmass):
     """Calculate exposure time factor due to scattered moonlight.
 
@@ -166,115 +174,115 @@ def moon_exposure_factor(moon_frac, moon_sep, moon_alt, airmass):
 
     Parameters
     ----------
-    moon_frac : float
+    moon_frac : float or array
         Illuminated fraction of the moon, in the range [0,1].
-    moon_sep : float
+    moon_sep : float or array
         Separation angle between field center and moon in degrees, in the
         range [0,180].
-    moon_alt : float
+    moon_alt : float or array
         Altitude angle of the moon above the horizon in degrees, in the
         range [-90,90].
-    airmass : float
+    airmass : float or array
         Airmass used for observing this tile, must be >= 1.
 
     Returns
     -------
-    float
-        Dimensionless factor that exposure time should be increased to
+    float or array
+        Dimensionless factor(s) that exposure time should be increased to
         account for increased sky brightness due to scattered moonlight.
         Will be 1 when the moon is below the horizon.
     """
-    if (moon_frac < 0) or (moon_frac > 1):
+    scalar = all([np.ndim(_x) == 0 for _x in (moon_frac, moon_sep, moon_alt, airmass)])
+    moon_frac, moon_sep, moon_alt, airmass = [_x.flatten() for _x in np.broadcast_arrays(
+        *[np.asarray(_x, dtype=float) for _x in (moon_frac, moon_sep, moon_alt, airmass)])]
+    if np.any((moon_frac < 0) | (moon_frac > 1)):
         raise ValueError('Got invalid moon_frac outside [0,1].')
-    if (moon_sep < 0) or (moon_sep > 180):
+    if np.any((moon_sep < 0) | (moon_sep > 180)):
         raise ValueError('Got invalid moon_sep outside [0,180].')
-    if (moon_alt < -90) or (moon_alt > 90):
+    if np.any((moon_alt < -90) | (moon_alt > 90)):
         raise ValueError('Got invalid moon_alt outside [-90,+90].')
-    if airmass < 1:
+    if np.any(airmass < 1):
         raise ValueError('Got invalid airmass < 1.')
 
     # No exposure penalty when moon is below the horizon.
-    if moon_alt < 0:
-        return 1.
+    f_moon = np.ones(len(airmass))
+    up = (moon_alt >= 0)
+    if np.any(up):
+        # Convert input parameters to those used in the specim moon model.
+        moon_phase = np.arccos(2 * moon_frac[up] - 1) / np.pi
+        separation_angle = moon_sep[up] * u.deg
+        moon_zenith = (90 - moon_alt[up]) * u.deg
 
-    # Convert input parameters to those used in the specim moon model.
-    moon_phase = np.arccos(2 * moon_frac - 1) / np.pi
-    separation_angle = moon_sep * u.deg
-    moon_zenith = (90 - moon_alt) * u.deg
+        # Estimate the zenith angle corresponding to this observing airmass.
+        # We invert eqn.3 of KS1991 for this (instead of eqn.14).
+        obs_zenith = np.arcsin(np.sqrt((1 - airmass[up] ** -2) / 0.96)) * u.rad
 
-    # Estimate the zenith angle corresponding to this observing airmass.
-    # We invert eqn.3 of KS1991 for this (instead of eqn.14).
-    obs_zenith = np.arcsin(np.sqrt((1 - airmass ** -2) / 0.96)) * u.rad
+        # Calculate scattered moon V-band brightness at each pixel.
+        V = krisciunas_schaefer_free(
+            obs_zenith, moon_zenith, separation_angle,
+            moon_phase, _vband_extinction, _KS_CR, _KS_CM0, _KS_CM1).value
 
-    # Calculate scattered moon V-band brightness at each pixel.
-    #V = specsim.atmosphere.krisciunas_schaefer(
-    #    obs_zenith, moon_zenith, separation_angle,
-    #    moon_phase, _vband_extinction).value
-    V = krisciunas_schaefer_refit(
-        obs_zenith, moon_zenith, separation_angle,
-        moon_phase, _vband_extinction).value
+        # Evaluate the linear regression model.
+        X = np.array((np.ones(len(V)), np.exp(-V), 1/V, 1/V**2, 1/V**3))
+        f_moon[up] = _moonCoefficients.dot(X)
 
-    # Evaluate the linear regression model.
-    X = np.array((1, np.exp(-V), 1/V, 1/V**2, 1/V**3))
-    return _moonCoefficients.dot(X)
+    if scalar: return f_moon[0]
+    return f_moon
 
 
 def bright_exposure_factor(moon_frac, moon_alt, moon_sep, sun_alt, sun_sep, airmass):
     """ calculate exposure time correction factor based on airmass and moon and sun 
-    parameters. 
+    parameters. All parameters can be floats or arrays, which are broadcast
+    against each other, so the exposure factors of N tiles (and/or N times)
+    can be calculated in one call. 
 
     Parameters
     ----------
-    moon_frac : float
+    moon_frac : float or array
         Illuminated fraction of the moon, in the range [0,1].
-    moon_alt : float
+    moon_alt : float or array
         Altitude angle of the moon above the horizon in degrees, in the
         range [-90,90].
-    moon_sep : array
+    moon_sep : float or array
         Separation angle between field center and moon in degrees, in the
         range [0,180].
-    sun_alt : float
+    sun_alt : float or array
         Altitude angle of the sunin degrees
-    sun_sep : array 
+    sun_sep : float or array 
         Separation angle between field center and sun in degrees
-    airmass : array 
+    airmass : float or array 
         Airmass used for observing this tile, must be >= 1.
 
     Returns
     -------
-    float
-        Dimensionless factor that exposure time should be increased to
+    array
+        Dimensionless factors that exposure time should be increased to
         account for increased sky brightness due to scattered moonlight.
         Will be 1 when the moon is below the horizon.
 
     """
-    moon_sep = moon_sep.flatten() 
-    sun_sep = sun_sep.flatten()
-    airmass = airmass.flatten() 
-    if (moon_frac < 0) or (moon_frac > 1):
+    moon_frac, moon_alt, moon_sep, sun_alt, sun_sep, airmass = [_x.flatten() for _x in 
+            np.broadcast_arrays(*[np.asarray(_x, dtype=float) for _x in 
+                (moon_frac, moon_alt, moon_sep, sun_alt, sun_sep, airmass)])]
+    if np.any((moon_frac < 0) | (moon_frac > 1)):
         raise ValueError('Got invalid moon_frac outside [0,1].')
-    if (moon_alt < -90) or (moon_alt > 90):
+    if np.any((moon_alt < -90) | (moon_alt > 90)):
         raise ValueError('Got invalid moon_alt outside [-90,+90].')
-    if (moon_sep.min() < 0) or (moon_sep.max() > 180):
+    if np.any((moon_sep < 0) | (moon_sep > 180)):
         raise ValueError('Got invalid moon_sep outside [0,180].')
-    if airmass.min() < 1:
+    if np.any(airmass < 1):
         raise ValueError('Got invalid airmass < 1.')
 
-    assert len(airmass) == len(moon_sep) 
-    assert len(airmass) == len(sun_sep) 
-
     # No exposure penalty when moon is below the horizon and sun is below -20.
-    if moon_alt < 0 and sun_alt < -20.:
-        return np.ones(len(airmass))  
-
-    moon_fracs = np.repeat(moon_frac, len(airmass)) 
-    moon_alts = np.repeat(moon_alt, len(airmass))
-    sun_alts = np.repeat(sun_alt, len(airmass))
-
-    if sun_alt >= -20.: # with twilight 
-        expfactor = texp_factor_bright_twi(airmass, moon_fracs, moon_alts, moon_sep, sun_alts, sun_sep)
-    else:  # without non-twilight model 
-        expfactor = texp_factor_bright_notwi(airmass, moon_fracs, moon_alts, moon_sep)
+    expfactor = np.ones(len(airmass))
+    twi = (sun_alt >= -20.) # with twilight 
+    notwi = ~twi & (moon_alt >= 0.) # without twilight 
+    if np.any(twi): 
+        expfactor[twi] = texp_factor_bright_twi(airmass[twi], moon_frac[twi], 
+                moon_alt[twi], moon_sep[twi], sun_alt[twi], sun_sep[twi])
+    if np.any(notwi): 
+        expfactor[notwi] = texp_factor_bright_notwi(airmass[notwi], moon_frac[notwi], 
+                moon_alt[notwi], moon_sep[notwi])
     return np.clip(expfactor, 1., None) 
 
 
@@ -286,30 +294,7 @@ def texp_factor_bright_notwi(airmass, moonill, moonalt, moonsep):
     (median sky surface brightness 4000A < w < 5000A)/(median nominal dark sky surface brightness 4000A < w < 5000A)
 
     '''
-    # translate moon parameter inputs 
-    moon_phase = np.arccos(2.*moonill - 1)/np.pi
-    moon_zenith = (90. - moonalt) * u.deg
-    separation_angle = moonsep * u.deg
-
-    # load supporting data  
-    fsky = astropy.utils.data._find_pkg_data_path('data/data4skymodel.p') 
-    skydata = pickle.load(open(fsky, 'rb')) 
-    wavelength              = skydata['wavelength'] 
-    Idark                   = skydata['darksky_surface_brightness'] # nominal dark sky surface brightness
-    extinction_array        = skydata['extinction_array'] 
-    moon_spectrum           = skydata['moon_spectrum'] 
-
-    i_airmass = (np.round((airmass - 1.)/0.04)).astype(int) 
-    extinction = extinction_array[i_airmass,:] 
-    #extinction = 10 ** (-extinction_coefficient * np.atleast_1d(airmass)[:,None] / 2.5)
-
-    Imoon = _Imoon(wavelength, moon_spectrum, extinction_array, #extinction_coefficient, extinction,
-            airmass, moon_zenith, separation_angle, moon_phase)
-
-    Isky = extinction * Idark.value + Imoon.value # sky surface brightness 
-
-    #wlim = ((wavelength.value > 4000.) & (wavelength.value < 5000.)) # ratio over 4000 - 5000 A  
-    print('bright sky=', np.median(Isky, axis=1)[:5])
+    Isky = _Isky_bright(airmass, moonill, moonalt, moonsep) # sky surface brightness 
     return np.median(Isky, axis=1) / _dark_sky_4500A
 
 
@@ -321,77 +306,84 @@ def texp_factor_bright_twi(airmass, moonill, moonalt, moonsep, sunalt, sunsep):
     (sky surface brightness @ 4500A)/(nominal dark sky surface brightness @ 4500A)
 
     '''
-    # translate moon parameter inputs 
-    moon_phase = np.arccos(2.*moonill - 1)/np.pi
-    moon_zenith = (90. - moonalt) * u.deg
-    separation_angle = moonsep * u.deg
-
-    # load supporting data  
-    fsky = astropy.utils.data._find_pkg_data_path('data/data4skymodel.p') 
-    skydata = pickle.load(open(fsky, 'rb')) 
-    wavelength              = skydata['wavelength'] 
-    Idark                   = skydata['darksky_surface_brightness'] # nominal dark sky surface brightness
-    extinction_array        = skydata['extinction_array'] 
-    moon_spectrum           = skydata['moon_spectrum'] 
+    skydata = _load_skydata() 
+    Isky = _Isky_bright(airmass, moonill, moonalt, moonsep) # sky surface brightness 
+
+    # twilight on the twilight wavelength grid 
+    sunalt = np.atleast_1d(sunalt)[:,None]
+    sunsep = np.atleast_1d(sunsep)[:,None]
+    Itwi = ((skydata['t0'] * np.abs(sunalt) +      # CT2
+            skydata['t1'] * np.abs(sunalt)**2 +   # CT1
+            skydata['t2'] * np.abs(sunsep)**2 +   # CT3
+            skydata['t3'] * np.abs(sunsep)        # CT4
+            ) * np.exp(-skydata['t4'] * np.atleast_1d(airmass)[:,None]) + skydata['c0']) / np.pi 
     
-    i_airmass = (np.round((airmass - 1.)/0.04)).astype(int) 
-    extinction = extinction_array[i_airmass,:] 
-    #extinction = 10 ** (-extinction_coefficient * np.atleast_1d(airmass)[:,None] / 2.5)
+    # interpolated onto the sky wavelengths 
+    Isky += np.clip(np.dot(Itwi, skydata['twi_interp'].T), 0, None) 
+    return np.median(Isky, axis=1) / _dark_sky_4500A
 
-    Imoon = _Imoon(wavelength, moon_spectrum, extinction_array, 
-            airmass, moon_zenith, separation_angle, moon_phase)
 
-    Isky = extinction * Idark.value + Imoon.value # sky surface brightness 
+def _Isky_bright(airmass, moonill, moonalt, moonsep): 
+    ''' (N, nwave) sky surface brightness without twilight: extincted nominal
+    dark sky plus scattered moonlight 
+    '''
+    skydata = _load_skydata() 
+    airmass = np.atleast_1d(airmass) 
 
-    # load supporting data for twilight calculation  
-    t0 = skydata['t0']
-    t1 = skydata['t1']
-    t2 = skydata['t2']
-    t3 = skydata['t3']
-    t4 = skydata['t4']
-    c0 = skydata['c0'] 
-    w_twi = skydata['wavelength_twi']
+    # translate moon parameter inputs 
+    moon_phase = np.arccos(2.*np.atleast_1d(moonill) - 1)/np.pi
+    moon_zenith = (90. - np.atleast_1d(moonalt)) * u.deg
+    separation_angle = np.atleast_1d(moonsep) * u.deg
 
-    Itwi = ((t0 * np.abs(np.atleast_1d(sunalt)[:,None]) +      # CT2
-            t1 * np.abs(np.atleast_1d(sunalt)[:,None])**2 +   # CT1
-            t2 * np.abs(np.atleast_1d(sunsep)[:,None])**2 +   # CT3
-            t3 * np.abs(np.atleast_1d(sunsep)[:,None])        # CT4
-            ) * np.exp(-t4 * np.atleast_1d(airmass)[:,None]) + c0) / np.pi 
+    extinction = skydata['extinction_array'][_i_airmass(airmass),:] 
+    Imoon = _Imoon(skydata['wavelength'], skydata['moon_spectrum'], skydata['extinction_array'], 
+            airmass, moon_zenith, separation_angle, moon_phase)
+    return extinction * skydata['Idark'] + Imoon.value 
 
-    I_twi_interp = interp1d(10. * w_twi, Itwi, fill_value='extrapolate')
-    Isky += np.clip(I_twi_interp(wavelength.value), 0, None) 
 
-    print('bright sky=', np.median(Isky, axis=1)[:5])
-    return np.median(Isky, axis=1) / _dark_sky_4500A
+def _load_skydata(): 
+    ''' load the supporting data for the bright sky model. The data is only
+    read once and cached along with the Bessell V-band filter and the matrix
+    that linearly interpolates the twilight wavelength grid onto the sky
+    wavelengths. 
+    '''
+    global _SKYDATA
+    if _SKYDATA is None: 
+        fsky = astropy.utils.data._find_pkg_data_path('data/data4skymodel.p') 
+        skydata = pickle.load(open(fsky, 'rb')) 
+        skydata['Idark'] = skydata['darksky_surface_brightness'].value # nominal dark sky surface brightness
+        skydata['vband'] = speclite.filters.load_filter('bessell-V')
+        w_twi = skydata['wavelength_twi']
+        skydata['twi_interp'] = interp1d(10. * w_twi, np.identity(len(w_twi)), axis=0,
+                fill_value='extrapolate')(skydata['wavelength'].value) 
+        _SKYDATA = skydata 
+    return _SKYDATA
+
+
+def _i_airmass(airmass): 
+    ''' index of the airmass in the extinction array, which is tabulated in
+    steps of 0.04 starting at 1.
+    '''
+    return (np.round((airmass - 1.)/0.04)).astype(int) 
 
 
 def _Imoon(wavelength, moon_spectrum, extinction_array, airmass, moon_zenith, separation_angle, moon_phase): 
     ''' moon surface brightness. stream-lined verison of specsim.atmosphere.Moon surface brightness
     calculation with re-fit KS coefficients hardcoded in
     '''
-    KS_CR = 458173.535128
-    KS_CM0 = 5.540103
-    KS_CM1 = 178.141045
-
+    _vband = _load_skydata()['vband']
     obs_zenith = np.arcsin(np.sqrt((1 - airmass ** -2) / 0.96)) * u.rad
-    _vband = speclite.filters.load_filter('bessell-V')
-    V = _vband.get_ab_magnitude(moon_spectrum, wavelength)
-
-    extinction = extinction_array[0,:] #10 ** (-extinction_coefficient / 2.5)
 
     # Calculate the V-band surface brightness of scattered moonlight.
     scattered_V = krisciunas_schaefer_free(
         obs_zenith, moon_zenith, separation_angle,
-        moon_phase, _vband_extinction, KS_CR, KS_CM0, KS_CM1)
+        moon_phase, _vband_extinction, _KS_CR, _KS_CM0, _KS_CM1)
 
     # Calculate the wavelength-dependent extinction of moonlight
     # scattered once into the observed field of view. 
     scattering_airmass = (1 - 0.96 * np.sin(moon_zenith) ** 2) ** (-0.5)
-    i_airmass = (np.round((scattering_airmass - 1.)/0.04)).astype(int) 
-    _extinction_scatter = extinction_array[i_airmass,:] 
-
-    i_airmass = (np.round((airmass - 1.)/0.04)).astype(int) 
-    _extinction = extinction_array[i_airmass,:] 
+    _extinction_scatter = extinction_array[_i_airmass(scattering_airmass),:] 
+    _extinction = extinction_array[_i_airmass(airmass),:] 
 
     extinction = (_extinction_scatter * (1. - _extinction)) 
     surface_brightness = moon_spectrum * extinction
@@ -405,6 +397,39 @@ def _Imoon(wavelength, moon_spectrum, extinction_array, airmass, moon_zenith, se
     return _sb 
 
 
+def benchmark_bright_exposure_factor(n=1000, seed=0): 
+    ''' throughput of `bright_exposure_factor` for N tiles in a single call
+    compared to calling it one tile at a time. 
+
+    Returns
+    -------
+    tuple
+        (tiles per second one tile at a time, tiles per second vectorized) 
+    '''
+    import time 
+    rng = np.random.RandomState(seed) 
+    moon_frac   = rng.uniform(0.5, 1., n) 
+    moon_alt    = rng.uniform(-10., 90., n) 
+    moon_sep    = rng.uniform(20., 180., n) 
+    sun_alt     = rng.uniform(-30., -13., n) 
+    sun_sep     = rng.uniform(40., 180., n) 
+    airmass     = rng.uniform(1., 2., n) 
+
+    t0 = time.time() 
+    f_tile = np.array([bright_exposure_factor(moon_frac[i], moon_alt[i], moon_sep[i], 
+        sun_alt[i], sun_sep[i], airmass[i])[0] for i in range(n)]) 
+    dt_tile = time.time() - t0 
+
+    t0 = time.time() 
+    f_vec = bright_exposure_factor(moon_frac, moon_alt, moon_sep, sun_alt, sun_sep, airmass)
+    dt_vec = time.time() - t0 
+    assert np.allclose(f_tile, f_vec) 
+
+    print('one tile at a time: %.1f tiles/sec' % (n / dt_tile))
+    print('vectorized: %.1f tiles/sec (x%.1f)' % (n / dt_vec, dt_tile / dt_vec))
+    return n / dt_tile, n / dt_vec
+
+
 def krisciunas_schaefer_free(obs_zenith, moon_zenith, separation_angle, moon_phase,
                         vband_extinction, C_R, C_M0, C_M1):
     """Calculate the scattered moonlight surface brightness in V band.
@@ -531,11 +556,189 @@ def exposure_time(program, seeing, transparency, airmass, EBV,
     # Calculate the exposure time required at the specified condtions.
     actual_time = nominal_time * (
         f_seeing * f_transparency * f_dust * f_airmass * f_moon)
-    assert actual_time > 0 * u.s
+    assert np.all(actual_time > 0 * u.s)
 
     return actual_time
 
 
+class ExposureTimeService(object):
+    """Exposure time calculations for batches of tiles with lookup tables.
+
+    The configuration is read once when the service is created and the
+    exposure-time factors are tabulated on dense 1-D grids, which are
+    linearly interpolated with `np.interp`:
+
+     - seeing factor on a seeing grid.
+     - airmass factor on an airmass grid.
+     - dust factor on an E(B-V) grid.
+     - the scattering function of the Krisciunas & Schaefer moon model on a
+       moon separation grid, and the moon and observation extinction terms
+       on moon altitude and airmass grids. The scattered moon V-band
+       brightness is the product of these terms and the moon illuminance,
+       so the 4-D dependence of the moon factor reduces to 1-D tables.
+
+    The transparency factor (nominal / transparency) and the moon
+    illuminance are evaluated exactly since they are cheaper than an
+    interpolation. Values outside of the grids are evaluated exactly.
+
+    The interpolation error of a linear table with spacing h is at most
+    h**2 / 8 * max|f''|. For the default grids the maximum relative error of
+    each table is measured at the midpoints of the grid when the service is
+    created and stored in :attr:`interp_error`; it is of order 1e-6 or
+    smaller. Use :meth:`validate` to check the maximum relative error of
+    the total exposure time compared to :func:`exposure_time`.
+
+    Parameters
+    ----------
+    nbin : int
+        Number of grid points of each table.
+    """
+    # table ranges
+    seeing_range = (0.5, 4.0)
+    airmass_range = (1.0, 3.0)
+    EBV_range = (0.0, 1.0)
+
+    def __init__(self, nbin=4001):
+        config = desisurvey.config.Configuration()
+        self.nominal_time = {}
+        for program in desisurvey.tiles.Tiles.PROGRAMS:
+            self.nominal_time[program] = getattr(config.nominal_exposure_time, program)().to(u.s).value
+        self.seeing0 = config.nominal_conditions.seeing().to(u.arcsec).value
+        self.transparency0 = config.nominal_conditions.transparency()
+        self.EBV0 = config.nominal_conditions.EBV()
+        self.airmass0 = config.nominal_conditions.airmass()
+
+        self._tables = {}
+        self.interp_error = {}
+        for name, x0, x1 in [
+                ('seeing', self.seeing_range[0], self.seeing_range[1]),
+                ('airmass', self.airmass_range[0], self.airmass_range[1]),
+                ('dust', self.EBV_range[0], self.EBV_range[1]),
+                ('ln_scatter', 0., 180.),
+                ('moon_extinction', 0., 90.),
+                ('obs_extinction', self.airmass_range[0], self.airmass_range[1])]:
+            x = np.linspace(x0, x1, nbin)
+            f = self._exact(name, x)
+            self._tables[name] = (x, f)
+            # relative interpolation error at the midpoints of the grid
+            xmid = 0.5 * (x[1:] + x[:-1])
+            fmid = self._exact(name, xmid)
+            self.interp_error[name] = np.max(np.abs(np.interp(xmid, x, f) / fmid - 1.))
+
+    def _exact(self, name, x):
+        """Exact value of the tabulated function `name`.
+        """
+        if name == 'seeing':
+            a, b, c = 12.95475751, -7.10892892, 1.21068726
+            return (a + b * x + c * x ** 2) ** -2 / (a + b * self.seeing0 + c * self.seeing0 ** 2) ** -2
+        elif name == 'airmass':
+            return np.power(x / self.airmass0, 1.25)
+        elif name == 'dust':
+            return np.power(10.0, (2.0 * 3.303 * (x - self.EBV0) / 2.5))
+        elif name == 'ln_scatter':
+            # scattering function (eqn. 21 of KS1991) of the separation angle
+            return np.log(_KS_CR * (1.06 + np.cos(np.radians(x)) ** 2) + 10 ** (_KS_CM0 - x / _KS_CM1))
+        elif name == 'moon_extinction':
+            # extinction of the moonlight along the line of sight to the moon
+            X_moon = (1 - 0.96 * np.sin(np.radians(90. - x)) ** 2) ** (-0.5)
+            return 10 ** (-0.4 * _vband_extinction * X_moon)
+        elif name == 'obs_extinction':
+            # fraction of the moonlight scattered into the line of sight
+            # (eqn. 3 with the observation zenith angle from inverting it, so X_obs = airmass)
+            return 1 - 10 ** (-0.4 * (_vband_extinction * x))
+        raise ValueError('unknown table %s' % name)
+
+    def _lookup(self, name, x):
+        """Interpolate table `name` at x and evaluate values outside of the
+        table exactly.
+        """
+        xt, ft = self._tables[name]
+        f = np.interp(x, xt, ft)
+        out = (x < xt[0]) | (x > xt[-1])
+        if np.any(out): f[out] = self._exact(name, x[out])
+        return f
+
+    def moon_exposure_factor(self, moon_frac, moon_sep, moon_alt, airmass):
+        """Same as :func:`moon_exposure_factor` using the lookup tables.
+        Inputs are (N,) arrays.
+        """
+        f_moon = np.ones(len(airmass))
+        up = (moon_alt >= 0)
+        if np.any(up):
+            # V-band magnitude of the moon (eqn. 9) and its illuminance (eqn. 8)
+            abs_alpha = 180. * np.arccos(2 * moon_frac[up] - 1) / np.pi
+            m = -12.73 + 0.026 * abs_alpha + 4e-9 * abs_alpha ** 4
+            Istar = 10 ** (-0.4 * (m + 16.57))
+            B_moon = (np.exp(self._lookup('ln_scatter', moon_sep[up])) * Istar *
+                    self._lookup('moon_extinction', moon_alt[up]) *
+                    self._lookup('obs_extinction', airmass[up]))
+            V = (20.7233 - np.log(B_moon / 34.08)) / 0.92104
+            X = np.array((np.ones(len(V)), np.exp(-V), 1/V, 1/V**2, 1/V**3))
+            f_moon[up] = _moonCoefficients.dot(X)
+        return f_moon
+
+    def exposure_factor(self, seeing, transparency, airmass, EBV, moon_frac, moon_sep, moon_alt):
+        """Total exposure-time factor relative to nominal conditions. All
+        inputs are broadcast against each other.
+
+        Returns
+        -------
+        array
+            Product of the seeing, transparency, dust, airmass and moon
+            factors.
+        """
+        seeing, transparency, airmass, EBV, moon_frac, moon_sep, moon_alt = [
+            _x.flatten() for _x in np.broadcast_arrays(*[np.asarray(_x, dtype=float) for _x in
+                (seeing, transparency, airmass, EBV, moon_frac, moon_sep, moon_alt)])]
+        if np.any(seeing <= 0):
+            raise ValueError('Got invalid seeing value <= 0.')
+        if np.any(transparency <= 0):
+            raise ValueError('Got invalid transparency value <= 0.')
+        if np.any(airmass < 1):
+            raise ValueError('Got invalid airmass value < 1.')
+        if np.any((moon_frac < 0) | (moon_frac > 1)):
+            raise ValueError('Got invalid moon_frac outside [0,1].')
+        if np.any((moon_sep < 0) | (moon_sep > 180)):
+            raise ValueError('Got invalid moon_sep outside [0,180].')
+        if np.any((moon_alt < -90) | (moon_alt > 90)):
+            raise ValueError('Got invalid moon_alt outside [-90,+90].')
+
+        return (self._lookup('seeing', seeing) * (self.transparency0 / transparency) *
+                self._lookup('dust', EBV) * self._lookup('airmass', airmass) *
+                self.moon_exposure_factor(moon_frac, moon_sep, moon_alt, airmass))
+
+    def exposure_time(self, program, seeing, transparency, airmass, EBV,
+                      moon_frac, moon_sep, moon_alt):
+        """Batched version of :func:`exposure_time`. Parameters are the same
+        except that all the conditions can be arrays for N tiles.
+
+        Returns
+        -------
+        astropy.unit.Quantity
+            (N,) estimated exposure times.
+        """
+        actual_time = self.nominal_time[program] * self.exposure_factor(
+                seeing, transparency, airmass, EBV, moon_frac, moon_sep, moon_alt)
+        assert np.all(actual_time > 0)
+        return actual_time * u.s
+
+    def validate(self, n=10000, program='DARK', seed=0):
+        """Maximum relative error of :meth:`exposure_time` compared to
+        :func:`exposure_time` for N random observing conditions.
+        """
+        rng = np.random.RandomState(seed)
+        cond = (rng.uniform(0.7, 3., n),   # seeing
+                rng.uniform(0.3, 1., n),   # transparency
+                rng.uniform(1., 2.5, n),   # airmass
+                rng.uniform(0., 0.3, n),   # EBV
+                rng.uniform(0., 1., n),    # moon_frac
+                rng.uniform(0., 180., n),  # moon_sep
+                rng.uniform(-30., 90., n)) # moon_alt
+        t_table = self.exposure_time(program, *cond).to(u.s).value
+        t_exact = exposure_time(program, *cond).to(u.s).value
+        return np.max(np.abs(t_table / t_exact - 1.))
+
+
 class ExposureTimeCalculator(object):
     """Online Exposure Time Calculator.
 
@@ -809,3 +1012,288 @@ class ExposureTimeCalculator(object):
         Set True by :meth:`start` and False by :meth:`stop`.
         """
         return self._active
+
+
+class BatchExposureTimeCalculator(ExposureTimeCalculator):
+    """Online Exposure Time Calculator for N concurrent exposures.
+
+    Same as :class:`ExposureTimeCalculator` but the exposure state (SNR2
+    accumulation, abort logic, and the optional history) is stored in arrays
+    with one entry per exposure slot, so many exposures can be tracked and
+    updated at once. Each slot reproduces the calculations of the scalar
+    class exactly. Use :meth:`replay` to run time series of conditions for
+    all exposures and get a per-exposure summary table.
+
+    Parameters
+    ----------
+    save_history : bool
+        When True, records the history of internal calculations during the
+        exposures in preallocated (N, nhist) arrays.
+    nhist : int
+        Initial number of history entries per exposure. The history arrays
+        are doubled in size when they are full.
+    """
+    def __init__(self, save_history=False, nhist=64):
+        super(BatchExposureTimeCalculator, self).__init__(save_history=False)
+        self.save_history = save_history
+        self.nhist = nhist
+        self._nexp = 0
+        self.tileid = np.zeros(0, dtype=int)
+        self.tile_nexp = np.zeros(0, dtype=int)
+
+    def start(self, mjd_now, tileid, program, snr2frac, exposure_factor, seeing, transp, sky,
+              tile_nexp=None):
+        """Start tracking N exposures.
+
+        Parameters are the same as :meth:`ExposureTimeCalculator.start` but
+        can be arrays, which are broadcast against each other. `program` can
+        be a single program name or an array of names.
+
+        Parameters
+        ----------
+        tile_nexp : int or array
+            Number of the exposure of each tile including this one. By default,
+            it is counted per slot, like the scalar class: exposures of the
+            same tile in the same slot are consecutive exposures.
+        """
+        mjd_now, tileid, snr2frac, exposure_factor, seeing, transp, sky = [
+            _x.flatten() for _x in np.broadcast_arrays(
+                np.asarray(mjd_now, dtype=float), np.asarray(tileid),
+                np.asarray(snr2frac, dtype=float), np.asarray(exposure_factor, dtype=float),
+                np.asarray(seeing, dtype=float), np.asarray(transp, dtype=float),
+                np.asarray(sky, dtype=float))]
+        n = len(mjd_now)
+        program = np.broadcast_to(np.asarray(program), (n,))
+
+        self.mjd_start = mjd_now.copy()
+        self.mjd_last = mjd_now.copy()
+        self._snr2frac_start = snr2frac.copy()
+        self._snr2frac = snr2frac.copy()
+        self._exptime = np.zeros(n)
+        self._active = np.ones(n).astype(bool)
+        if tile_nexp is not None:
+            self.tile_nexp = np.broadcast_to(np.asarray(tile_nexp, dtype=int), (n,)).copy()
+        elif n == self._nexp:
+            self.tile_nexp = np.where(tileid == self.tileid, self.tile_nexp + 1, 1)
+        else:
+            self.tile_nexp = np.ones(n, dtype=int)
+        self.tileid = tileid
+        self.program = program
+        self._nexp = n
+
+        # same as estimate_exposure for a mix of programs
+        texp_nominal = np.array([self.TEXP_TOTAL[p] for p in program])
+        self.texp_total = texp_nominal * exposure_factor
+        texp_remaining = self.texp_total * (1 - snr2frac)
+        nexp = np.ceil(texp_remaining / self.MAX_EXPTIME).astype(int)
+        nexp = np.maximum(nexp, self.MIN_NEXP - (self.tile_nexp - 1))
+        # Estimate SNR2 to integrate in the next exposure.
+        self.snr2frac_target = snr2frac + (texp_remaining / nexp) / self.texp_total
+        # Initialize signal and background rate factors.
+        self.srate0 = self.weather_factor(seeing, transp)
+        self.brate0 = sky
+        self.signal = np.zeros(n)
+        self.background = np.zeros(n)
+        self.last_snr2frac = np.zeros(n)
+        self.should_abort = np.zeros(n).astype(bool)
+        self.nupdate = np.zeros(n, dtype=int)
+        if self.save_history:
+            self.history = {}
+            for k in ['mjd', 'signal', 'background', 'snr2frac']:
+                self.history[k] = np.full((n, self.nhist), np.nan)
+            self.nhistory = np.zeros(n, dtype=int)
+            self._record(np.ones(n).astype(bool))
+
+    def update(self, mjd_now, seeing, transp, sky, active=None):
+        """Track changing conditions during the exposures.
+
+        Only exposures that are active (started and not stopped) are updated.
+
+        Parameters
+        ----------
+        mjd_now, seeing, transp, sky : float or array
+            Same as :meth:`ExposureTimeCalculator.update` for each exposure.
+        active : array
+            Optional boolean array that further restricts which exposures are
+            updated.
+
+        Returns
+        -------
+        array
+            True for exposures that should continue integrating. False for
+            exposures that are not updated.
+        """
+        n = self._nexp
+        mjd_now, seeing, transp, sky = [np.broadcast_to(np.asarray(_x, dtype=float), (n,))
+                for _x in (mjd_now, seeing, transp, sky)]
+        up = self._active.copy()
+        if active is not None: up &= active
+
+        dt = mjd_now[up] - self.mjd_last[up]
+        self.mjd_last[up] = mjd_now[up]
+        srate = self.weather_factor(seeing[up], transp[up])
+        brate = sky[up]
+        self.signal[up] += dt * srate / self.srate0[up]
+        self.background[up] += dt * brate / self.brate0[up]
+        self._snr2frac[up] = self._snr2frac_start[up] + \
+                self.signal[up] ** 2 / self.background[up] / self.texp_total[up]
+        self.nupdate[up] += 1
+        if self.save_history:
+            self._record(up)
+        need_more_snr = self._snr2frac[up] < self.snr2frac_target[up]
+        # Give up on these tiles if SNR progress has dropped significantly since we started.
+        self.should_abort[up] = (self._snr2frac[up] - self.last_snr2frac[up]) / dt < 0.25 / self.texp_total[up]
+        self.last_snr2frac[up] = self._snr2frac[up]
+
+        cont = np.zeros(n).astype(bool)
+        cont[up] = need_more_snr & ~self.should_abort[up]
+        return cont
+
+    def stop(self, mjd_now, stop=None):
+        """Stop tracking exposures.
+
+        Parameters
+        ----------
+        mjd_now : float or array
+            MJD timestamp when each exposure was stopped.
+        stop : array
+            Optional boolean array of the exposures to stop. By default all
+            active exposures are stopped.
+
+        Returns
+        -------
+        array
+            True for the stopped exposures of tiles that are "done" (see
+            :meth:`ExposureTimeCalculator.stop`).
+        """
+        mjd_now = np.broadcast_to(np.asarray(mjd_now, dtype=float), (self._nexp,))
+        sel = self._active.copy()
+        if stop is not None: sel &= stop
+        self._exptime[sel] = mjd_now[sel] - self.mjd_start[sel]
+        self._active[sel] = False
+        return sel & ((self._snr2frac >= 1) | self.should_abort)
+
+    def replay(self, mjd, seeing, transp, sky, tileid, program, snr2frac, exposure_factor,
+               tile_nexp=None):
+        """Replay time series of conditions for N exposures at once.
+
+        Each exposure is started at the first time step and updated at the
+        following ones until :meth:`update` returns False or its time series
+        ends, then it is stopped at its last update. This is the same as
+        running each exposure through the scalar class one at a time.
+
+        Parameters
+        ----------
+        mjd, seeing, transp, sky : array
+            (N, nstep) time series of the conditions. Time series of different
+            lengths are padded at the end with NaN MJDs.
+        tileid, program, snr2frac, exposure_factor : float or array
+            Tile ID, program, previous SNR2 fraction and exposure factor of
+            each exposure (see :meth:`start`).
+
+        Returns
+        -------
+        numpy.ndarray
+            Structured array with one row per exposure with columns `tileid`,
+            `program`, `mjd_start`, `exptime` (days), `snr2frac_start`,
+            `snr2frac_target`, `snr2frac`, `nupdate`, `aborted` and `done`.
+        """
+        mjd, seeing, transp, sky = [np.atleast_2d(np.asarray(_x, dtype=float))
+                for _x in (mjd, seeing, transp, sky)]
+        self.start(mjd[:,0], tileid, program, snr2frac, exposure_factor,
+                seeing[:,0], transp[:,0], sky[:,0], tile_nexp=tile_nexp)
+        done = np.zeros(self._nexp).astype(bool)
+        for k in range(1, mjd.shape[1]):
+            # stop exposures whose time series has ended
+            ended = self._active & ~np.isfinite(mjd[:,k])
+            done |= self.stop(self.mjd_last, stop=ended)
+            if not np.any(self._active): break
+            cont = self.update(mjd[:,k], seeing[:,k], transp[:,k], sky[:,k])
+            done |= self.stop(mjd[:,k], stop=self._active & ~cont)
+        done |= self.stop(self.mjd_last)
+        return self.summary(done)
+
+    def summary(self, done):
+        """Per-exposure summary table of the last :meth:`start` (see :meth:`replay`).
+        """
+        summary = np.zeros(self._nexp, dtype=[
+            ('tileid', self.tileid.dtype), ('program', 'U8'), ('mjd_start', 'f8'),
+            ('exptime', 'f8'), ('snr2frac_start', 'f8'), ('snr2frac_target', 'f8'),
+            ('snr2frac', 'f8'), ('nupdate', 'i8'), ('aborted', '?'), ('done', '?')])
+        summary['tileid'] = self.tileid
+        summary['program'] = self.program
+        summary['mjd_start'] = self.mjd_start
+        summary['exptime'] = self._exptime
+        summary['snr2frac_start'] = self._snr2frac_start
+        summary['snr2frac_target'] = self.snr2frac_target
+        summary['snr2frac'] = self._snr2frac
+        summary['nupdate'] = self.nupdate
+        summary['aborted'] = self.should_abort
+        summary['done'] = done
+        return summary
+
+    def _record(self, sel):
+        """Append the current state of the selected exposures to the history.
+        """
+        if np.any(self.nhistory[sel] >= self.history['mjd'].shape[1]):
+            for k in self.history.keys():
+                self.history[k] = np.concatenate([self.history[k],
+                    np.full(self.history[k].shape, np.nan)], axis=1)
+        idx = (np.arange(self._nexp)[sel], self.nhistory[sel])
+        self.history['mjd'][idx] = self.mjd_last[sel]
+        self.history['signal'][idx] = self.signal[sel]
+        self.history['background'][idx] = self.background[sel]
+        self.history['snr2frac'][idx] = self._snr2frac[sel]
+        self.nhistory[sel] += 1
+
+
+def validate_batch_exposure_time_calculator(n=200, nstep=40, seed=0):
+    """Replay random exposures with :class:`BatchExposureTimeCalculator` and
+    check that the results are identical to running them one at a time
+    through :class:`ExposureTimeCalculator`.
+
+    Returns
+    -------
+    tuple
+        (exposures per second one at a time, exposures per second batched)
+    """
+    import time
+    rng = np.random.RandomState(seed)
+    dt = 60. / 86400.
+    mjd = 58800. + rng.uniform(0., 1., n)[:,None] + dt * np.arange(nstep)[None,:]
+    # time series of different lengths
+    nsteps = rng.randint(2, nstep + 1, n)
+    mjd[np.arange(nstep)[None,:] >= nsteps[:,None]] = np.nan
+    seeing = rng.uniform(0.8, 2., (n, nstep))
+    transp = rng.uniform(0.5, 1., (n, nstep))
+    sky = rng.uniform(1., 5., (n, nstep))
+    tileid = rng.randint(0, 1000, n)
+    program = rng.choice(['DARK', 'GRAY', 'BRIGHT'], n)
+    snr2frac = rng.uniform(0., 0.8, n)
+    exposure_factor = rng.uniform(1., 3., n)
+
+    t0 = time.time()
+    exptime, snr2, done = np.zeros(n), np.zeros(n), np.zeros(n).astype(bool)
+    for i in range(n):
+        etc = ExposureTimeCalculator()
+        etc.start(mjd[i,0], tileid[i], program[i], snr2frac[i], exposure_factor[i],
+                seeing[i,0], transp[i,0], sky[i,0])
+        mjd_stop = mjd[i,0]
+        for k in range(1, nsteps[i]):
+            mjd_stop = mjd[i,k]
+            if not etc.update(mjd[i,k], seeing[i,k], transp[i,k], sky[i,k]): break
+        done[i] = etc.stop(mjd_stop)
+        exptime[i], snr2[i] = etc.exptime, etc.snr2frac
+    dt_scalar = time.time() - t0
+
+    t0 = time.time()
+    summary = BatchExposureTimeCalculator().replay(mjd, seeing, transp, sky, tileid,
+            program, snr2frac, exposure_factor)
+    dt_batch = time.time() - t0
+    assert np.array_equal(summary['exptime'], exptime)
+    assert np.array_equal(summary['snr2frac'], snr2)
+    assert np.array_equal(summary['done'], done)
+
+    print('one exposure at a time: %.1f exposures/sec' % (n / dt_scalar))
+    print('batched: %.1f exposures/sec (x%.1f)' % (n / dt_batch, dt_scalar / dt_batch))
+    return n / dt_scalar, n / dt_batch
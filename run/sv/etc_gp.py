@@ -0,0 +1,186 @@
+"""Gaussian process emulator of the bright exposure factor.
+
+Evaluates the GP emulators trained by
+`surveysim_valid.buildGP_bright_exposure_factor` using only numpy and h5py,
+so sklearn is not needed at runtime. The emulators are loaded from the
+`GP_bright_exp_factor.{twilight,not_twilight}.params.hdf5` files, which store
+the training conditions (`Xtrain`), the GP weights (`alpha`), and the
+ConstantKernel + ConstantKernel * RBF kernel hyperparameters (`constant`,
+`amplitude`, `length_scale`).
+
+The module also includes the inducing point (subset of regressors) solver
+used to train emulators on large numbers of conditions (`sor_weights`).
+The inducing points and their weights are stored as `Xtrain` and `alpha`, so
+they are evaluated exactly like the full GP.
+"""
+from __future__ import print_function, division
+
+import os
+import h5py
+import numpy as np
+
+
+class BrightExposureFactorGP(object):
+    """GP emulator of `etc.bright_exposure_factor`.
+
+    Query points with sun altitude >= -20 deg are evaluated with the twilight
+    emulator and the rest with the non-twilight emulator. The kernel matrix
+    between the query points and the training points is evaluated in blocks
+    of `block_size` query points using a preallocated buffer.
+
+    Parameters
+    ----------
+    dir_gp : str
+        Directory with the GP parameter files.
+    sparse : bool
+        If True, load the inducing point emulators
+        (`GP_bright_exp_factor.{cond}.sparse.params.hdf5`).
+    block_size : int
+        Number of query points per block of the kernel matrix.
+    """
+    conditions = {
+        'twilight': ['airmass', 'moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep'],
+        'not_twilight': ['airmass', 'moon_ill', 'moon_alt', 'moon_sep']}
+
+    def __init__(self, dir_gp, sparse=False, block_size=256):
+        self.block_size = block_size
+        self._gp = {}
+        for cond in self.conditions.keys():
+            self._gp[cond] = self._load(os.path.join(dir_gp,
+                'GP_bright_exp_factor.%s%s.params.hdf5' % (cond, ['', '.sparse'][sparse])))
+
+    def _load(self, fgp):
+        """Read the GP parameters and precompute the query-independent terms.
+        """
+        with h5py.File(fgp, 'r') as f:
+            for k in ['constant', 'amplitude', 'length_scale']:
+                if k not in f.keys():
+                    raise ValueError('%s does not have the kernel hyperparameters; '
+                            'run surveysim_valid._add_GP_kernel_params first' % fgp)
+            Xtrain = f['Xtrain'][...]
+            alpha = f['alpha'][...]
+            constant = float(f['constant'][...])
+            amplitude = float(f['amplitude'][...])
+            length_scale = f['length_scale'][...]
+
+        gp = {}
+        gp['length_scale'] = length_scale
+        gp['Xs'] = Xtrain / length_scale
+        gp['Xs_sq'] = np.sum(gp['Xs']**2, axis=1)
+        # constant kernel contributes the same to every prediction
+        gp['const'] = constant * np.sum(alpha)
+        gp['amp_alpha'] = amplitude * alpha
+        # kernel matrix buffer
+        gp['K'] = np.empty((self.block_size, Xtrain.shape[0]))
+        return gp
+
+    def predict(self, airmass, moon_ill, moon_alt, moon_sep, sun_alt, sun_sep):
+        """Emulated bright exposure factor. Inputs are broadcast against each
+        other.
+
+        Returns
+        -------
+        array
+            Exposure factors, clipped to be >= 1 like
+            `etc.bright_exposure_factor`.
+        """
+        theta = dict(zip(['airmass', 'moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep'],
+            [_x.flatten() for _x in np.broadcast_arrays(*[np.asarray(_x, dtype=float) for _x in
+                (airmass, moon_ill, moon_alt, moon_sep, sun_alt, sun_sep)])]))
+        twi = (theta['sun_alt'] >= -20.)
+
+        expfactor = np.empty(len(twi))
+        for cond, sel in zip(['twilight', 'not_twilight'], [twi, ~twi]):
+            if not np.any(sel): continue
+            X = np.array([theta[k][sel] for k in self.conditions[cond]]).T
+            expfactor[sel] = self._predict(cond, X)
+        return np.clip(expfactor, 1., None)
+
+    def _predict(self, cond, X):
+        """GP mean at (N, ndim) conditions X.
+        """
+        gp = self._gp[cond]
+        return _gp_mean(X / gp['length_scale'], gp['Xs'], gp['Xs_sq'], gp['amp_alpha'],
+                gp['const'], gp['K'])
+
+
+def gp_mean(X, Xtrain, alpha, constant, amplitude, length_scale, block_size=256):
+    """Mean of the ConstantKernel + ConstantKernel * RBF GP at (N, ndim)
+    conditions X given training points (or inducing points) and weights.
+    """
+    Xs = Xtrain / length_scale
+    return _gp_mean(X / length_scale, Xs, np.sum(Xs**2, axis=1), amplitude * alpha,
+            constant * np.sum(alpha), np.empty((block_size, Xtrain.shape[0])))
+
+
+def _gp_mean(Xs, Zs, Zs_sq, amp_alpha, const, K):
+    """GP mean evaluated in blocks of `K.shape[0]` query points using the
+    kernel matrix buffer `K`.
+    """
+    Xs_sq = np.sum(Xs**2, axis=1)
+    pred = np.empty(Xs.shape[0])
+    for i0 in range(0, Xs.shape[0], K.shape[0]):
+        i1 = min(i0 + K.shape[0], Xs.shape[0])
+        Kb = _rbf_block(Xs[i0:i1], Xs_sq[i0:i1], Zs, Zs_sq, K[:i1-i0])
+        pred[i0:i1] = np.dot(Kb, amp_alpha) + const
+    return pred
+
+
+def _rbf_block(Xs, Xs_sq, Zs, Zs_sq, out):
+    """Fill `out` with the unit amplitude RBF kernel between points that are
+    already divided by the length scale.
+    """
+    # squared distance |x - z|^2 = |x|^2 + |z|^2 - 2 x.z
+    np.dot(Xs, Zs.T, out=out)
+    out *= -2.
+    out += Xs_sq[:,None]
+    out += Zs_sq[None,:]
+    np.maximum(out, 0., out=out)
+    out *= -0.5
+    np.exp(out, out=out)
+    return out
+
+
+def sor_weights(X, y, Z, constant, amplitude, length_scale, noise, block_size=1024):
+    """Weights of the subset of regressors (inducing point) GP approximation
+
+        alpha_Z = (noise K_ZZ + K_ZX K_XZ)^-1 K_ZX y
+
+    so that the predictive mean is K(x, Z) alpha_Z. K_XZ is accumulated in
+    blocks of training points, so memory is O(block_size x nZ) and the cost
+    is O(N nZ^2) rather than O(N^3) for the full GP.
+
+    Parameters
+    ----------
+    X : array
+        (N, ndim) training conditions.
+    y : array
+        (N,) training exposure factors.
+    Z : array
+        (nZ, ndim) inducing points.
+    noise : float
+        Noise variance (`alpha` of sklearn GaussianProcessRegressor).
+    """
+    Zs = Z / length_scale
+    Zs_sq = np.sum(Zs**2, axis=1)
+    nz = Z.shape[0]
+
+    A = _rbf_block(Zs, Zs_sq, Zs, Zs_sq, np.empty((nz, nz)))
+    A *= amplitude
+    A += constant
+    A *= noise
+    b = np.zeros(nz)
+
+    Xs = X / length_scale
+    Xs_sq = np.sum(Xs**2, axis=1)
+    K = np.empty((block_size, nz))
+    for i0 in range(0, X.shape[0], block_size):
+        i1 = min(i0 + block_size, X.shape[0])
+        Kb = _rbf_block(Xs[i0:i1], Xs_sq[i0:i1], Zs, Zs_sq, K[:i1-i0])
+        Kb *= amplitude
+        Kb += constant
+        A += np.dot(Kb.T, Kb)
+        b += np.dot(Kb.T, y[i0:i1])
+    # jitter for numerical stability
+    A[np.diag_indices(nz)] += 1e-10 * np.trace(A) / nz
+    return np.linalg.solve(A, b)
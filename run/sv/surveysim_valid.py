@@ -3,6 +3,7 @@
 scripts to validate surveysim outputs
 '''
 import os 
+import sys 
 import h5py 
 import pickle 
 import numpy as np 
@@ -25,6 +26,11 @@ from feasibgs import util as UT
 from feasibgs import skymodel as Sky 
 from feasibgs import catalogs as Cat
 from feasibgs import forwardmodel as FM 
+# -- local -- 
+# run/sv modules (etc, etc_gp) are imported from this file's directory so the
+# script does not need to be run from run/sv 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import etc as SVETC # vectorized ETC in run/sv 
 # -- plotting -- 
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -62,84 +68,27 @@ def buildGP_bright_exposure_factor(expfile='exposures_surveysim_fork_150sv0p4.fi
     # read in precomputed exposure factors
     exp_factors = np.load(os.path.join(dir_dat, 'exposure_factor.BGS.%s' % expfile.replace('.fits', '.npy'))) 
 
-    # select training sample that fully encompasses the surveysim output exposures 
+    # training sample that fully encompasses the surveysim output exposures 
+    # (calculated once and stored) 
+    trainset = GP_trainingset(expfile=expfile) 
     
     # split into twilight and non twilight 
     for cond in ['twilight', 'not_twilight']: 
         if cond == 'twilight': 
             cut = (exps['sun_alt'] >= -20.) 
             props = ['airmass', 'moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep']
-            nbins = [2, 5, 4, 3, 3, 3]
         elif cond == 'not_twilight': 
             cut = (exps['sun_alt'] < -20.) 
             props = ['airmass', 'moon_ill', 'moon_alt', 'moon_sep']
-            nbins = [4, 4, 4, 4]
         print('%i exposures in %s' % (np.sum(cut), cond)) 
-        #n_test = int(np.floor(0.1 * float(np.sum(cut)) * 0.3)) 
-        #print('%i exposures in %s test sample' % (n_test, cond)) 
-        
-        prop_range = np.zeros((len(props), 2)) 
-        for i, prop in enumerate(props): 
-            prop_range[i,0] = exps[prop][cut].min() 
-            prop_range[i,1] = exps[prop][cut].max()
-            print('%s: %f - %f' % (prop, prop_range[i,0], prop_range[i,1])) 
-        
-        # randomly select 100 exposures from surveysim output and calculate the exposure factors  
-        i_test = np.arange(nexp)[cut]#np.random.choice(np.arange(nexp)[cut], size=n_test, replace=False) 
-        theta_test, exp_factor_test = [], []
-        for iexp in i_test: 
-            # compile test parameters 
-            theta_test.append(np.array([exps[k][iexp] for k in props])) 
-            # exposure factor 
-            exp_factor_test.append(exp_factors[iexp]) 
-        theta_test = np.array(theta_test) 
-        exp_factor_test = np.array(exp_factor_test)
-    
-        # training sample on a grid
-        prop_bins = tuple([np.linspace(_prop_range[0], _prop_range[1], nbin)  for _prop_range, nbin in zip(prop_range, nbins)]) 
-        #if cond == 'not_twilight': 
-        #    prop_bins[2] = np.array([0., 5., 10., 20., 40., 60., 80.]) 
         
-        # calculate exposure factors for training set 
-        theta_train, exp_factor_train = [], [] 
-        if cond == 'twilight':  
-            for airmass, moon_ill, moon_alt, moon_sep, sun_alt, sun_sep in product(*prop_bins):  
-                # compile training parameters 
-                theta_train.append(np.array([airmass, moon_ill, moon_alt, moon_sep, sun_alt, sun_sep])) 
-                # exposure factor 
-                _exp_factor = ETC.bright_exposure_factor(moon_ill, moon_alt, np.array(moon_sep), 
-                        sun_alt, np.array(sun_sep), np.array(airmass))
-                exp_factor_train.append(_exp_factor) 
-        elif cond == 'not_twilight':  
-            for airmass, moon_ill, moon_alt, moon_sep in product(*prop_bins):  
-                theta_train.append(np.array([airmass, moon_ill, moon_alt, moon_sep])) 
-                # exposure factor 
-                _exp_factor = ETC.bright_exposure_factor(moon_ill, moon_alt, np.array(moon_sep), 
-                        -30., np.array(180.), np.array(airmass))
-                exp_factor_train.append(_exp_factor) 
+        # test on all surveysim exposures 
+        theta_test = np.array([exps[k][cut] for k in props]).T
+        exp_factor_test = exp_factors[cut]
 
-        if cond == 'twilight':         
-            i_train = np.random.choice(np.arange(nexp)[cut], 500, replace=False) 
-        elif cond == 'not_twilight': 
-            i_train = np.random.choice(np.arange(nexp)[cut], 1000, replace=False) 
-
-        for iexp in i_train: 
-            # compile training parameters 
-            theta_train.append(np.array([exps[k][iexp] for k in props])) 
-            # exposure factor 
-            exp_factor_train.append(exp_factors[iexp]) 
-        
-        if cond == 'not_twilight': 
-            i_train = np.random.choice(np.setdiff1d(np.arange(nexp)[cut & (exps['moon_alt'] < 10.)], np.array(i_train)), 
-                    200, replace=False) 
-            for iexp in i_train: 
-                # compile training parameters 
-                theta_train.append(np.array([exps[k][iexp] for k in props])) 
-                # exposure factor 
-                exp_factor_train.append(exp_factors[iexp]) 
-
-        theta_train = np.array(theta_train) 
-        exp_factor_train = np.array(exp_factor_train)
+        # training sample: grid + surveysim exposures 
+        theta_train = np.concatenate([trainset[cond]['theta_grid'], trainset[cond]['theta_exps']], axis=0) 
+        exp_factor_train = np.concatenate([trainset[cond]['exp_factor_grid'], trainset[cond]['exp_factor_exps']]) 
 
         # train fits 
         _length_scale = np.ones(theta_train.shape[1])
@@ -157,6 +106,7 @@ def buildGP_bright_exposure_factor(expfile='exposures_surveysim_fork_150sv0p4.fi
         f_gp_param = h5py.File(os.path.join(dir_dat, 'GP_bright_exp_factor.%s.params.hdf5' % cond), 'w') 
         f_gp_param.create_dataset('Xtrain', data=gp.X_train_) 
         f_gp_param.create_dataset('alpha', data=gp.alpha_) 
+        _write_GP_kernel_params(f_gp_param, gp.kernel_) # for sklearn-free inference (etc_gp.py)
         f_gp_param.close() 
         f_gp_kernel = os.path.join(dir_dat, 'GP_bright_exp_factor.%s.kernel.p' % cond)
         pickle.dump(gp.kernel_, open(f_gp_kernel, 'wb'))
@@ -220,6 +170,271 @@ def buildGP_bright_exposure_factor(expfile='exposures_surveysim_fork_150sv0p4.fi
     return None 
 
 
+def GP_trainingset(expfile='exposures_surveysim_fork_150sv0p4.fits', n_proc=1, chunk=500, 
+        overwrite=False, seed=0): 
+    ''' training set for the bright exposure factor GP emulators: a grid of
+    observing conditions that encompasses the surveysim output exposures plus
+    randomly sampled surveysim exposures. The exposure factors of the grid are
+    calculated in vectorized chunks over a process pool and everything is
+    written to an HDF5 training table, which is read in subsequent calls. 
+
+    :param expfile: 
+        surveysim output exposure file. (default: 'exposures_surveysim_fork_150sv0p4.fits') 
+    :param n_proc: 
+        number of processes (default: 1) 
+    :param chunk: 
+        number of conditions per vectorized SVETC.bright_exposure_factor call (default: 500) 
+    :param overwrite: 
+        if True, recalculate the training table (default: False) 
+
+    :return trainset: 
+        dictionary with `twilight` and `not_twilight` dictionaries of
+        `theta_grid`, `exp_factor_grid`, `i_exps`, `theta_exps`, and
+        `exp_factor_exps`
+    '''
+    ftrain = os.path.join(dir_dat, 'GP_bright_exp_factor.trainingset.%s' % expfile.replace('.fits', '.hdf5'))
+    if os.path.isfile(ftrain) and not overwrite: 
+        trainset = {}
+        f = h5py.File(ftrain, 'r') 
+        for cond in f.keys(): 
+            trainset[cond] = {} 
+            for k in f[cond].keys(): 
+                trainset[cond][k] = f[cond][k][...] 
+        f.close() 
+        return trainset 
+
+    np.random.seed(seed) 
+    fexp = os.path.join(dir_dat, expfile)
+    exps = extractBGS(fexp) # get BGS exposures only 
+    nexp = len(exps['airmass']) 
+    # read in precomputed exposure factors
+    exp_factors = np.load(os.path.join(dir_dat, 'exposure_factor.BGS.%s' % expfile.replace('.fits', '.npy'))) 
+
+    trainset = {} 
+    f = h5py.File(ftrain, 'w') 
+    for cond in ['twilight', 'not_twilight']: 
+        if cond == 'twilight': 
+            cut = (exps['sun_alt'] >= -20.) 
+            props = ['airmass', 'moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep']
+            nbins = [2, 5, 4, 3, 3, 3]
+        elif cond == 'not_twilight': 
+            cut = (exps['sun_alt'] < -20.) 
+            props = ['airmass', 'moon_ill', 'moon_alt', 'moon_sep']
+            nbins = [4, 4, 4, 4]
+        # grid (run/sv/etc.py) and exposure (desisurvey.etc) factors are combined
+        _check_exposure_factors(exps, exp_factors, cut, cond) 
+        
+        # grid that encompasses the surveysim exposures 
+        prop_bins = [np.linspace(exps[prop][cut].min(), exps[prop][cut].max(), nbin) 
+                for prop, nbin in zip(props, nbins)]
+        theta_grid = np.array(list(product(*prop_bins)))
+        exp_factor_grid = _bright_exposure_factor_theta(theta_grid, cond, chunk=chunk, n_proc=n_proc) 
+
+        # randomly sampled surveysim exposures 
+        if cond == 'twilight':         
+            i_exps = np.random.choice(np.arange(nexp)[cut], 500, replace=False) 
+        elif cond == 'not_twilight': 
+            i_exps = np.random.choice(np.arange(nexp)[cut], 1000, replace=False) 
+            # more exposures with low moon altitude 
+            i_exps = np.concatenate([i_exps, np.random.choice(
+                np.setdiff1d(np.arange(nexp)[cut & (exps['moon_alt'] < 10.)], i_exps), 200, replace=False)]) 
+        
+        trainset[cond] = {
+                'theta_grid': theta_grid, 
+                'exp_factor_grid': exp_factor_grid, 
+                'i_exps': i_exps, 
+                'theta_exps': np.array([exps[k][i_exps] for k in props]).T, 
+                'exp_factor_exps': exp_factors[i_exps]}
+        grp = f.create_group(cond) 
+        for k in trainset[cond].keys(): 
+            grp.create_dataset(k, data=trainset[cond][k]) 
+        grp.attrs['props'] = ','.join(props) 
+    f.close() 
+    return trainset 
+
+
+def buildSparseGP_bright_exposure_factor(expfile='exposures_surveysim_fork_150sv0p4.fits', 
+        n_train=100000, n_inducing=1000, n_hyper=2000, n_fold=5, n_proc=1, chunk=5000, seed=0): 
+    ''' build inducing point (subset of regressors) GP emulators of the bright
+    exposure factor, which scale to ~10^5 training conditions. 1) sample
+    `n_train` conditions uniformly within the range of the surveysim
+    exposures and calculate their exposure factors. 2) fit the kernel
+    hyperparameters with a full GP on a random subset of `n_hyper`
+    conditions. 3) choose `n_inducing` inducing points with k-means and solve
+    for their weights using all the conditions. 4) `n_fold` cross-validation
+    and validation on the surveysim exposures. The emulators are saved in the
+    same format as `buildGP_bright_exposure_factor` and can be loaded with
+    `etc_gp.BrightExposureFactorGP(dir_dat, sparse=True)`. 
+
+    :param expfile: 
+        surveysim output exposure file. (default: 'exposures_surveysim_fork_150sv0p4.fits') 
+    :param n_proc: 
+        number of processes for the training exposure factors (default: 1) 
+    :param chunk: 
+        number of conditions per vectorized SVETC.bright_exposure_factor call (default: 5000) 
+    '''
+    import time 
+    from scipy.cluster.vq import kmeans2
+    import etc_gp as GPETC
+    np.random.seed(seed) 
+
+    # read in surveysim output file 
+    print('--- %s ---' % expfile) 
+    fexp = os.path.join(dir_dat, expfile)
+    exps = extractBGS(fexp) # get BGS exposures only 
+    # read in precomputed exposure factors
+    exp_factors = np.load(os.path.join(dir_dat, 'exposure_factor.BGS.%s' % expfile.replace('.fits', '.npy'))) 
+
+    for cond in ['twilight', 'not_twilight']: 
+        if cond == 'twilight': 
+            cut = (exps['sun_alt'] >= -20.) 
+        elif cond == 'not_twilight': 
+            cut = (exps['sun_alt'] < -20.) 
+        props = GPETC.BrightExposureFactorGP.conditions[cond]
+        print('--- %s ---' % cond) 
+        # training labels (run/sv/etc.py) vs validation truths (desisurvey.etc) 
+        _check_exposure_factors(exps, exp_factors, cut, cond) 
+
+        # training conditions 
+        _t0 = time.time() 
+        theta = np.array([np.random.uniform(exps[k][cut].min(), exps[k][cut].max(), n_train) 
+            for k in props]).T
+        exp_factor = _bright_exposure_factor_theta(theta, cond, chunk=chunk, n_proc=n_proc) 
+        print('%i training exposure factors calculated in %.1f sec' % (n_train, time.time() - _t0)) 
+
+        # kernel hyperparameters from a full GP fit to a subset 
+        _t0 = time.time() 
+        i_hyper = np.random.choice(n_train, n_hyper, replace=False) 
+        _length_scale = np.ones(theta.shape[1])
+        _length_scale[2] = 10. 
+        kern = ConstantKernel(1.0, (1e-4, 1e4)) + ConstantKernel(1.0, (1e-4, 1e4)) * RBF(_length_scale, (1e-4, 1e4)) # kernel
+        noise = np.std(exp_factor)**2
+        gp = GPR(kernel=kern, alpha=noise, n_restarts_optimizer=2) 
+        gp.fit(theta[i_hyper], exp_factor[i_hyper])
+        constant = gp.kernel_.k1.constant_value
+        amplitude = gp.kernel_.k2.k1.constant_value
+        length_scale = np.atleast_1d(gp.kernel_.k2.k2.length_scale)
+        print('hyperparameters fit in %.1f sec: %s' % (time.time() - _t0, str(gp.kernel_)))
+
+        # inducing points (k-means in length-scale units) 
+        Z, _ = kmeans2(theta / length_scale, n_inducing, minit='points')
+        Z *= length_scale
+
+        # cross validation 
+        folds = np.array_split(np.random.permutation(n_train), n_fold) 
+        badfrac = np.zeros(n_fold)
+        for i_fold, i_test in enumerate(folds): 
+            train = np.ones(n_train).astype(bool) 
+            train[i_test] = False 
+            alpha = GPETC.sor_weights(theta[train], exp_factor[train], Z, constant, amplitude, length_scale, noise)
+            pred = np.clip(GPETC.gp_mean(theta[i_test], Z, alpha, constant, amplitude, length_scale), 1., None)
+            dratio = np.abs(pred / exp_factor[i_test] - 1.) 
+            badfrac[i_fold] = np.mean(dratio > 0.25)
+            print('fold %i: median |ratio - 1| = %.4f, 95%% |ratio - 1| = %.4f, bad fit fraction = %.4f' % 
+                    (i_fold, np.median(dratio), np.percentile(dratio, 95), badfrac[i_fold]))
+        print('cross-validated bad fit fraction = %.4f +/- %.4f' % (np.mean(badfrac), np.std(badfrac)))
+
+        # fit with all training conditions 
+        _t0 = time.time() 
+        alpha = GPETC.sor_weights(theta, exp_factor, Z, constant, amplitude, length_scale, noise)
+        print('%i inducing points fit to %i conditions in %.1f sec' % (n_inducing, n_train, time.time() - _t0)) 
+
+        # validate on the surveysim exposures 
+        theta_test = np.array([exps[k][cut] for k in props]).T
+        pred = np.clip(GPETC.gp_mean(theta_test, Z, alpha, constant, amplitude, length_scale), 1., None)
+        badfit = (np.abs((pred / exp_factors[cut]) - 1.) > 0.25) 
+        print('%i bad fits in %s (%.4f of %i)' % (np.sum(badfit), cond, np.mean(badfit), np.sum(cut))) 
+        
+        # store for etc_gp.BrightExposureFactorGP
+        f_gp_param = h5py.File(os.path.join(dir_dat, 'GP_bright_exp_factor.%s.sparse.params.hdf5' % cond), 'w') 
+        f_gp_param.create_dataset('Xtrain', data=Z) 
+        f_gp_param.create_dataset('alpha', data=alpha) 
+        _write_GP_kernel_params(f_gp_param, gp.kernel_)
+        f_gp_param.close() 
+    return None 
+
+
+def _check_exposure_factors(exps, exp_factors, cut, cond, n_check=200, tol=0.01, seed=0): 
+    ''' check that the vectorized run/sv/etc.py exposure factors, which are
+    used as training labels, agree with the precomputed desisurvey.etc
+    exposure factors of the surveysim exposures, which are used as validation
+    truths, on a random sample of `n_check` exposures within `cut`. The
+    sample is drawn with its own random state so that it does not change the
+    training sets. 
+
+    :param tol: 
+        maximum median |ratio - 1| between the two (default: 0.01) 
+    '''
+    props = ['airmass', 'moon_ill', 'moon_alt', 'moon_sep']
+    if cond == 'twilight': props += ['sun_alt', 'sun_sep']
+
+    i_check = np.random.RandomState(seed).choice(np.arange(len(cut))[cut], min(n_check, np.sum(cut)), replace=False) 
+    theta = np.array([exps[k][i_check] for k in props]).T
+    dratio = np.abs(_bright_exposure_factor_theta(theta, cond) / exp_factors[i_check] - 1.) 
+    print('run/sv/etc.py vs desisurvey.etc exposure factors of %i %s exposures: median |ratio - 1| = %.4f, max |ratio - 1| = %.4f' % 
+            (len(i_check), cond, np.median(dratio), np.max(dratio)))
+    if np.median(dratio) > tol: 
+        raise ValueError('run/sv/etc.py and desisurvey.etc %s exposure factors disagree (median |ratio - 1| = %.4f)' % (cond, np.median(dratio)))
+    return dratio 
+
+
+def _bright_exposure_factor_theta(theta, cond, chunk=5000, n_proc=1): 
+    ''' bright exposure factors for (N, ndim) array of conditions theta,
+    calculated in chunks of vectorized SVETC.bright_exposure_factor calls,
+    optionally over a process pool. Non-twilight conditions use 
+    sun_alt = -30 and sun_sep = 180. 
+    '''
+    chunks = [(theta[i0:i0+chunk], cond) for i0 in range(0, theta.shape[0], chunk)]
+    if n_proc > 1: 
+        from multiprocessing import Pool
+        pool = Pool(processes=n_proc) 
+        exp_factors = pool.map(_bright_exposure_factor_chunk, chunks) 
+        pool.close() 
+        pool.join() 
+    else: 
+        exp_factors = [_bright_exposure_factor_chunk(_chunk) for _chunk in chunks]
+    return np.concatenate(exp_factors) 
+
+
+def _bright_exposure_factor_chunk(args): 
+    ''' exposure factors of a chunk of conditions. This uses the vectorized
+    `bright_exposure_factor` of run/sv/etc.py; the desisurvey.etc version
+    only takes scalars. 
+    '''
+    _theta, cond = args 
+    if cond == 'twilight': 
+        sun_alt, sun_sep = _theta[:,4], _theta[:,5]
+    else: 
+        sun_alt, sun_sep = -30., 180. 
+    return SVETC.bright_exposure_factor(_theta[:,1], _theta[:,2], _theta[:,3], 
+            sun_alt, sun_sep, _theta[:,0]) 
+
+
+def _write_GP_kernel_params(f_gp_param, kernel): 
+    ''' write the hyperparameters of the ConstantKernel + ConstantKernel * RBF
+    kernel to the GP parameter file so that the GP can be evaluated without
+    sklearn (see etc_gp.py) 
+    '''
+    f_gp_param.create_dataset('constant', data=kernel.k1.constant_value) 
+    f_gp_param.create_dataset('amplitude', data=kernel.k2.k1.constant_value) 
+    f_gp_param.create_dataset('length_scale', data=np.atleast_1d(kernel.k2.k2.length_scale)) 
+    return None 
+
+
+def _add_GP_kernel_params(): 
+    ''' add the kernel hyperparameters from the pickled kernels to GP
+    parameter files that were written before they were stored 
+    '''
+    for cond in ['twilight', 'not_twilight']: 
+        kern = pickle.load(open(os.path.join(dir_dat, 'GP_bright_exp_factor.%s.kernel.p' % cond), 'rb'))
+        f_gp_param = h5py.File(os.path.join(dir_dat, 'GP_bright_exp_factor.%s.params.hdf5' % cond), 'a') 
+        for k in ['constant', 'amplitude', 'length_scale']: 
+            if k in f_gp_param.keys(): del f_gp_param[k]
+        _write_GP_kernel_params(f_gp_param, kern)
+        f_gp_param.close() 
+    return None 
+
+
 def _test_loadGP(): 
     ''' test the best way to store and load GP emulator for bright_exposure_factor 
     '''
@@ -259,6 +474,21 @@ def _test_loadGP():
             theta_i = np.array([exps[k][iexp] for k in props]) 
             print('true GP = %f' % gp_true.predict(np.atleast_2d(theta_i))) 
             print('load GP = %f' % gp_load.predict(np.atleast_2d(theta_i)))
+    
+    # numpy GP (no sklearn) 
+    import time 
+    from etc_gp import BrightExposureFactorGP
+    gp_np = BrightExposureFactorGP(dir_dat) 
+    for cond in ['twilight', 'not_twilight']: 
+        cut = (exps['sun_alt'] >= -20.) if cond == 'twilight' else (exps['sun_alt'] < -20.) 
+        gp_true = pickle.load(open(os.path.join(dir_dat, 'GP_bright_exp_factor.%s.p' % cond), 'rb')) 
+        theta = np.array([exps[k][cut] for k in BrightExposureFactorGP.conditions[cond]]).T
+        assert np.allclose(gp_np._predict(cond, theta), gp_true.predict(theta))
+    
+    theta = [np.tile(exps[k], 100) for k in ['airmass', 'moon_ill', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep']]
+    t0 = time.time() 
+    gp_np.predict(*theta) 
+    print('numpy GP: %.0f predictions/sec' % (len(theta[0]) / (time.time() - t0)))
     return None 
 
 
@@ -0,0 +1,259 @@
+__all__ = ['test_LazyCatalog', 'test_radec_match', 'test_getTractorColumns', 'test_select_chunked', 'test_h5py_dataset', 'test_CatalogView', 'test_AbsMag']
+
+import os
+import h5py
+import pytest
+import numpy as np
+from astropy.table import Table as aTable
+from astropy.cosmology import FlatLambdaCDM
+# --- feasibgs ---
+from feasibgs import catalogs as Cat
+
+
+def _write_catalog(fname, n=100):
+    np.random.seed(0)
+    data = {
+            'gama-photo': {'ra': np.random.uniform(0., 10., n), 'r_model': np.random.uniform(15., 20., n)},
+            'gama-spec': {'z': np.random.uniform(0., 0.5, n)},
+            'legacy-photo': {'apflux_r': np.random.uniform(0., 10., (n, 8))}}
+    Cat.GamaLegacy().write(data, fname)
+    return data
+
+
+def test_LazyCatalog(tmpdir):
+    fcat = os.path.join(str(tmpdir), 'catalog.hdf5')
+    data = _write_catalog(fcat)
+
+    cat = Cat.LazyCatalog(fcat)
+    assert sorted(cat.keys()) == sorted(data.keys())
+    assert sorted(cat['gama-photo'].keys()) == ['r_model', 'ra']
+    # nothing is read until accessed
+    assert len(cat['gama-photo']._data) == 0
+    assert np.array_equal(cat['gama-photo']['ra'], data['gama-photo']['ra'])
+    assert list(cat['gama-photo']._data.keys()) == ['ra']
+
+    # column projection
+    cat = Cat.LazyCatalog(fcat, columns={'gama-spec': ['z'], 'legacy-photo': None})
+    assert sorted(cat.keys()) == ['gama-spec', 'legacy-photo']
+    with pytest.raises(KeyError):
+        cat['gama-photo']
+    with pytest.raises(KeyError):
+        Cat.LazyCatalog(fcat, columns={'gama-spec': ['ha_flux']})
+
+    # row slices, boolean arrays, and index arrays
+    for rows in [slice(10, 20), data['gama-spec']['z'] > 0.25, np.array([50, 3, 17, 3]), np.array([-2, -1]), np.array([-1, 5])]:
+        cat = Cat.LazyCatalog(fcat, rows=rows)
+        assert np.array_equal(cat['gama-spec']['z'], data['gama-spec']['z'][rows])
+        assert np.array_equal(cat['legacy-photo']['apflux_r'], data['legacy-photo']['apflux_r'][rows])
+    # boolean rows have to match the number of rows
+    with pytest.raises(IndexError):
+        Cat.LazyCatalog(fcat, rows=np.ones(5).astype(bool))['gama-spec']['z']
+
+    # context manager closes the file
+    with Cat.LazyCatalog(fcat) as _cat:
+        assert np.array_equal(_cat['gama-spec']['z'], data['gama-spec']['z'])
+    assert not _cat._file
+
+    # assigned columns and eager copy
+    cat['gama-spec']['z2'] = cat['gama-spec']['z']**2
+    _cat = cat.copy()
+    assert isinstance(_cat['gama-spec'], dict)
+    assert sorted(_cat['gama-spec'].keys()) == ['z', 'z2']
+    cat.close()
+
+
+def test_radec_match():
+    np.random.seed(1)
+    ra = np.random.uniform(210., 220., 1000)
+    dec = np.random.uniform(-2., 3., 1000)
+    tree = Cat.radec_tree(ra, dec)
+
+    # offset a subset of the positions by 0.5 arcsec in declination
+    i_in = np.random.choice(np.arange(1000), 100, replace=False)
+    _ra = np.concatenate([ra[i_in], [150.]])
+    _dec = np.concatenate([dec[i_in] + 0.5/3600., [0.]])
+    i, i_tree, sep = Cat.radec_match(tree, _ra, _dec, 1./3600.)
+    assert np.array_equal(i, np.arange(100))
+    assert np.array_equal(i_tree, i_in)
+    assert np.allclose(sep, 0.5/3600., rtol=1e-4)
+
+
+def test_getTractorColumns(tmpdir):
+    np.random.seed(2)
+    tractor_dir = str(tmpdir) + '/'
+    bricks = ['2100m005', '2103p010', '2105p025']
+    tractors = {}
+    for i, brick in enumerate(bricks):
+        nobj = 50
+        objid = np.arange(nobj)
+        if i == 1: objid = objid[::-1] # objids that do not index rows
+        tractors[brick] = aTable([objid, np.random.uniform(0., 1., (nobj, 8)), np.random.uniform(0., 1., nobj).astype(np.float32)],
+                names=('objid', 'apflux_r', 'flux_w1'))
+        os.makedirs(os.path.join(tractor_dir, brick[:3]), exist_ok=True)
+        tractors[brick].write(os.path.join(tractor_dir, brick[:3], 'tractor-%s.fits' % brick))
+
+    brickname = np.random.choice(bricks, 200)
+    objids = np.random.randint(0, 50, 200)
+    cata = Cat.GamaLegacy()
+    for n_thread in [1, 3]:
+        cols = cata._getTractorColumns(brickname, objids, ['apflux_r', 'flux_w1'],
+                tractor_dir=tractor_dir, n_thread=n_thread)
+        for i in range(200):
+            tr = tractors[brickname[i]]
+            row = np.where(tr['objid'] == objids[i])[0][0]
+            assert np.array_equal(cols['apflux_r'][i], tr['apflux_r'][row])
+            assert cols['flux_w1'][i] == tr['flux_w1'][row]
+        # float32 tractor columns are returned as float64
+        assert cols['flux_w1'].dtype == np.float64
+
+    with pytest.raises(ValueError):
+        cata._getTractorColumns(np.array(['0000p000']), np.array([0]), ['flux_w1'], tractor_dir=tractor_dir)
+
+
+def test_select_chunked(tmpdir):
+    np.random.seed(4)
+    n = 1000
+    sweep = {'maskbits': np.random.choice([0, 0, 0, 2**1, 2**5, 2**12, 2**3], n).astype(np.int16),
+            'gaia_phot_g_mean_mag': np.random.choice([0., 18., 21.], n)}
+    for b in 'grz':
+        sweep['nobs_'+b] = np.random.choice([0, 1, 2, 3], n, p=[0.05, 0.3, 0.3, 0.35]).astype(np.int16)
+        sweep['flux_'+b] = np.random.uniform(1., 100., n)
+        sweep['mw_transmission_'+b] = np.random.uniform(0.8, 1., n)
+        sweep['fracflux_'+b] = np.random.uniform(0., 6., n)
+        sweep['fracmasked_'+b] = np.random.uniform(0., 0.5, n)
+        sweep['fracin_'+b] = np.random.uniform(0.2, 1., n)
+    fsweep = os.path.join(str(tmpdir), 'sweep.hdf5')
+    with h5py.File(fsweep, 'w') as f:
+        for k in sweep.keys(): f.create_dataset(k, data=sweep[k])
+
+    leg = Cat.Legacy()
+    passes = [cut(sweep) for _, _, cut in leg.bgs_cuts()]
+    select = np.all(passes, axis=0)
+    assert 0 < np.sum(select) < n
+
+    fout = os.path.join(str(tmpdir), 'bgs.hdf5')
+    for chunk, n_thread in [(n, 1), (97, 1), (128, 3)]:
+        counts = leg.select_chunked(fsweep, fout, chunk=chunk, n_thread=n_thread)
+        assert counts['total'] == n
+        assert counts['all'] == np.sum(select)
+        for (name, _, _), _pass in zip(leg.bgs_cuts(), passes):
+            assert counts[name] == np.sum(_pass)
+        with h5py.File(fout, 'r') as f:
+            assert sorted(f.keys()) == sorted(sweep.keys())
+            assert np.array_equal(f['flux_r'][...], sweep['flux_r'][select])
+
+
+def test_h5py_dataset(tmpdir):
+    np.random.seed(5)
+    n = 1000
+    cat = Cat.Catalog()
+    brickname = np.random.choice(['2100m005', '2103p010'], n)
+    flux_r = np.random.uniform(0., 1., n)
+    isbright = (flux_r > 0.5)
+    with h5py.File(os.path.join(str(tmpdir), 'cat.hdf5'), 'w') as f:
+        cat._h5py_create_dataset(f, 'BRICKNAME', brickname)
+        cat._h5py_create_dataset(f, 'flux_r', flux_r, compression='gzip', attrs={'band': 'r'})
+        cat._h5py_create_dataset(f, 'isbright', isbright)
+        for i0 in range(0, n, 300):
+            cat._h5py_append_dataset(f, 'brick', brickname[i0:i0+300], compression='lzf')
+        with pytest.raises(ValueError):
+            cat._h5py_append_dataset(f, 'brick', np.array(['2100m005_']))
+
+        assert f['brickname'].dtype == np.dtype('S8')
+        assert np.array_equal(f['brickname'][...].astype(str), brickname)
+        assert np.array_equal(f['brick'][...].astype(str), brickname)
+        assert f['brickname'].attrs['encoding'] == 'utf-8'
+        assert f['flux_r'].chunks is not None and f['flux_r'].compression == 'gzip'
+        assert f['flux_r'].attrs['unit'] == 'nanomaggies' and f['flux_r'].attrs['band'] == 'r'
+        assert np.array_equal(f['flux_r'][...], flux_r)
+        assert f['isbright'].dtype == bool
+        assert np.array_equal(f['isbright'][...], isbright)
+
+        # the first chunks are empty or narrower than the rest of the column
+        names = np.array(['a', 'bb', 'sweep-200p000', 'sweep-210p005'])
+        for i0, i1 in [(0, 0), (0, 1), (1, 2), (2, 2), (2, 4)]:
+            cat._h5py_append_dataset(f, 'name', names[i0:i1])
+        assert f['name'].dtype == np.dtype('S13')
+        assert np.array_equal(f['name'][...].astype(str), names)
+        # non-ascii strings
+        cat._h5py_create_dataset(f, 'field', np.array(['G09', 'G\u00e912']))
+        assert np.array_equal(np.char.decode(f['field'][...], 'utf-8'), ['G09', 'G\u00e912'])
+
+
+def test_CatalogView(tmpdir):
+    fcat = os.path.join(str(tmpdir), 'catalog.hdf5')
+    data = _write_catalog(fcat)
+    cata = Cat.GamaLegacy()
+    cata.catalog = Cat.LazyCatalog(fcat)
+
+    zcut = (data['gama-spec']['z'] > 0.2)
+    view = cata.select(index=zcut)
+    assert isinstance(view, Cat.CatalogView)
+    # nothing is gathered until accessed
+    assert len(view['gama-spec']._data) == 0
+    assert np.array_equal(view['gama-spec']['z'], data['gama-spec']['z'][zcut])
+    assert list(view['gama-spec']._data.keys()) == ['z']
+
+    # chained selections compose the indices
+    view['gama-photo']['r2'] = view['gama-photo']['r_model']**2
+    view['forwardmodel'] = {'flag': np.arange(np.sum(zcut))}
+    index = np.array([5, 0, 3, 3])
+    _view = view.select(index)
+    assert np.array_equal(_view.index, np.arange(100)[zcut][index])
+    assert np.array_equal(_view['legacy-photo']['apflux_r'], data['legacy-photo']['apflux_r'][zcut][index])
+    assert np.array_equal(_view['gama-photo']['r2'], data['gama-photo']['r_model'][zcut][index]**2)
+    assert np.array_equal(_view['forwardmodel']['flag'], index)
+
+    # contiguous rows are views of the parent columns
+    _data = Cat.LazyCatalog(fcat).copy()
+    view = Cat.CatalogView(_data, np.arange(10, 20))
+    assert np.shares_memory(view['gama-spec']['z'], _data['gama-spec']['z'])
+    # ... which are read-only so subsamples do not write through to the parent
+    with pytest.raises(ValueError):
+        view['gama-spec']['z'][0] = 99.
+    assert _data['gama-spec']['z'].flags.writeable
+    # negative indices
+    view = Cat.CatalogView(_data, np.array([-2, -1]))
+    assert np.array_equal(view['gama-spec']['z'], _data['gama-spec']['z'][-2:])
+    assert np.array_equal(view.select(np.array([-1]))['gama-spec']['z'], _data['gama-spec']['z'][-1:])
+    assert sorted(view.copy().keys()) == sorted(data.keys())
+
+    with pytest.raises(ValueError):
+        cata.select(index=0.5)
+
+
+def test_AbsMag():
+    np.random.seed(6)
+    n = 100
+    bands = 'ugriz'
+    data = {'gama-photo': dict([(b+'_model', np.random.uniform(15., 20., n)) for b in bands]),
+            'gama-spec': {'z': np.random.uniform(0.01, 0.5, n)},
+            'gama-kcorr-z0.0': dict([('kcorr_'+b, np.random.uniform(0., 0.5, n)) for b in bands]),
+            'gama-kcorr-z0.1': dict([('kcorr_'+b, np.random.uniform(0., 0.5, n)) for b in bands])}
+    data['gama-kcorr-z0.1'].update(dict([(b+'_model', np.random.uniform(15., 20., n)) for b in bands]))
+
+    cata = Cat.GamaLegacy()
+    absmag = cata.AbsMag(data, kcorr=0.1, H0=70, Om0=0.3)
+    dm = FlatLambdaCDM(H0=70, Om0=0.3).distmod(data['gama-spec']['z']).value
+    _absmag = (np.array([data['gama-photo'][b+'_model'] for b in bands]) - dm -
+            np.array([data['gama-kcorr-z0.1']['kcorr_'+b] for b in bands]))
+    assert np.allclose(absmag, _absmag, atol=1e-5)
+
+    # plain dictionaries are not memoized
+    assert cata.AbsMag(data, kcorr=0.1, H0=70, Om0=0.3) is not absmag
+
+    # memoized on the catalog per k-correction redshift
+    view = Cat.CatalogView(data, np.arange(n))
+    absmag = cata.AbsMag(view, kcorr=0.1, H0=70, Om0=0.3)
+    assert np.allclose(absmag, _absmag, atol=1e-5)
+    assert Cat.GamaLegacy().AbsMag(view, kcorr=0.1, H0=70, Om0=0.3) is absmag
+    assert not absmag.flags.writeable
+    assert cata.AbsMag(view, kcorr=0.0, H0=70, Om0=0.3) is not absmag
+    assert cata.AbsMag(view, kcorr=0.1, H0=70, Om0=0.3, galext=True) is not absmag
+    # columns changed in place are recalculated
+    data['gama-spec']['z'][:] += 0.01
+    absmag1 = cata.AbsMag(view, kcorr=0.1, H0=70, Om0=0.3)
+    assert not np.allclose(absmag1, absmag)
+    # replaced columns are recalculated
+    view['gama-spec']['z'] = view['gama-spec']['z'] - 0.01
+    assert np.allclose(cata.AbsMag(view, kcorr=0.1, H0=70, Om0=0.3), absmag)
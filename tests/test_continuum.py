@@ -0,0 +1,78 @@
+__all__ = ['test_binned_continuum', 'test_continuum_at', 'test_cached_continuum_at', 'test_emline_mask']
+
+import pytest
+import numpy as np
+from scipy.signal import medfilt
+from scipy.ndimage import gaussian_filter
+# --- feasibgs ---
+from feasibgs import continuum as Cont
+
+
+def test_binned_continuum():
+    wave = np.linspace(3500., 10000., 2000)
+    sb = np.random.uniform(1., 2., (3, len(wave)))
+    sb[0,:100] = np.nan
+    sb[1,wave < 4311.] = np.nan # first bin has no finite pixels
+
+    wmid, sb_med = Cont.binned_continuum(wave, sb)
+    assert sb_med.shape == (3, len(wmid))
+    assert sb_med[1,0] == 0.
+    for i in range(3):
+        # one spectrum at a time
+        _, sb_med_i = Cont.binned_continuum(wave, sb[i])
+        assert np.array_equal(sb_med_i, sb_med[i])
+
+
+def test_continuum_at():
+    wave = np.linspace(3600., 4800., 1200)
+    sb = 1. + np.random.uniform(0., 0.1, (4, len(wave)))
+    mask = np.ones(len(wave)).astype(bool)
+    mask[500:520] = False
+
+    cont = Cont.continuum_at(wave, sb, [3800., 4100., 4600.], mask=mask, dw=5.)
+    assert cont.shape == (4, 3)
+    # same as filtering one sky at a time
+    for i in range(4):
+        cont_i = gaussian_filter(medfilt(sb[i], 51), 100)
+        for j, w in enumerate([3800., 4100., 4600.]):
+            wlim = (wave > w - 5.) & (wave < w + 5.) & mask
+            assert np.isclose(cont[i,j], np.median(cont_i[wlim]))
+
+    # process pool
+    assert np.allclose(Cont.continuum_at(wave, sb, [3800., 4100., 4600.], mask=mask, n_proc=2), cont)
+
+
+def test_cached_continuum_at(tmp_path):
+    fcache = str(tmp_path / 'continuum.hdf5')
+    wave = np.linspace(3600., 4800., 1200)
+    sb = 1. + np.random.uniform(0., 0.1, (4, len(wave)))
+    mask0 = lambda w: np.ones(len(w)).astype(bool)
+    mask1 = lambda w: (w < 4097.) | (w > 4110.)
+
+    cont = Cont.cached_continuum_at(fcache, [3800., 4100.], lambda: (wave, sb), mask=mask0)
+    assert np.allclose(cont, Cont.continuum_at(wave, sb, [3800., 4100.]))
+    # read back from the cache
+    assert np.array_equal(Cont.cached_continuum_at(fcache, [3800., 4100.], lambda: (wave, sb), mask=mask0), cont)
+
+    # different mask or spectra are not served the cached continua
+    cont1 = Cont.cached_continuum_at(fcache, [3800., 4100.], lambda: (wave, sb), mask=mask1)
+    assert np.allclose(cont1, Cont.continuum_at(wave, sb, [3800., 4100.], mask=mask1(wave)))
+    assert not np.allclose(cont1[:,1], cont[:,1])
+    cont2 = Cont.cached_continuum_at(fcache, [3800., 4100.], lambda: (wave, 2. * sb), mask=mask0)
+    assert np.allclose(cont2, 2. * cont)
+
+
+def test_emline_mask():
+    wave = np.linspace(3600., 9800., 20000)
+    mask = Cont.emline_mask(wave, dwave=5.)
+    # cached and read-only
+    assert Cont.emline_mask(wave.copy(), dwave=5.) is mask
+    assert not mask.flags.writeable
+
+    # same as masking one line at a time
+    uves_ws, uves_emfluxes = Cont.UVES_lines()
+    keep = (uves_emfluxes > 0.5) & (uves_ws >= 3600.) & (uves_ws <= 10400.)
+    _mask = np.ones(len(wave)).astype(bool)
+    for w in np.concatenate([uves_ws[keep] * Cont.n_edlen(uves_ws[keep]), Cont.lamp_lines]):
+        _mask = _mask & ~((wave > w - 5.) & (wave < w + 5.))
+    assert np.array_equal(mask, _mask)
@@ -0,0 +1,21 @@
+__all__ = ['test_DistanceModulus']
+
+import pytest
+import numpy as np
+from astropy.cosmology import FlatLambdaCDM
+# --- feasibgs ---
+from feasibgs import cosmology as CM
+
+
+@pytest.mark.parametrize('H0, Om0', [(70, 0.3), (67.7, 0.31)])
+def test_DistanceModulus(H0, Om0):
+    dm = CM.DistanceModulus(H0=H0, Om0=Om0)
+    assert dm.interp_error < 1e-5
+
+    z = np.concatenate([np.random.uniform(0., 0.6, 1000), [1e-6, 6.]])
+    dm_exact = FlatLambdaCDM(H0=H0, Om0=Om0).distmod(z).value
+    assert np.allclose(dm(z), dm_exact, atol=1e-5, rtol=0.)
+    assert np.allclose(CM.distmod(z, H0=H0, Om0=Om0), dm_exact, atol=1e-5, rtol=0.)
+    assert dm(z.reshape(2, -1)).shape == (2, 501)
+    # table is cached per cosmology
+    assert (float(H0), float(Om0)) in CM._DISTMODS
@@ -0,0 +1,58 @@
+__all__ = ['test_ConditionDomain']
+
+import os
+import pytest
+import numpy as np
+from itertools import product
+# --- feasibgs ---
+from feasibgs import domain as Dom
+
+
+def test_ConditionDomain(tmpdir):
+    # training conditions on a 5x5x5 grid
+    bins = [np.linspace(0., 1., 5), np.linspace(-90., 90., 5), np.linspace(0., 180., 5)]
+    theta = np.array(list(product(*bins)))
+    dom = Dom.ConditionDomain(theta)
+    assert np.isclose(dom.radius, 0.25)
+
+    # training points and cell centers are inside; points beyond the edges are not
+    inside, dist, index = dom.query(theta)
+    assert np.all(inside)
+    assert np.allclose(dist, 0.)
+    assert np.array_equal(index, np.arange(len(theta)))
+    assert dom.inside([0.125, -67.5, 22.5])[0]
+    assert not dom.inside([1.1, 0., 90.])[0]
+    assert not dom.inside([0.5, 0., 190.])[0]
+    assert np.isclose(dom.distance([0.5, 0., 190.])[0], 10./180.)
+
+    with pytest.raises(ValueError):
+        dom.query(np.zeros((2, 2)))
+
+    # serialized state
+    fdom = os.path.join(str(tmpdir), 'domain.npz')
+    dom.write(fdom)
+    _dom = Dom.ConditionDomain.read(fdom)
+    assert np.array_equal(_dom.theta, dom.theta)
+    assert _dom.radius == dom.radius
+    thetas = np.random.uniform([-0.2, -100., -10.], [1.2, 100., 190.], (100, 3))
+    assert np.array_equal(_dom.inside(thetas), dom.inside(thetas))
+
+    # cached domain (in a directory that does not exist yet)
+    ftheta = os.path.join(str(tmpdir), 'theta.npy')
+    np.save(ftheta, theta)
+    nbuild = []
+    def get_theta():
+        nbuild.append(1)
+        return np.load(ftheta)
+    fdom = os.path.join(str(tmpdir), 'cache', 'domain.npz')
+    _dom = Dom.cached_domain(fdom, get_theta, inputs=[ftheta])
+    assert np.array_equal(_dom.inside(thetas), dom.inside(thetas))
+    _dom = Dom.cached_domain(fdom, get_theta, inputs=[ftheta])
+    assert len(nbuild) == 1
+    # rebuilt when the kwargs or the inputs change
+    _dom = Dom.cached_domain(fdom, get_theta, inputs=[ftheta], radius=0.1)
+    assert len(nbuild) == 2 and _dom.radius == 0.1
+    np.save(ftheta, theta[:10])
+    os.utime(ftheta, (0., 0.))
+    _dom = Dom.cached_domain(fdom, get_theta, inputs=[ftheta], radius=0.1)
+    assert len(nbuild) == 3 and len(_dom.theta) == 10
@@ -0,0 +1,71 @@
+__all__ = ['test_night_fraction', 'test_ephemeris_file', 'test_sky_geometry'] 
+
+import os
+import pytest
+import numpy as np 
+# --- feasibgs --- 
+from feasibgs import ephemeris as Ephem
+
+
+def test_night_fraction(): 
+    ephem = Ephem.kpno_ephemeris() 
+    night = ephem[100] 
+    assert night['sunset'] < night['dusk_astronomical'] < night['dawn_astronomical'] < night['sunrise'] 
+
+    # sun set, midnight, and sun rise of a few nights 
+    mjds = np.array([night['sunset'], 0.5 * (night['sunset'] + night['sunrise']), night['sunrise'] - 1e-6]) 
+    assert np.array_equal(Ephem.night_index(mjds), np.repeat(100, 3))
+    assert np.allclose(Ephem.night_fraction(mjds), [0., 0.5, 1.], atol=1e-4) 
+
+    with pytest.raises(ValueError): 
+        Ephem.night_index(ephem['noon'][0] - 1.) 
+
+    # the table covers the BOSS years 
+    assert ephem['noon'][0] < 54833. # night of 2009-01-01 
+
+    # nights outside of the table are solved 
+    solved = Ephem._solve_nights(ephem['noon'][[100, 101]]) 
+    for k in ['sunset', 'sunrise', 'dusk_astronomical', 'moon_ill']: 
+        assert np.allclose(solved[k], ephem[k][[100, 101]]) 
+    mjd_before = ephem['noon'][0] - 9.5 
+    night = Ephem.get_night(np.array([mjd_before, night['sunset']])) 
+    assert night['noon'][0] == ephem['noon'][0] - 10. 
+    assert night['sunset'][1] == ephem['sunset'][100] 
+    assert 0.4 < Ephem.night_fraction(mjd_before) < 0.6 
+
+
+
+def test_ephemeris_file(tmpdir, monkeypatch): 
+    # without a table in dat/sky/ the table is built in $FEASIBGS_DIR/sky/ 
+    dir_code = str(tmpdir.mkdir('code'))
+    monkeypatch.setattr(Ephem.UT, 'code_dir', lambda: dir_code)
+    monkeypatch.setattr(Ephem.UT, 'dat_dir', lambda: str(tmpdir))
+    fephem = Ephem._ephemeris_file() 
+    assert fephem == os.path.join(str(tmpdir), 'sky', 'kpno_ephemeris.npy')
+    Ephem._build_ephemeris(fephem, first='2020-01-01', last='2020-01-04') 
+    assert len(np.load(fephem)) == 2 
+    assert not os.path.exists(os.path.join(str(tmpdir), 'code', 'dat'))
+
+
+def test_sky_geometry(): 
+    ra = np.array([10., 150., 280.]) 
+    dec = np.array([0., 30., -10.]) 
+    mjd = 58800.3 
+    geo = Ephem.sky_geometry(ra, dec, mjd) 
+    for k in ['airmass', 'moon_ill', 'moon_phase', 'moon_alt', 'moon_sep', 'sun_alt', 'sun_sep']: 
+        assert geo[k].shape == (3,)
+    # single time so the sun and moon are the same for all pointings 
+    assert np.all(geo['sun_alt'] == geo['sun_alt'][0]) 
+    assert np.all((geo['moon_ill'] >= 0.) & (geo['moon_ill'] <= 1.))
+
+    # batched calculation is the same as one pointing at a time 
+    for i in range(3): 
+        _geo = Ephem.sky_geometry(ra[i], dec[i], mjd) 
+        for k in geo.keys(): 
+            assert np.allclose(_geo[k][0], geo[k][i]) 
+
+    # the astropy IERS configuration is only changed within sky_geometry 
+    from astropy.utils import iers 
+    with iers.conf.set_temp('auto_download', True): 
+        Ephem.sky_geometry(ra, dec, mjd) 
+        assert iers.conf.auto_download
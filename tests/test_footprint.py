@@ -0,0 +1,57 @@
+__all__ = ['test_bounds', 'test_Footprint']
+
+import os
+import pytest
+import numpy as np
+# --- feasibgs ---
+from feasibgs import footprint as FP
+
+
+def test_bounds():
+    assert FP.sweep_bounds('/dir/sweep-150m005-160p000.fits') == (150., 160., -5., 0.)
+    ra_min, ra_max, dec_min, dec_max = FP.brick_bounds('1501p025')
+    assert np.isclose(0.5 * (ra_min + ra_max), 150.1)
+    assert np.isclose(dec_min, 2.375) and np.isclose(dec_max, 2.625)
+    assert np.isclose(np.mean(FP.brick_bounds(b'0001m100')[2:]), -10.)
+
+
+def test_Footprint(tmpdir):
+    rows = []
+    for release in ['north', 'south']:
+        for ra in np.arange(0., 360., 10.):
+            for dec in np.arange(-10., 30., 5.):
+                name = 'sweep-%03i%s%03i-%03i%s%03i.fits' % (ra, 'pm'[int(dec < 0)], abs(dec),
+                        ra + 10, 'pm'[int(dec + 5 < 0)], abs(dec + 5))
+                rows.append(('sweep', release, name, os.path.join(release, name), ra, ra + 10.,
+                    dec, dec + 5., 100))
+    rows.append(('brick', 'south', '1501p025', 'south/150/tractor-1501p025.fits') +
+            FP.brick_bounds('1501p025') + (10,))
+    fp = FP.Footprint(np.array(rows, dtype=FP._dtype))
+
+    rect = fp.rectangle([155., 172.], [1., 3.])
+    assert sorted(set(rect['ra_min'])) == [150., 160., 170.]
+    assert np.all(rect['dec_min'] == 0.)
+    assert len(fp.rectangle([155., 172.], [1., 3.], release='north')) == 3
+    # north files are preferred
+    paths = fp.paths(rect)
+    assert len(paths) == 3 and all([p.startswith('north') for p in paths])
+    assert all([p.startswith('south') for p in fp.paths(rect, prefer=('south', 'north'))])
+
+    # rectangle and cone across RA = 0
+    assert sorted(set(fp.rectangle([355., 5.], [1., 3.])['ra_min'])) == [0., 350.]
+    assert sorted(set(fp.cone(359., 2., 1.)['ra_min'])) == [0., 350.]
+    assert len(fp.cone(359., 2., 1.)) == 4
+    assert list(FP.ra_overlap(np.array([-0.1, 100.]), np.array([0.3, 110.]), [359.9, 0.05])) == [True, False]
+    assert len(fp.cone(150.1, 2.5, 0.1, kind='brick')) == 1
+
+    assert fp.brick_files([b'1501p025']) == ['south/150/tractor-1501p025.fits']
+    with pytest.raises(ValueError):
+        fp.brick_files(['0000p000'])
+
+    ffp = os.path.join(str(tmpdir), 'footprint.npy')
+    fp.write(ffp)
+    assert np.array_equal(FP.Footprint.read(ffp).table, fp.table)
+
+    # missing data release directories
+    with pytest.raises(ValueError):
+        FP.Footprint.build(8, dir_legacy=str(tmpdir))
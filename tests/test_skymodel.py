@@ -1,5 +1,6 @@
-__all__ = ['test_Isky_newKS_twi'] 
+__all__ = ['test_Isky_newKS_twi', 'test_parker_bundle', 'test_Isky_parker_batch', 'test_Isky_parker_broadcast', 'test_Moon_batch', 'test_Moon_specsim'] 
 
+import os 
 import pytest
 import numpy as np 
 # --- gqp_mc --- 
@@ -29,3 +30,120 @@ def test_Isky_newKS_twi():
     _, Isky0 = Sky.Isky_newKS_twi(airmass, moonill, moonalt, moonsep, -30., 80.)
     _, Isky1 = Sky.Isky_newKS_twi(airmass, moonill, moonalt, moonsep, -10., 80.)
     assert np.median(Isky0) < np.median(Isky1)
+
+
+@pytest.fixture
+def parker(): 
+    # parker's model needs either the compiled bundle or all of its inputs in dat/sky/
+    if Sky.UT.code_dir() is None: 
+        pytest.skip('FEASIBGS_CODEDIR is not set') 
+    if not os.path.isfile(Sky._parker_bundle_file()) and len(Sky._parker_inputs_missing()) > 0: 
+        pytest.skip("parker's model bundle and inputs are not in dat/sky/")
+
+
+def test_parker_bundle(parker): 
+    # the coefficient bundle is read once and cached 
+    coeffs = Sky._parker_bundle() 
+    assert Sky._parker_bundle() is coeffs 
+
+    nwave = len(coeffs['wl'])
+    assert coeffs['seasonal'].shape == (12, nwave) 
+    assert coeffs['hourly'].shape == (7, nwave) 
+    assert coeffs['isl'].shape == (len(coeffs['isl_y']), len(coeffs['isl_x']))
+
+    w, Icont = Sky._parker_Icontinuum(coeffs, 1.2, 30., 60., 200., 58000.1, 3.5, 0.4, 
+            -30., 120., 40., 0.7, 80., 60.)
+    assert len(w) == nwave 
+    assert np.all(np.isfinite(Icont))
+
+
+def test_Isky_parker_batch(parker): 
+    # batched Parker model should reproduce evaluations one condition at a time 
+    n = 5 
+    airmass     = np.linspace(1., 2., n)
+    ecl_lat     = np.linspace(-30., 30., n) 
+    gal_lat     = np.linspace(20., 80., n) 
+    gal_lon     = np.linspace(0., 300., n) 
+    mjd         = np.linspace(57000., 58000., n)
+    month_frac  = np.linspace(1., 12.9, n) 
+    hour_frac   = np.linspace(0., 1., n) 
+    sun_alt     = np.array([-40., -30., -19., -15., -10.]) 
+    sun_sep     = np.linspace(40., 160., n) 
+    moon_phase  = np.linspace(0., 150., n) 
+    moon_ill    = np.linspace(0.2, 1., n) 
+    moon_alt    = np.linspace(10., 80., n) 
+    moon_sep    = np.linspace(30., 150., n) 
+
+    w, Isky = Sky.Isky_parker_batch(airmass, ecl_lat, gal_lat, gal_lon, mjd, month_frac, 
+            hour_frac, sun_alt, sun_sep, moon_phase, moon_ill, moon_alt, moon_sep)
+    assert Isky.shape == (n, len(w))
+
+    for i in range(n): 
+        _, Isky_i = Sky.Isky_parker_batch(airmass[i], ecl_lat[i], gal_lat[i], gal_lon[i], 
+                mjd[i], month_frac[i], hour_frac[i], sun_alt[i], sun_sep[i], 
+                moon_phase[i], moon_ill[i], moon_alt[i], moon_sep[i])
+        assert np.allclose(Isky[i], Isky_i[0])
+
+
+
+def test_Isky_parker_broadcast(parker): 
+    # a scalar time with arrays of observing conditions gives one spectrum per condition 
+    tai = 58800.3 * 86400. 
+    airmass = np.array([1., 1.5, 2.]) 
+    w, Isky = Sky.Isky_parker(airmass, 30., 60., 200., tai, -30., 120., 40., 0.7, 80., 60.) 
+    assert Isky.shape == (len(airmass), len(w))
+    for i in range(len(airmass)): 
+        _, Isky_i = Sky.Isky_parker(airmass[i], 30., 60., 200., tai, -30., 120., 40., 0.7, 80., 60.) 
+        assert Isky_i.shape == (len(w),) 
+        assert np.allclose(Isky[i], Isky_i)
+
+
+def test_Moon_batch(): 
+    # scattered moonlight for arrays of moon geometry should reproduce one
+    # geometry at a time 
+    moon = Sky._specsim_initialize('desi', model='regression').moon
+    n = 4 
+    airmass     = np.linspace(1., 1.8, n)
+    moon_zenith = np.linspace(10., 80., n)
+    moon_sep    = np.linspace(30., 150., n)
+    moon_phase  = np.linspace(0., 0.6, n)
+
+    moon.airmass = airmass 
+    moon.moon_zenith = moon_zenith * Sky.u.deg 
+    moon.separation_angle = moon_sep * Sky.u.deg 
+    moon.moon_phase = moon_phase
+    Imoon = moon.surface_brightness.value 
+    assert Imoon.shape == (n, len(moon._wavelength)) 
+
+    for i in range(n): 
+        moon.airmass = airmass[i]
+        moon.moon_zenith = moon_zenith[i] * Sky.u.deg 
+        moon.separation_angle = moon_sep[i] * Sky.u.deg 
+        moon.moon_phase = moon_phase[i] 
+        assert np.allclose(moon.surface_brightness.value, Imoon[i]) 
+
+    # polynomial features from the exponent matrix 
+    assert Sky.reg_model_powers.shape == (len(Sky.reg_model_coeffs), 4)
+    V = Sky._scattered_V_regression(airmass, 0.5, 45., moon_sep) 
+    for i in range(n): 
+        assert np.isclose(V[i], Sky._scattered_V_regression(airmass[i], 0.5, 45., moon_sep[i])[0])
+
+
+def test_Moon_specsim(): 
+    # with the default KS coefficients the (batched) refit KS model is
+    # specsim's scattered moonlight model 
+    from specsim.atmosphere import Moon
+    wave = np.linspace(3600., 9800., 2000) * Sky.u.Angstrom 
+    moon_spectrum = np.ones(len(wave)) * 1e-17 * Sky.u.erg / Sky.u.cm**2 / Sky.u.s / Sky.u.Angstrom
+    extinction = np.linspace(0.4, 0.05, len(wave))
+    airmass = np.array([1., 1.3, 1.8]) 
+
+    moon = Sky._Moon(wave, moon_spectrum, extinction, airmass, 40. * Sky.u.deg, 
+            60. * Sky.u.deg, 0.3, model='refit_ks') 
+    Imoon = moon.surface_brightness
+    for i, X in enumerate(airmass): 
+        _moon = Moon(wave, moon_spectrum, extinction, X, 40. * Sky.u.deg, 60. * Sky.u.deg, 0.3)
+        moon.airmass = X 
+        assert np.allclose(moon.surface_brightness, _moon.surface_brightness, rtol=1e-10) 
+        assert np.allclose(Imoon[i], _moon.surface_brightness, rtol=1e-10) 
+        assert moon.visible 
@@ -0,0 +1,64 @@
+__all__ = ['test_bright_exposure_factor_chunk', 'test_check_exposure_factors']
+
+import os
+import sys
+import pytest
+import numpy as np
+
+for _mod in ['desisurvey', 'specsim', 'speclite', 'desiutil', 'sklearn', 'corner', 'matplotlib']:
+    pytest.importorskip(_mod)
+import matplotlib
+matplotlib.use('Agg')
+# run/sv scripts import their local modules (etc, etc_gp) directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'run', 'sv'))
+import etc as SVETC
+import surveysim_valid as SSV
+
+
+@pytest.mark.parametrize('cond', ['twilight', 'not_twilight'])
+def test_bright_exposure_factor_chunk(cond):
+    np.random.seed(7)
+    n = 5
+    theta = [np.random.uniform(1., 2., n), np.random.uniform(0.5, 1., n),
+            np.random.uniform(10., 60., n), np.random.uniform(40., 120., n)]
+    if cond == 'twilight':
+        theta += [np.random.uniform(-20., -13., n), np.random.uniform(50., 150., n)]
+    theta = np.array(theta).T
+
+    exp_factor = SSV._bright_exposure_factor_chunk((theta, cond))
+    assert exp_factor.shape == (n,)
+    assert np.all(np.isfinite(exp_factor)) and np.all(exp_factor >= 1.)
+    for i in range(n):
+        sun_alt, sun_sep = (theta[i,4], theta[i,5]) if cond == 'twilight' else (-30., 180.)
+        _exp_factor = SVETC.bright_exposure_factor(theta[i,1], theta[i,2], theta[i,3],
+                sun_alt, sun_sep, theta[i,0])
+        assert np.isclose(exp_factor[i], _exp_factor[0])
+    # chunked over a process pool
+    assert np.allclose(SSV._bright_exposure_factor_theta(theta, cond, chunk=2, n_proc=2), exp_factor)
+
+
+@pytest.mark.parametrize('cond', ['twilight', 'not_twilight'])
+def test_check_exposure_factors(cond):
+    # run/sv/etc.py training labels vs desisurvey.etc validation truths
+    from desisurvey import etc as ETC
+    if not hasattr(ETC, 'bright_exposure_factor'):
+        pytest.skip('desisurvey.etc has no bright_exposure_factor')
+    np.random.seed(3)
+    n = 10
+    exps = {'airmass': np.random.uniform(1., 2., n), 'moon_ill': np.random.uniform(0.5, 1., n),
+            'moon_alt': np.random.uniform(10., 60., n), 'moon_sep': np.random.uniform(40., 120., n)}
+    if cond == 'twilight':
+        exps['sun_alt'] = np.random.uniform(-20., -13., n)
+        exps['sun_sep'] = np.random.uniform(50., 150., n)
+    else:
+        exps['sun_alt'] = np.random.uniform(-90., -25., n)
+        exps['sun_sep'] = np.random.uniform(50., 150., n)
+    exp_factors = np.array([ETC.bright_exposure_factor(exps['moon_ill'][i], exps['moon_alt'][i],
+        np.array(exps['moon_sep'][i]), exps['sun_alt'][i], np.array(exps['sun_sep'][i]),
+        np.array(exps['airmass'][i])) for i in range(n)]).flatten()
+
+    dratio = SSV._check_exposure_factors(exps, exp_factors, np.ones(n).astype(bool), cond, n_check=n)
+    assert dratio.shape == (n,)
+    # factors that disagree are caught
+    with pytest.raises(ValueError):
+        SSV._check_exposure_factors(exps, 2. * exp_factors, np.ones(n).astype(bool), cond, n_check=n)
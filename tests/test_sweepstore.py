@@ -0,0 +1,67 @@
+__all__ = ['test_SweepStore']
+
+import os
+import pytest
+import numpy as np
+from astropy.table import Table as aTable
+# --- feasibgs ---
+from feasibgs import catalogs as Cat
+from feasibgs import sweepstore as Store
+
+hp = pytest.importorskip('healpy')
+
+
+def test_SweepStore(tmpdir):
+    np.random.seed(3)
+    # two mock sweep files
+    fsweeps, sweeps = [], []
+    for i, (ra_lim, dec_lim) in enumerate([([350., 360.], [0., 5.]), ([0., 10.], [0., 5.])]):
+        n = 2000
+        sweep = aTable([np.random.uniform(ra_lim[0], ra_lim[1], n), np.random.uniform(dec_lim[0], dec_lim[1], n),
+            np.random.uniform(1., 100., n)], names=('RA', 'DEC', 'FLUX_R'))
+        fsweeps.append(os.path.join(str(tmpdir), 'sweep-%i.fits' % i))
+        sweep.write(fsweeps[-1])
+        sweeps.append(sweep)
+    ra = np.concatenate([s['RA'] for s in sweeps])
+    dec = np.concatenate([s['DEC'] for s in sweeps])
+    flux_r = np.concatenate([s['FLUX_R'] for s in sweeps])
+
+    store = Store.SweepStore(os.path.join(str(tmpdir), 'store'), nside=16)
+    store.ingest(fsweeps)
+    assert np.sum(store.index['count']) == len(ra)
+    # reopen the store
+    store = Store.SweepStore(os.path.join(str(tmpdir), 'store'))
+    assert store.nside == 16
+    assert store.columns() == ['dec', 'flux_r', 'ra']
+    assert sorted(store.ingested()) == ['sweep-0.fits', 'sweep-1.fits']
+    # re-ingesting a sweep file does not duplicate its objects
+    store.ingest(fsweeps[:1])
+    assert np.sum(store.index['count']) == len(ra)
+    assert len(store.box([350., 360.], [0., 5.])['ra']) == np.sum(ra >= 350.)
+
+    # box across RA = 0
+    box = store.box([355., 5.], [1., 3.], columns=['flux_r'])
+    inbox = ((ra >= 355.) | (ra <= 5.)) & (dec >= 1.) & (dec <= 3.)
+    assert np.array_equal(np.sort(box['flux_r']), np.sort(flux_r[inbox]))
+    # only the pixels near the box are read
+    pixels = store._box_pixels([355., 5.], [1., 3.])
+    assert np.all(np.isin(hp.ang2pix(16, ra[inbox], dec[inbox], nest=True, lonlat=True), pixels))
+    ra_c, _ = hp.pix2ang(16, pixels, nest=True, lonlat=True)
+    assert np.all(np.abs((ra_c + 180.) % 360. - 180.) < 5. + hp.nside2resol(16, arcmin=True)/60.)
+    assert len(pixels) < len(store.index['pix'])
+
+    # empty regions keep the dtype of the columns
+    empty = store.box([100., 110.], [0., 5.], columns=['ra', 'flux_r'])
+    assert len(empty['ra']) == 0
+    assert empty['flux_r'].dtype == box['flux_r'].dtype
+
+    # polygon
+    poly = store.polygon([2., 8., 8., 2.], [1., 1., 4., 4.], columns=['ra', 'dec'])
+    inpoly = (ra > 2.) & (ra < 8.) & (dec > 1.05) & (dec < 3.95)
+    assert np.sum(inpoly) <= len(poly['ra']) <= np.sum((ra >= 2.) & (ra <= 8.) & (dec >= 0.95) & (dec <= 4.05))
+
+    # tiles
+    tiles = store.tiles([357., 4.], [2.5, 2.5], radius=1.)
+    sep = np.array([Cat.radec_tree([t_ra], [2.5]).query(Cat._unit_vectors(ra, dec))[0]
+        for t_ra in [357., 4.]]).min(axis=0)
+    assert len(tiles['ra']) == np.sum(sep <= 2. * np.sin(0.5 * np.radians(1.)))